@@ -1,5 +1,7 @@
 import os
 import re
+import math
+import atexit
 import ast
 import tempfile
 import random
@@ -8,11 +10,36 @@ import requests
 import time
 import csv
 from datetime import datetime
+from functools import lru_cache
 import pandas as pd
 from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify
+from flask import Response, stream_with_context
 from werkzeug.security import generate_password_hash, check_password_hash
 import google.generativeai as genai
 from flask import send_from_directory
+from modules.catalog import CsvCatalog, normalize_hotels, build_hotel_lookup, build_city_list
+from modules.hotel_index import HotelFilterIndex
+from modules.ranking import top_k
+from modules.storage import BOOKING_COLUMNS, append_booking, append_review
+from modules.database import HotelRepository
+from modules.event_ledger import EventLedger
+from modules.email_outbox import EmailOutbox, ResendTransport, FakeTransport
+from modules.chat_context import ChatContextBuilder
+from modules.response_cache import ResponseCache, make_cache_key
+from modules.chat_stream import (GREETING_PATTERNS, GreetingStripper, sse_event,
+                                 GeminiChatBackend, FakeChatBackend)
+from modules.model_client import ModelClient, Overloaded
+from modules.chat_retrieval import PromptSizeStats, estimate_tokens
+from modules.text_index import ReviewSearchIndex
+from modules.review_stats import ReviewIndex
+from modules.keyword_matcher import KeywordMatcher
+from modules.entity_resolver import EntityResolver
+from modules.suggest import SuggestIndex
+from modules.context_scoring import ContextScorer, WEATHER_RULES
+from modules.event_timeline import EventTimeline, to_date
+from modules.context_table import ContextScoreTable
+from modules.geo_index import GeoIndex
+from modules.entity_resolver import canonical_city
 
 app = Flask(__name__)
 RESEND_API_KEY = os.getenv("RESEND_API_KEY")
@@ -58,6 +85,16 @@ EVENT_CONFIG = {
 EVENT_SPINS_CSV = os.path.join(DATA_FOLDER, 'event_spins.csv')
 EVENT_PRIZES_CSV = os.path.join(DATA_FOLDER, 'event_prizes.csv')
 
+# === CƠ SỞ DỮ LIỆU SQLITE (hotel.db) ===
+# Users lưu trực tiếp trong DB (ghi từng user). Bookings / reviews / sự kiện được ghi song song
+# vào DB; các trang tra cứu đọc từ DB qua index thay vì đọc lại toàn bộ CSV.
+# Bảng trống được nạp từ CSV lúc khởi động. Bảng hotels do import_hotels.py nạp (app đọc hotels.csv).
+DB_PATH = os.path.join(BASE_DIR, 'hotel.db')
+repo = HotelRepository(DB_PATH)
+
+# Lượt quay / chi tiêu sự kiện theo user: truy vấn DB theo index username (đúng cho mọi worker)
+event_ledger = EventLedger(repo, EVENT_CONFIG['start_month'], EVENT_CONFIG['end_month'])
+
 # -------------------------
 # Tạo app Flask
 # -------------------------
@@ -77,14 +114,23 @@ bookings_db = []
 # -------------------------
 # HÀM HỖ TRỢ
 # -------------------------
-def send_email(to_email, subject, html_content):
-    url = "https://api.resend.com/emails"
-    
-    headers = {
-        "Authorization": f"Bearer {RESEND_API_KEY}",
-        "Content-Type": "application/json"
-    }
+# === HÀNG ĐỢI EMAIL GỬI NỀN (OUTBOX) ===
+# Email được lưu vào data/outbox rồi worker gửi dần (có retry/backoff), request không phải chờ Resend.
+# EMAIL_TRANSPORT=fake: không gọi Resend, chỉ giữ email trong bộ nhớ (chạy local / test).
+EMAIL_OUTBOX_DIR = os.path.join(DATA_FOLDER, 'outbox')
+if os.getenv("EMAIL_TRANSPORT") == "fake":
+    email_transport = FakeTransport()
+else:
+    email_transport = ResendTransport(RESEND_API_KEY)
+email_outbox = EmailOutbox(EMAIL_OUTBOX_DIR, email_transport)
+
+@app.before_request
+def start_email_outbox():
+    # Khởi động worker trong process phục vụ request (tránh process cha của reloader gửi trùng)
+    email_outbox.start()
 
+def send_email(to_email, subject, html_content):
+    """Đưa email vào outbox, trả về ngay (worker nền sẽ gửi qua Resend)"""
     data = {
         "from": "Hotel Pinder <onboarding@resend.dev>",
         "to": [to_email],
@@ -93,13 +139,12 @@ def send_email(to_email, subject, html_content):
     }
 
     try:
-        response = requests.post(url, headers=headers, json=data)
-        print("Resend response:", response.text)
-        return response.status_code == 200
+        email_outbox.enqueue(data)
+        return True
     except Exception as e:
-        print("Lỗi Resend:", e)
+        print("Lỗi lưu email vào outbox:", e)
         return False
-        
+
 def get_user_rank(total_spent):
     if total_spent >= 20_000_000:
         return "Bạch kim"
@@ -130,45 +175,14 @@ def init_event_files():
             writer.writerow(['username', 'prize_value', 'prize_name', 'created_at'])
 
 def user_exists_in_bookings(username):
-    """Kiểm tra user có tồn tại trong bookings.csv không"""
-    if not os.path.exists(BOOKINGS_CSV):
-        return False
-    
-    with open(BOOKINGS_CSV, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            if row['username'] == username:
-                return True
-    return False
+    """Kiểm tra user đã có booking nào chưa (tra DB theo index username)"""
+    return event_ledger.has_bookings(username)
 
 def calculate_event_spending(username):
-    """Tính tổng chi tiêu TRONG THỜI GIAN SỰ KIỆN từ bookings.csv - ĐÃ SỬA"""
-    total = 0
-    
-    if not os.path.exists(BOOKINGS_CSV):
-        return total
-    
-    current_year = datetime.now().year
-    
-    with open(BOOKINGS_CSV, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            if (row['username'] == username and 
-                row['status'].lower() == 'completed'):
-                
-                try:
-                    booking_time = datetime.strptime(row['booking_time'], '%Y-%m-%d %H:%M:%S')
-                    # CHỈ tính booking trong thời gian sự kiện (tháng 8-12)
-                    if (booking_time.year == current_year and 
-                        EVENT_CONFIG['start_month'] <= booking_time.month <= EVENT_CONFIG['end_month']):
-                        total += float(row['price'])
-                except (ValueError, KeyError):
-                    continue
-    
+    """Tổng chi tiêu TRONG THỜI GIAN SỰ KIỆN (booking completed tháng 8-12 năm nay)"""
     # ❌ KHÔNG cộng thêm giải thưởng từ sự kiện nữa
     # Vì giải thưởng đã được cộng trực tiếp vào total_spent của user
-    
-    return total
+    return event_ledger.event_spending(username, datetime.now().year)
 
 def get_max_spins(username):
     """Tính tổng số lượt quay tối đa = 1 lượt miễn phí + lượt từ chi tiêu + lượt từ rank"""
@@ -204,26 +218,8 @@ def get_max_spins(username):
     }
 
 def get_used_spins(username):
-    """Đếm số lượt quay đã sử dụng"""
-    if not os.path.exists(EVENT_SPINS_CSV):
-        return 0
-    
-    count = 0
-    current_year = datetime.now().year
-    
-    with open(EVENT_SPINS_CSV, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            if row['username'] == username:
-                try:
-                    spin_year = int(row['year'])
-                    spin_date = datetime.strptime(row['spin_date'], '%Y-%m-%d %H:%M:%S')
-                    if (spin_year == current_year and 
-                        EVENT_CONFIG['start_month'] <= spin_date.month <= EVENT_CONFIG['end_month']):
-                        count += 1
-                except (ValueError, KeyError):
-                    continue
-    return count
+    """Đếm số lượt quay đã sử dụng trong sự kiện năm nay"""
+    return event_ledger.used_spins(username, datetime.now().year)
 
 def use_spin(username):
     """Ghi nhận một lượt quay - FIXED"""
@@ -252,9 +248,12 @@ def use_spin(username):
     is_free_spin = (used_spins == 0)
     
     # Ghi lượt quay
+    spin_date = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     with open(EVENT_SPINS_CSV, 'a', newline='', encoding='utf-8') as f:
         writer = csv.writer(f)
-        writer.writerow([username, datetime.now().strftime('%Y-%m-%d %H:%M:%S'), current_year, is_free_spin])
+        writer.writerow([username, spin_date, current_year, is_free_spin])
+    repo.add_event_spin({'username': username, 'spin_date': spin_date,
+                         'year': current_year, 'is_free_spin': is_free_spin})
     
     print(f"✅ Đã ghi lượt quay cho {username}, free_spin={is_free_spin}")
     return True
@@ -270,14 +269,17 @@ def get_random_prize():
 def update_user_prize(username, prize_value, prize_name):
     """Cập nhật giải thưởng cho user - CHỈ cộng vào total_spent"""
     # 1. Ghi giải thưởng vào event_prizes.csv
+    created_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     with open(EVENT_PRIZES_CSV, 'a', newline='', encoding='utf-8') as f:
         writer = csv.writer(f)
-        writer.writerow([username, prize_value, prize_name, datetime.now().strftime('%Y-%m-%d %H:%M:%S')])
+        writer.writerow([username, prize_value, prize_name, created_at])
+    repo.add_event_prize({'username': username, 'prize_value': prize_value,
+                          'prize_name': prize_name, 'created_at': created_at})
     
     # 2. Cập nhật tổng chi tiêu trong users_db (CHÍNH)
     if username in users_db:
         users_db[username]['total_spent'] += prize_value
-        save_users(users_db)  # Lưu ngay vào CSV
+        save_user(username)  # Lưu ngay bản ghi của user này
         
         print(f"✅ Đã cộng {prize_value:,} VNĐ vào total_spent của user {username}")
         print(f"💰 Total_spent mới: {users_db[username]['total_spent']:,} VNĐ")
@@ -287,44 +289,36 @@ def update_user_prize(username, prize_value, prize_name):
 def generate_booking_code():
     return str(random.randint(10000000, 99999999))
 # -------------------------
-# HỖ TRỢ USER CSV
+# HỖ TRỢ USER (bảng users trong hotel.db)
 # -------------------------
-def load_users():
-    # Nếu file chưa tồn tại, tạo DataFrame rỗng với header chuẩn
+def load_legacy_users_csv():
+    """Đọc users.csv cũ (history dạng chuỗi list Python) - chỉ dùng để chuyển sang DB lần đầu"""
     if not os.path.exists(USERS_CSV):
-        df = pd.DataFrame(columns=[
-            "username","password","full_name","dob","gender","email","phone","total_spent","history"
-        ])
-        df.to_csv(USERS_CSV, index=False, encoding="utf-8-sig")
-    else:
-        df = pd.read_csv(USERS_CSV, encoding="utf-8-sig")
-        # Nếu không có cột username, tạo DataFrame rỗng
-        if "username" not in df.columns:
-            df = pd.DataFrame(columns=[
-                "username","password","full_name","dob","gender","email","phone","total_spent","history"
-            ])
-            df.to_csv(USERS_CSV, index=False, encoding="utf-8-sig")
-
-    # Chuyển DataFrame thành dict theo username
-    users = df.set_index('username').T.to_dict()
+        return {}
+    df = pd.read_csv(USERS_CSV, encoding="utf-8-sig", dtype=str)
+    if "username" not in df.columns:
+        return {}
 
-    # 🔹 Chuyển 'history' từ string -> list
-    for u, data in users.items():
-        if 'history' in data:
-            try:
-                data['history'] = ast.literal_eval(data['history'])
-            except:
-                data['history'] = []
-        else:
+    users = df.set_index('username').T.to_dict()
+    for data in users.values():
+        try:
+            data['history'] = ast.literal_eval(data['history'])
+        except Exception:
             data['history'] = []
-
     return users
 
-def save_users(users):
-    df = pd.DataFrame(users).T
-    # 🔹 Chuyển 'history' từ list -> string trước khi lưu CSV
-    df['history'] = df['history'].apply(str)
-    df.to_csv(USERS_CSV, index_label='username', encoding="utf-8-sig")
+def load_users():
+    # Lần đầu chạy với DB: chuyển dữ liệu từ users.csv cũ vào bảng users
+    if repo.is_empty('users'):
+        legacy = load_legacy_users_csv()
+        if legacy:
+            repo.replace_table('users', [dict(data, username=u) for u, data in legacy.items()])
+            print(f"[DB] Đã chuyển {len(legacy)} user từ {USERS_CSV} sang bảng users")
+    return repo.all_users()
+
+def save_user(username):
+    """Ghi lại MỘT user (total_spent, history dạng JSON) - không ghi lại toàn bộ danh sách user"""
+    repo.upsert_user(username, users_db[username])
 
 # Load user database khi start app
 users_db = load_users()
@@ -367,9 +361,8 @@ def register():
             "history": []
         }
 
-        # Ghi lại CSV
-        df = pd.DataFrame(users_db).T  # Chuyển dict sang DataFrame
-        df.to_csv(USERS_CSV, index_label="username", encoding="utf-8-sig")
+        # Ghi user mới vào DB
+        save_user(username)
 
         flash("Đăng ký thành công! Hãy đăng nhập.", "success")
         return redirect(url_for("login"))
@@ -421,19 +414,14 @@ def profile():
         birth = datetime.strptime(dob, "%Y-%m-%d")
         age = int((datetime.now() - birth).days / 365.25)
 
-    # --- Lấy lịch sử đặt phòng ---
-    if os.path.exists(BOOKINGS_CSV):
-        df = pd.read_csv(BOOKINGS_CSV, encoding="utf-8-sig")
-        user_history = df[df["email"] == user_data.get("email", "")]
-        history = [
-            {
-                "name": row["hotel_name"],
-                "price": "{:,.0f}".format(float(row["price"])),
-                "date": row["booking_time"]
-            } for idx, row in user_history.iterrows()
-        ]
-    else:
-        history = []
+    # --- Lấy lịch sử đặt phòng (tra theo index email trong DB) ---
+    history = [
+        {
+            "name": row["hotel_name"],
+            "price": "{:,.0f}".format(float(row["price"] or 0)),
+            "date": row["booking_time"]
+        } for row in repo.bookings_by_email(user_data.get("email", ""))
+    ]
 
     # --- Truyền total_spent vào template ---
     total_spent = user_data.get("total_spent", 0)
@@ -536,7 +524,18 @@ def destination(city):
     # đọc bài giới thiệu
     info["intro"] = read_intro(info["name"])
 
-    return render_template("destination.html", info=info)
+    # Khách sạn quanh địa danh (mốc = tọa độ trung bình các sự kiện của thành phố)
+    hotels = []
+    center = event_timeline().center(canonical_city(city if city in data else key_map.get(city.lower(), city)))
+    if center is not None and geo_search_available():
+        user_rank = session.get('user_rank', 'Đồng')
+        for h in nearby_hotels(*center, radius_km=DESTINATION_RADIUS_KM):
+            hotel = map_hotel_row(h)
+            hotel['discount'] = 100 - get_discounted_price(user_rank, 100)
+            hotel['desc'] = hotel['short_desc']
+            hotels.append(hotel)
+
+    return render_template("destination.html", info=info, hotels=hotels)
 
 # -------------------------
 # ĐƯỜNG DẪN FILE (LINH HOẠT)
@@ -557,17 +556,21 @@ else:
 # bookings luôn dùng trong data (nếu bạn muốn khác có thể đổi)
 BOOKINGS_CSV = os.path.join(DATA_FOLDER, 'bookings.csv')
 REVIEWS_CSV = os.path.join(BASE_DIR, 'reviews.csv') if os.path.exists(os.path.join(BASE_DIR, 'reviews.csv')) else os.path.join(DATA_FOLDER, 'reviews.csv')
+EVENTS_CSV = os.path.join(BASE_DIR, 'events.csv')
+# Bán kính mặc định (km) cho các câu hỏi "khách sạn gần đây"
+NEARBY_RADIUS_KM = 5.0
+DESTINATION_RADIUS_KM = 20.0
+# Bán kính lớn nhất người dùng được chọn (radius_km ngoài (0, MAX_RADIUS_KM] bị từ chối)
+MAX_RADIUS_KM = 200.0
+# Bảng điểm ngữ cảnh tính sẵn bởi precompute_context_scores.py (không có thì bỏ qua boost ngày đi)
+CONTEXT_SCORES_FILE = os.path.join(DATA_FOLDER, 'context_scores.npz')
 
 # === FILE PATHS (Tạo bookings nếu chưa có) ===
 try:
     safe_dir = os.path.dirname(BOOKINGS_CSV)
     os.makedirs(safe_dir, exist_ok=True)
     if not os.path.exists(BOOKINGS_CSV):
-        df_empty = pd.DataFrame(columns=[
-                "hotel_name", "room_type", "price", "user_name", "phone", "email",
-                "num_adults", "num_children", "checkin_date", "nights",
-                "special_requests", "booking_time", "status"
-        ])
+        df_empty = pd.DataFrame(columns=BOOKING_COLUMNS)
         df_empty.to_csv(BOOKINGS_CSV, index=False, encoding="utf-8-sig")
 except Exception as e:
     temp_dir = tempfile.gettempdir()
@@ -608,19 +611,145 @@ def read_csv_safe(file_path):
             raise
     raise UnicodeDecodeError(f"Không đọc được file {file_path} với UTF-8 hoặc cp1252!")
 
-# === LOAD DỮ LIỆU BAN ĐẦU (vẫn load để có cấu trúc, nhưng routes đọc file tươi) ===
-hotels = read_csv_safe(HOTELS_CSV)
+# === CATALOG KHÁCH SẠN DÙNG CHUNG ===
+# Đọc + chuẩn hóa hotels.csv một lần, chỉ nạp lại khi file đổi (mtime/size)
+# hoặc khi route admin ghi file (hotel_catalog.invalidate()).
+hotel_catalog = CsvCatalog(HOTELS_CSV, read_csv_safe, normalize=normalize_hotels)
+hotels = hotel_catalog.frame()
+event_catalog = CsvCatalog(EVENTS_CSV, read_csv_safe)
+context_table_catalog = CsvCatalog(CONTEXT_SCORES_FILE, ContextScoreTable.load)
 reviews_df = read_csv_safe(REVIEWS_CSV)
 
-if 'name' not in hotels.columns:
-    if 'Name' in hotels.columns:
-        hotels = hotels.rename(columns={'Name': 'name'})
-    else:
-        raise KeyError("❌ hotels.csv không có cột 'name'!")
-
 if 'hotel_name' not in reviews_df.columns:
     raise KeyError("❌ reviews.csv không có cột 'hotel_name'.")
 
+def csv_rows(path):
+    """Đọc CSV thành list dict (giữ nguyên chuỗi, ô trống -> None) để nạp vào DB"""
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return []
+    df = pd.read_csv(path, encoding='utf-8-sig', dtype=str)
+    df.columns = df.columns.str.strip()
+    return df.to_dict(orient='records')
+
+
+def find_hotel(name):
+    """Tra cứu khách sạn theo tên trong catalog (O(1)), trả về dict hoặc None"""
+    return hotel_catalog.derived('hotel_lookup', build_hotel_lookup).get(name)
+
+
+def entity_resolver():
+    """Nhận diện tên khách sạn / thành phố trong văn bản; dựng lại khi hotels.csv đổi"""
+    return hotel_catalog.derived(
+        'entity_resolver', lambda df: EntityResolver.from_catalog(df['name'], df['city'].unique())
+    )
+
+
+def synced_review_index():
+    """ReviewIndex đã nạp thêm các đánh giá mới trong DB (kể cả do worker gunicorn khác ghi)"""
+    review_index.sync(repo.reviews_since(review_index.last_id))
+    return review_index
+
+
+def review_search():
+    """
+    Chỉ mục BM25 trên mô tả + đánh giá; dựng lại khi hotels.csv đổi, mỗi lần lấy thì nạp thêm
+    các đánh giá mới trong DB (kể cả do worker gunicorn khác ghi)
+    """
+    index = hotel_catalog.derived(
+        'review_search', lambda df: ReviewSearchIndex.from_sources(df, repo.reviews_since(0))
+    )
+    index.sync(repo.reviews_since(index.last_id))
+    return index
+
+
+def event_timeline():
+    """Lịch sự kiện theo thành phố (tra sự kiện kế tiếp bằng bisect); dựng lại khi events.csv đổi"""
+    return event_catalog.derived('event_timeline', EventTimeline)
+
+
+def context_scorer():
+    """Chấm điểm sự kiện / thời tiết / mùa (modules/context_scoring); dựng lại khi hotels.csv hoặc events.csv đổi"""
+    timeline = event_timeline()
+    # Khóa cố định theo hotels.csv; scorer nhớ timeline đã dùng, events.csv đổi thì dựng lại và thay thế
+    # (không tạo thêm khóa cho mỗi phiên bản events.csv)
+    entry = hotel_catalog.derived('context_scorer', lambda df: {'hotels': df, 'scorer': None})
+    scorer = entry['scorer']
+    if scorer is None or scorer.timeline is not timeline:
+        scorer = ContextScorer(entry['hotels'], timeline)
+        entry['scorer'] = scorer
+    return scorer
+
+
+def hotel_geo_index():
+    """Chỉ mục lưới trên lat/lon khách sạn (id = vị trí dòng trong catalog); dựng lại khi hotels.csv đổi"""
+    return hotel_catalog.derived('geo_index', GeoIndex.from_frame)
+
+
+def geo_search_available():
+    """Có khách sạn nào có tọa độ không (hotels.csv chưa có lat/lon thì ẩn các chức năng "gần đây")"""
+    return len(hotel_geo_index()) > 0
+
+
+def nearby_hotels(lat, lon, radius_km=NEARBY_RADIUS_KM, limit=None):
+    """Các dòng khách sạn (dict, thêm distance_km) trong bán kính radius_km quanh (lat, lon), gần trước"""
+    hotels_df = hotel_catalog.frame()
+    if limit:
+        ids, km = hotel_geo_index().nearest(lat, lon, k=limit, max_km=radius_km)
+    else:
+        ids, km = hotel_geo_index().within(lat, lon, radius_km)
+    result = []
+    for row, distance in zip(ids.tolist(), km.tolist()):
+        hotel = hotels_df.iloc[row].to_dict()
+        hotel['distance_km'] = round(distance, 2)
+        result.append(hotel)
+    return result
+
+
+def parse_float(value):
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return value if math.isfinite(value) else None
+
+
+def parse_radius(value):
+    """radius_km từ form / query string: trống -> NEARBY_RADIUS_KM; không phải số, <= 0 hoặc quá lớn -> None"""
+    if value is None or not str(value).strip():
+        return NEARBY_RADIUS_KM
+    radius = parse_float(value)
+    if radius is None or not 0 < radius <= MAX_RADIUS_KM:
+        return None
+    return radius
+
+
+def context_table():
+    """Bảng điểm (khách sạn, ngày) tính sẵn; nạp lại khi file đổi, None nếu chưa chạy job"""
+    try:
+        return context_table_catalog.frame()
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def parse_trip_date(value):
+    """'YYYY-MM-DD' -> date; trống / sai định dạng / 'nat' -> None"""
+    if not value:
+        return None
+    try:
+        day = to_date(str(value).strip())
+    except (TypeError, ValueError):
+        return None
+    # pandas đọc 'nat' / 'NaT' thành pd.NaT (truthy, không phải date)
+    return None if pd.isna(day) else day
+
+
+def trip_date_boosts(names, trip_date):
+    """Điểm ngữ cảnh (0..1) của các khách sạn vào ngày đi - 1 lần tra mảng; 0 nếu chưa có bảng / ngoài khung ngày"""
+    table = context_table()
+    if table is None or trip_date is None:
+        return [0.0] * len(names)
+    return table.lookup(names, trip_date).tolist()
+
 
 # === HÀM HỖ TRỢ MAPPING / ICON ===
 def yes_no_icon(val):
@@ -642,32 +771,13 @@ def map_hotel_row(row):
 # === TRANG CHỦ ===
 @app.route('/')
 def home():
-    hotels_df = read_csv_safe(HOTELS_CSV)
-    # đảm bảo cột rooms_available và status tồn tại và đúng kiểu
-    if 'rooms_available' not in hotels_df.columns:
-        hotels_df['rooms_available'] = 0
-    hotels_df['rooms_available'] = hotels_df['rooms_available'].astype(int)
-    if 'status' not in hotels_df.columns:
-        hotels_df['status'] = hotels_df['rooms_available'].apply(lambda x: 'còn' if int(x) > 0 else 'hết')
-
-    cities = sorted(hotels_df['city'].dropna().unique())
+    cities = hotel_catalog.derived('cities', build_city_list)
     return render_template('index.html', cities=cities)
 
 
 # === TRANG GỢI Ý / FILTER NÂNG CAO ===
 @app.route('/recommend', methods=['POST', 'GET'])
 def recommend():
-    filtered = read_csv_safe(HOTELS_CSV)
-
-    # đảm bảo cột status và rooms_available tồn tại và đúng kiểu
-    if 'rooms_available' not in filtered.columns:
-        filtered['rooms_available'] = 0
-    filtered['rooms_available'] = filtered['rooms_available'].astype(int)
-    if 'status' not in filtered.columns:
-        filtered['status'] = filtered['rooms_available'].apply(lambda x: 'còn' if x > 0 else 'hết')
-    else:
-        filtered['status'] = filtered['rooms_available'].apply(lambda x: 'còn' if x > 0 else 'hết')
-
     # --- Lấy dữ liệu từ form (POST) hoặc query string (GET) ---
     if request.method == 'POST':
         city = request.form.get('location', '').lower()
@@ -675,62 +785,80 @@ def recommend():
         stars = request.form.get('stars', '')
         amenities = request.form.getlist('amenities')  # danh sách checkbox
         size = request.form.get('size', '')
+        checkin = request.form.get('checkin', '')
+        near = request.form
     else:
         city = request.args.get('location', '').lower()
         budget = request.args.get('budget', '')
         stars = request.args.get('stars', '')
         amenities = request.args.getlist('amenities')
         size = request.args.get('size', '')
+        checkin = request.args.get('checkin', '')
+        near = request.args
 
-    # --- Lọc theo thành phố ---
-    if city:
-        filtered = filtered[filtered['city'].str.lower() == city]
-
-    # --- Lọc theo ngân sách ---
-    if budget:
-        try:
-            budget = float(budget)
-            filtered = filtered[filtered['price'] <= budget]
-        except Exception:
-            pass
+    # --- Ép kiểu điều kiện (giá trị sai định dạng thì bỏ qua như trước) ---
+    try:
+        budget = float(budget) if budget else None
+    except Exception:
+        budget = None
+    try:
+        stars = int(stars) if stars else None
+    except Exception:
+        stars = None
+
+    # --- Lọc bằng index dựng sẵn: thành phố, giá, sao, tiện nghi, diện tích ---
+    # (index giữ luôn DataFrame của đúng phiên bản catalog, chỉ đọc không sửa)
+    filter_index = hotel_catalog.derived('filter_index', HotelFilterIndex)
+    rows = filter_index.query(
+        city=city,
+        max_price=budget,
+        min_stars=stars,
+        amenities=amenities,
+        size=size or None
+    )
 
-    # --- Lọc theo số sao ---
-    if stars:
-        try:
-            stars = int(stars)
-            filtered = filtered[filtered['stars'] >= stars]
-        except Exception:
-            pass
-
-    # --- Lọc theo tiện nghi ---
-    for amen in amenities:
-        if amen == 'pool':
-            filtered = filtered[filtered['pool'] == True]
-        elif amen == 'sea':
-            filtered = filtered[(filtered.get('sea', False) == True) | (filtered.get('sea_view', False) == True)]
-        elif amen == 'breakfast':
-            filtered = filtered[filtered['buffet'] == True]
-        elif amen == 'bar':
-            filtered = filtered[filtered['bar'] == True]
-
-    # --- Lọc theo loại phòng (diện tích) ---
-    if size:
-        def room_size_ok(row):
-            try:
-                s = float(row.get('size', 0))
-            except:
-                s = 0
-            if size == 'small':
-                return s < 25
-            elif size == 'medium':
-                return 25 <= s <= 40
-            elif size == 'large':
-                return s > 40
-            return True
-        filtered = filtered[filtered.apply(room_size_ok, axis=1)]
+    # --- Gần một điểm (near_lat/near_lon hoặc near_event): chỉ giữ khách sạn trong bán kính, gần trước ---
+    near_lat, near_lon = parse_float(near.get('near_lat')), parse_float(near.get('near_lon'))
+    radius_km = parse_radius(near.get('radius_km'))
+    if radius_km is None:
+        flash(f"⚠️ Bán kính không hợp lệ: nhập số km lớn hơn 0 và không quá {MAX_RADIUS_KM:g}.", "danger")
+        return redirect(url_for('home'))
+    if near.get('near_event'):
+        event = event_timeline().find(near.get('near_event'))
+        if event is None:
+            flash("⚠️ Không tìm thấy sự kiện để lọc khách sạn gần đó.", "danger")
+            return redirect(url_for('home'))
+        near_lat, near_lon = parse_float(event.lat), parse_float(event.lon)
+        if near_lat is None or near_lon is None:
+            flash(f"⚠️ Sự kiện {event.name} chưa có tọa độ, không lọc được khách sạn gần đó.", "danger")
+            return redirect(url_for('home'))
+    elif near.get('near_lat') or near.get('near_lon'):
+        if near_lat is None or near_lon is None or not (-90 <= near_lat <= 90 and -180 <= near_lon <= 180):
+            flash("⚠️ Tọa độ không hợp lệ: cần cả near_lat (-90..90) và near_lon (-180..180).", "danger")
+            return redirect(url_for('home'))
+    distances = {}
+    if near_lat is not None and near_lon is not None:
+        if not geo_search_available():
+            flash("⚠️ Chưa có tọa độ khách sạn nên chưa lọc được theo khoảng cách.", "danger")
+            return redirect(url_for('home'))
+        ids, km = hotel_geo_index().within(near_lat, near_lon, radius_km)
+        distances = dict(zip(ids.tolist(), km.tolist()))
+        rows = sorted((row for row in rows if row in distances), key=distances.get)
+    filtered = filter_index.frame.iloc[rows]
 
     # --- Chuẩn bị kết quả ---
     results = [map_hotel_row(r) for r in filtered.to_dict(orient='records')]
+    if distances:
+        for hotel, row in zip(results, rows):
+            hotel['distance_km'] = round(distances[row], 2)
+
+    # --- Có ngày đi: ưu tiên khách sạn hợp sự kiện / mùa hôm đó (bảng tính sẵn) ---
+    trip_date = parse_trip_date(checkin)
+    if trip_date and results:
+        boosts = trip_date_boosts([h['name'] for h in results], trip_date)
+        for hotel, boost in zip(results, boosts):
+            hotel['context_score'] = round(boost, 3)
+        results = [results[i] for i in top_k(boosts)]
 
     return render_template('result.html', hotels=results)
 
@@ -738,30 +866,16 @@ def recommend():
 # === TRANG CHI TIẾT ===
 @app.route('/hotel/<name>')
 def hotel_detail(name):
-    hotels_df = read_csv_safe(HOTELS_CSV)
-
-    if 'rooms_available' not in hotels_df.columns:
-        hotels_df['rooms_available'] = 0
-    hotels_df['rooms_available'] = hotels_df['rooms_available'].astype(int)
-    if 'status' not in hotels_df.columns:
-        hotels_df['status'] = hotels_df['rooms_available'].apply(lambda x: 'còn' if int(x) > 0 else 'hết')
-    else:
-        hotels_df['status'] = hotels_df['rooms_available'].apply(lambda x: 'còn' if int(x) > 0 else 'hết')
-
-    hotel_data = hotels_df[hotels_df['name'] == name]
+    hotel_row = find_hotel(name)
 
-    if hotel_data.empty:
+    if hotel_row is None:
         return "<h3>Không tìm thấy khách sạn!</h3>", 404
 
-    hotel = map_hotel_row(hotel_data.iloc[0].to_dict())
+    hotel = map_hotel_row(hotel_row)
     user_rank = session.get('user', {}).get('rank', 'Đồng')
-    reviews_df_local = read_csv_safe(REVIEWS_CSV)
-    hotel_reviews = reviews_df_local[reviews_df_local['hotel_name'] == name].to_dict(orient='records')
-
-    avg_rating = (
-        round(sum(float(r.get('rating', 0)) for r in hotel_reviews) / len(hotel_reviews), 1)
-        if hotel_reviews else hotel.get('rating', 'Chưa có')
-    )
+    reviews = synced_review_index()
+    hotel_reviews = reviews.reviews_for(name)
+    avg_rating = reviews.average(name, default=hotel.get('rating', 'Chưa có'))
 
     features = {
         "Buffet": yes_no_icon(hotel.get("buffet")),
@@ -788,11 +902,11 @@ def hotel_detail(name):
     # === THÊM GALLERY VÀO KHÁCH SẠN ===
     hotel['gallery'] = get_hotel_gallery(hotel['name'])
     # === THÊM EVENT IMAGE ===
-    hotel['event_image_url'] = hotel_data.iloc[0].get('event_image_url', '')
+    hotel['event_image_url'] = hotel_row.get('event_image_url', '')
     if pd.isna(hotel['event_image_url']):
         hotel['event_image_url'] = ''
         
-    hotel['hotel_description'] = hotel_data.iloc[0].get('hotel_description', '')
+    hotel['hotel_description'] = hotel_row.get('hotel_description', '')
     if pd.isna(hotel['hotel_description']):
         hotel['hotel_description'] = ''
 
@@ -805,6 +919,50 @@ def hotel_detail(name):
         avg_rating=avg_rating
     )
 
+# === GỢI Ý KHI GÕ (AUTOCOMPLETE) ===
+@app.route('/api/suggest')
+def api_suggest():
+    """Gợi ý khách sạn / thành phố theo tiền tố (không dấu cũng được): /api/suggest?q=da n&limit=8"""
+    query = request.args.get('q', '')
+    try:
+        limit = min(20, max(1, int(request.args.get('limit', 8))))
+    except ValueError:
+        limit = 8
+
+    # Index dựng lại khi hotels.csv đổi; khách sạn cùng rating thì xếp theo số lượt đánh giá
+    suggest_index = hotel_catalog.derived('suggest_index', SuggestIndex)
+    suggestions = suggest_index.query(query, limit=limit, popularity=synced_review_index().count)
+    for item in suggestions:
+        if item['type'] == 'hotel':
+            item['url'] = url_for('hotel_detail', name=item['label'])
+        else:
+            item['url'] = url_for('recommend', location=item['label'])
+
+    return jsonify({"query": query, "suggestions": suggestions})
+
+# === ĐIỂM NGỮ CẢNH (SỰ KIỆN / THỜI TIẾT / MÙA) ===
+@app.route('/api/context_scores')
+def api_context_scores():
+    """Xếp khách sạn theo ngữ cảnh: /api/context_scores?city=Da Nang&date=2025-07-08&weather=sunny&limit=10"""
+    city = request.args.get('city', '').strip() or None
+    date = request.args.get('date', '').strip() or None
+    weather = request.args.get('weather', 'default').strip().lower()
+    season = request.args.get('season', '').strip().lower() or None
+    try:
+        limit = min(100, max(1, int(request.args.get('limit', 10))))
+    except ValueError:
+        limit = 10
+    if weather not in WEATHER_RULES:
+        weather = 'default'
+
+    try:
+        ranked = context_scorer().score(city, date, weather, season, k=limit)
+    except ValueError:
+        return jsonify({"error": "Ngày không hợp lệ, dùng định dạng YYYY-MM-DD"}), 400
+
+    ranked = ranked.astype(object).where(ranked.notna(), None)
+    return jsonify({"city": city, "date": date, "weather": weather, "hotels": ranked.to_dict(orient='records')})
+
 # === GỬI ĐÁNH GIÁ ===
 @app.route('/review/<name>', methods=['POST'])
 def add_review(name):
@@ -812,16 +970,16 @@ def add_review(name):
     rating = int(request.form.get('rating', 0))
     comment = request.form.get('comment', '').strip()
 
-    new_review = pd.DataFrame([{
+    # Ghi thêm 1 dòng (append dưới khóa file), không đọc lại toàn bộ file
+    review = {
         "hotel_name": name,
         "user": user,
         "rating": rating,
         "comment": comment
-    }])
-
-    df = read_csv_safe(REVIEWS_CSV)
-    df = pd.concat([df, new_review], ignore_index=True)
-    df.to_csv(REVIEWS_CSV, index=False, encoding="utf-8-sig")
+    }
+    # Chỉ mục đánh giá / BM25 tự nạp dòng mới từ DB ở lần đọc sau (theo id, không đếm trùng)
+    append_review(REVIEWS_CSV, review)
+    repo.add_review(review)
 
     return redirect(url_for('hotel_detail', name=name))
 
@@ -830,22 +988,12 @@ def add_review(name):
 def check_booking():
     code_input = request.form.get('code', '').strip()  # input từ form
 
-    try:
-        df = pd.read_csv(BOOKINGS_CSV, encoding='utf-8-sig')
-    except FileNotFoundError:
-        flash("Không có dữ liệu đặt phòng!", "danger")
-        return redirect(url_for('index'))
-
-    # Ép kiểu string, loại bỏ khoảng trắng
-    df['booking_code'] = df['booking_code'].astype(str).str.strip()
+    # Tra cứu 1 dòng qua index booking_code trong DB
+    booking = repo.find_booking(code_input)
 
-    # Tìm booking_code
-    result = df[df['booking_code'] == code_input]
-
-    if result.empty:
+    if booking is None:
         flash("❌ Không tìm thấy mã đặt phòng!", "danger")
     else:
-        booking = result.iloc[0].to_dict()
         # Hiển thị thông tin với <br> để xuống dòng
         info_text = (
             f"Khách sạn: {booking['hotel_name']}<br>"
@@ -866,19 +1014,11 @@ def check_booking():
 # === TRANG THANH TOÁN BẰNG QR ===
 @app.route("/payment/<code>")
 def payment_page(code):
-    try:
-        df = pd.read_csv(BOOKINGS_CSV, encoding="utf-8-sig")
-    except:
-        return "Không tìm thấy dữ liệu đặt phòng!", 404
-
-    df['booking_code'] = df['booking_code'].astype(str).str.strip()
-    result = df[df['booking_code'] == code]
+    info = repo.find_booking(code)
 
-    if result.empty:
+    if info is None:
         return "<h3>Mã đặt phòng không tồn tại!</h3>", 404
 
-    info = result.iloc[0].to_dict()
-
     return render_template("payment.html", info=info)
 
 
@@ -889,22 +1029,11 @@ def payment_page(code):
 def payment_confirm():
     code = request.form.get("code", "").strip()
 
-    try:
-        df = pd.read_csv(BOOKINGS_CSV, encoding="utf-8-sig")
-    except:
-        flash("Không thể đọc dữ liệu!", "danger")
-        return redirect(url_for("index"))
-
-    df['booking_code'] = df['booking_code'].astype(str).str.strip()
-
-    if code not in df['booking_code'].values:
+    # Cập nhật trạng thái thanh toán: UPDATE 1 dòng theo index, không ghi lại file CSV
+    if not repo.update_booking(code, payment_status="Đã thanh toán"):
         flash("Không tìm thấy mã đặt phòng!", "danger")
         return redirect(url_for("index"))
 
-    # Cập nhật trạng thái thanh toán
-    df.loc[df['booking_code'] == code, "payment_status"] = "Đã thanh toán"
-    df.to_csv(BOOKINGS_CSV, index=False, encoding="utf-8-sig")
-
     flash("🎉 Thanh toán thành công! Đơn đặt phòng đã được xác nhận.", "success")
 
     return redirect(url_for("index"))
@@ -915,16 +1044,12 @@ def payment_confirm():
 @app.route('/booking/<name>/<room_type>', methods=['GET', 'POST'])
 @app.route('/booking/<name>/<room_type>', methods=['GET', 'POST'])
 def booking(name, room_type):
-    hotels_df = read_csv_safe(HOTELS_CSV)
-    hotels_df['rooms_available'] = hotels_df.get('rooms_available', 0).astype(int)
-    hotels_df['status'] = hotels_df['rooms_available'].apply(lambda x: 'còn' if int(x) > 0 else 'hết')
-
-    hotel_data = hotels_df[hotels_df['name'] == name]
-    if hotel_data.empty:
+    hotel_row = find_hotel(name)
+    if hotel_row is None:
         return "<h3>Không tìm thấy khách sạn!</h3>", 404
 
-    hotel = map_hotel_row(hotel_data.iloc[0].to_dict())
-    hotel['status'] = 'còn' if int(hotel_data.iloc[0]['rooms_available']) > 0 else 'hết'
+    hotel = map_hotel_row(hotel_row)
+    hotel['status'] = 'còn' if int(hotel_row['rooms_available']) > 0 else 'hết'
     is_available = hotel['status'].lower() == 'còn'
     flash(f"Trạng thái phòng hiện tại: {hotel['status']}", "info")
 
@@ -962,19 +1087,15 @@ def booking(name, room_type):
             "booking_code": generate_booking_code()
         }
 
-        # Lưu booking vào CSV
-        try:
-            df = pd.read_csv(BOOKINGS_CSV, encoding="utf-8-sig")
-        except FileNotFoundError:
-            df = pd.DataFrame(columns=info.keys())
-        df = pd.concat([df, pd.DataFrame([info])], ignore_index=True)
-        df.to_csv(BOOKINGS_CSV, index=False, encoding="utf-8-sig")
+        # Lưu booking vào CSV: append đúng 1 dòng dưới khóa file (chi phí cố định)
+        append_booking(BOOKINGS_CSV, info)
+        repo.add_booking(info)
 
         # Cập nhật user session & total_spent nếu đăng nhập
         if "user" in session:
             if username in users_db:
                 users_db[username]['total_spent'] += info['price']
-                save_users(users_db)
+                save_user(username)
                 session['user']['rank'] = get_user_rank(users_db[username]['total_spent'])
 
         # === GỬI EMAIL CHO KHÁCH ===
@@ -1028,13 +1149,8 @@ def booking_history():
     is_admin = user.get("rank", "").lower() == "admin"
     email = request.args.get("email") if is_admin else user["email"]
 
-    # Lọc bookings theo email
-    try:
-        df = pd.read_csv(BOOKINGS_CSV, encoding="utf-8-sig")
-    except FileNotFoundError:
-        df = pd.DataFrame()
-    
-    bookings = df[df['email'] == email].to_dict(orient="records") if not df.empty else []
+    # Lọc bookings theo email (index trong DB)
+    bookings = repo.bookings_by_email(email)
 
     # Truyền user vào template
     return render_template("history.html", bookings=bookings, email=email, is_admin=is_admin, user=user)
@@ -1075,11 +1191,10 @@ def admin_dashboard():
         return redirect(url_for('admin_login'))
 
     # Đọc dữ liệu
-    hotels_df = pd.read_csv(HOTELS_CSV, encoding='utf-8-sig')
-    bookings_df = pd.read_csv(BOOKINGS_CSV, encoding='utf-8-sig') if os.path.exists(BOOKINGS_CSV) else pd.DataFrame()
+    hotels_df = hotel_catalog.frame()
 
     total_hotels = len(hotels_df)
-    total_bookings = len(bookings_df)
+    total_bookings = repo.count_bookings()
     total_cities = hotels_df['city'].nunique()
 
     return render_template('admin_dashboard.html',
@@ -1109,6 +1224,7 @@ def admin_hotels():
     df['rooms_available'] = pd.to_numeric(df['rooms_available'], errors='coerce').fillna(0).astype(int)
     df['status'] = df['rooms_available'].apply(lambda x: 'còn' if x > 0 else 'hết')
     df.to_csv(HOTELS_CSV, index=False, encoding='utf-8-sig')
+    hotel_catalog.invalidate()
 
 
     # --- Thêm khách sạn mới ---
@@ -1137,6 +1253,7 @@ def admin_hotels():
             }
             df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
             df.to_csv(HOTELS_CSV, index=False, encoding='utf-8-sig')
+            hotel_catalog.invalidate()
             flash("✅ Đã thêm khách sạn mới!", "success")
             return redirect(url_for('admin_hotels'))
         else:
@@ -1156,6 +1273,7 @@ def admin_hotels():
             df.loc[df['name'] == update_name, 'rooms_available'] = update_rooms
             df.loc[df['name'] == update_name, 'status'] = 'còn' if update_rooms > 0 else 'hết'
             df.to_csv(HOTELS_CSV, index=False, encoding='utf-8-sig')
+            hotel_catalog.invalidate()
             flash(f"🔧 Đã cập nhật số phòng cho {update_name}", "success")
         else:
             flash("⚠️ Không tìm thấy khách sạn có tên này!", "danger")
@@ -1170,11 +1288,7 @@ def admin_bookings():
     if not session.get('admin'):
         return redirect(url_for('admin_login'))
 
-    if os.path.exists(BOOKINGS_CSV):
-        df = pd.read_csv(BOOKINGS_CSV, encoding='utf-8-sig')
-        bookings = df.to_dict(orient='records')
-    else:
-        bookings = []
+    bookings = repo.all_bookings()
 
     return render_template('admin_bookings.html', bookings=bookings)
 
@@ -1185,9 +1299,7 @@ def admin_confirm_booking(booking_time):
     if not session.get('admin'):
         return redirect(url_for('admin_login'))
 
-    df = pd.read_csv(BOOKINGS_CSV, encoding='utf-8-sig')
-    df.loc[df['booking_time'] == booking_time, 'status'] = 'Đã xác nhận'
-    df.to_csv(BOOKINGS_CSV, index=False, encoding='utf-8-sig')
+    repo.set_booking_status_by_time(booking_time, 'Đã xác nhận')
     flash("Đã xác nhận đặt phòng!", "success")
     return redirect(url_for('admin_bookings'))
 
@@ -1198,9 +1310,7 @@ def admin_delete_booking(booking_time):
     if not session.get('admin'):
         return redirect(url_for('admin_login'))
 
-    df = pd.read_csv(BOOKINGS_CSV, encoding='utf-8-sig')
-    df = df[df['booking_time'] != booking_time]
-    df.to_csv(BOOKINGS_CSV, index=False, encoding='utf-8-sig')
+    repo.delete_booking_by_time(booking_time)
     flash("Đã xóa đặt phòng!", "info")
     return redirect(url_for('admin_bookings'))
 
@@ -1214,6 +1324,7 @@ def delete_hotel(name):
         df = pd.read_csv(HOTELS_CSV, encoding='utf-8-sig')
         df = df[df['name'] != name]
         df.to_csv(HOTELS_CSV, index=False, encoding='utf-8-sig')
+        hotel_catalog.invalidate()
         flash(f"Đã xóa khách sạn: {name}", "info")
     except Exception as e:
         flash(f"Lỗi khi xóa khách sạn: {e}", "danger")
@@ -1244,6 +1355,7 @@ def update_hotel_status(name, status):
             df['status'] = df['rooms_available'].apply(lambda x: 'còn' if x > 0 else 'hết')
 
             df.to_csv(HOTELS_CSV, index=False, encoding='utf-8-sig')
+            hotel_catalog.invalidate()
             flash(f"✅ Đã cập nhật {name} → {status}", "success")
         else:
             flash("⚠️ Không tìm thấy khách sạn này!", "warning")
@@ -1265,124 +1377,136 @@ try:
 except Exception as e:
     print(f"Lỗi khởi tạo Gemini: {e}")
     model = None # Đặt là None để kiểm tra sau
+
+# Backend model cho chatbot; CHAT_BACKEND=fake: model giả trả lời cố định (chạy offline / test)
+if os.getenv("CHAT_BACKEND") == "fake":
+    chat_backend = FakeChatBackend()
+elif model:
+    chat_backend = GeminiChatBackend(model, genai.GenerationConfig(
+        temperature=0.3,  # Giảm temperature để ít sáng tạo hơn
+        max_output_tokens=1500
+    ))
+else:
+    chat_backend = None
+
+# Client dùng chung cho mọi lời gọi model: giới hạn theo quota, không ngủ trong request,
+# từ chối ngay kèm Retry-After khi quá tải, ngắt mạch sau nhiều lỗi 429 liên tiếp
+chat_model_client = ModelClient(
+    chat_backend,
+    rate_per_minute=int(os.getenv("GEMINI_RPM", "10")),
+    burst=int(os.getenv("GEMINI_BURST", "5")),
+    max_in_flight=int(os.getenv("GEMINI_MAX_IN_FLIGHT", "4"))
+) if chat_backend else None
+
+def overloaded_response(error):
+    """Phản hồi 429 kèm Retry-After (giây) khi model client từ chối"""
+    retry_after = max(1, math.ceil(error.retry_after))
+    print(f"🚦 Từ chối chat: {error.reason}, Retry-After={retry_after}s")
+    response = jsonify({
+        "error": f"Hệ thống đang quá tải. Vui lòng thử lại sau {retry_after} giây.",
+        "retry_after": retry_after
+    })
+    response.status_code = 429
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+# Dữ liệu khách sạn / đánh giá / sự kiện cho chatbot, dựng lại khi CSV đổi
+chat_context_builder = ChatContextBuilder(HOTELS_CSV, REVIEWS_CSV, EVENTS_CSV, events_catalog=event_catalog)
+
+# Cache câu trả lời Gemini (LRU + TTL); CHAT_CACHE_FILE: lưu cache xuống đĩa giữa các lần chạy
+chat_response_cache = ResponseCache(
+    max_entries=int(os.getenv("CHAT_CACHE_SIZE", "512")),
+    ttl=int(os.getenv("CHAT_CACHE_TTL", "3600")),
+    persist_path=os.getenv("CHAT_CACHE_FILE")
+)
+atexit.register(chat_response_cache.save)
+
+# Prompt chỉ chứa top-N khách sạn ứng viên, khối danh sách tối đa CHAT_CANDIDATE_TOKENS token (ước lượng)
+CHAT_TOP_CANDIDATES = int(os.getenv("CHAT_TOP_CANDIDATES", "15"))
+CHAT_CANDIDATE_TOKENS = int(os.getenv("CHAT_CANDIDATE_TOKENS", "600"))
+# Trọng số điểm ngữ cảnh ngày đi (0..1) khi chọn card khách sạn
+TRIP_DATE_WEIGHT = 5
+# Số sự kiện đang / sắp diễn ra đưa vào prompt
+CHAT_UPCOMING_EVENTS = int(os.getenv("CHAT_UPCOMING_EVENTS", "3"))
+chat_prompt_stats = PromptSizeStats()
+
+def normalize_chat_query(user_query):
+    """Câu hỏi viết thường, bỏ dấu câu, chuẩn hóa từ viết tắt"""
+    normalized = normalize_vietnamese_slang(f" {re.sub(r'[?!.,;]+', ' ', user_query.lower())} ")
+    return ' '.join(normalized.split())
+
+def chat_cache_key(user_query, query_analysis, context_info, catalog_version):
+    """Khóa cache: câu hỏi đã chuẩn hóa + thành phố/ngân sách/tiện ích + lịch sử + chữ ký file CSV"""
+    normalized = normalize_chat_query(user_query)
+    return make_cache_key(
+        normalized,
+        extract_city_from_query(normalized),
+        extract_budget_from_query(normalized),
+        sorted(extract_amenities_from_query(normalized)),
+        query_analysis['is_greeting'],
+        context_info,
+        catalog_version
+    )
 # ------------------------
 
 @app.route('/ai_chat')
 def ai_chat():
     return render_template('ai_chat_hotel.html')
 
-#  TẠO "CẦU NỐI" (API ENDPOINT) CHO AI CHAT
-@app.route('/api/chat', methods=['POST'])
-def api_chat():
-    if not model:
-        return jsonify({"error": "Gemini AI chưa được cấu hình"}), 500
-        
+def prepare_chat_turn(payload):
+    """
+    Các bước trước khi gọi model (dùng chung cho /api/chat và /api/chat/stream):
+    đọc tham số, phân tích câu hỏi, dựng prompt và khóa cache. Thiếu query -> None
+    """
+    user_query = payload.get('query')
+    if not user_query:
+        return None
+
+    conversation_history = payload.get('history', [])  # Lấy lịch sử chat
     try:
-        user_query = request.json.get('query')
-        include_hotels = request.json.get('include_hotels', True)
-        conversation_history = request.json.get('history', [])  # Lấy lịch sử chat
-        
-        if not user_query:
-            return jsonify({"error": "Missing query"}), 400
+        max_hotels = max(1, int(payload.get('max_hotels', 3)))  # Số card khách sạn muốn nhận
+    except (TypeError, ValueError):
+        max_hotels = 3
+
+    # 1. Lấy dữ liệu chat dựng sẵn (chỉ đọc lại CSV khi file thay đổi)
+    chat_context = chat_context_builder.get()
+
+    # 2. Phân tích câu hỏi THÔNG MINH HƠN
+    query_analysis = analyze_user_query(user_query, conversation_history)
+    is_greeting = query_analysis['is_greeting']
+
+    print(f"🔍 Query Analysis: {query_analysis}")
+
+    # 3. Chọn trước khách sạn ứng viên theo thành phố / ngân sách / tiện ích
+    normalized_query = normalize_chat_query(user_query)
+    query_city = extract_city_from_query(normalized_query)
+    candidate_ids, candidate_text = chat_context.candidates.select(
+        entity_resolver().values(normalized_query, 'hotel'),
+        city=query_city,
+        budget=extract_budget_from_query(normalized_query),
+        amenities=sorted(extract_amenities_from_query(normalized_query)),
+        top_n=CHAT_TOP_CANDIDATES,
+        token_budget=CHAT_CANDIDATE_TOKENS
+    )
 
-        # 1. Đọc và xử lý dữ liệu từ CSV
-        hotels_data = []
-        reviews_data = []
-        events_data = []
-        
-        try:
-            # Đọc hotels.csv
-            hotels_df = pd.read_csv("hotels.csv", encoding='utf-8-sig')
-            for _, hotel in hotels_df.iterrows():
-                hotel_info = {
-                    'name': hotel.get('name', ''),
-                    'city': hotel.get('city', ''),
-                    'district': hotel.get('district', 'Trung tâm'),
-                    'price': hotel.get('price', 'Liên hệ'),
-                    'rating': hotel.get('rating', 4.0),
-                    'amenities': hotel.get('amenities', 'WiFi, Restaurant, Pool'),
-                    'description': hotel.get('description', 'Khách sạn chất lượng với đầy đủ tiện ích')
-                }
-                hotels_data.append(hotel_info)
-            
-            # Đọc reviews.csv
-            reviews_df = pd.read_csv("reviews.csv", encoding='utf-8-sig')
-            for _, review in reviews_df.iterrows():
-                review_info = {
-                    'hotel_name': review.get('hotel_name', ''),
-                    'user': review.get('user', 'Khách hàng'),
-                    'rating': review.get('rating', 4.5),
-                    'comment': review.get('comment', 'Trải nghiệm tuyệt vời!')
-                }
-                reviews_data.append(review_info)
-            
-            # Đọc events.csv - CẢI THIỆN: Đọc đầy đủ thông tin sự kiện
-            events_df = pd.read_csv("events.csv", encoding='utf-8-sig')
-            for _, event in events_df.iterrows():
-                event_info = {
-                    'event_name': event.get('event_name', ''),
-                    'city': event.get('city', ''),
-                    'start_date': event.get('start_date', ''),
-                    'end_date': event.get('end_date', ''),
-                    'season': event.get('season', 'Không xác định'),
-                    'description': event.get('description', ''),
-                    'best_time': event.get('best_time', ''),
-                    'weather': event.get('weather', '')
-                }
-                events_data.append(event_info)
-                
-        except Exception as e:
-            print(f"Lỗi đọc CSV: {e}")
-            # Fallback data với các khách sạn mẫu
-            hotels_data = [
-                {
-                    'name': 'Sunrise Nha Trang',
-                    'city': 'Nha Trang',
-                    'district': 'Trần Phú',
-                    'price': '2,500,000 VNĐ',
-                    'rating': 4.8,
-                    'amenities': 'Pool, Spa, Beach Front, Restaurant, Bar',
-                    'description': 'Khách sạn 5 sao view biển tuyệt đẹp với hồ bơi vô cực'
-                }
-            ]
-            
-            # Fallback events data
-            events_data = [
-                {
-                    'event_name': 'Lễ hội biển Nha Trang',
-                    'city': 'Nha Trang',
-                    'start_date': '2024-06-01',
-                    'end_date': '2024-06-07',
-                    'season': 'Hè',
-                    'description': 'Lễ hội văn hóa biển với nhiều hoạt động hấp dẫn',
-                    'best_time': 'Tháng 6-8',
-                    'weather': 'Nắng đẹp, nhiệt độ 28-32°C'
-                }
-            ]
-
-        # 2. Phân tích câu hỏi THÔNG MINH HƠN
-        query_analysis = analyze_user_query(user_query, conversation_history)
-        need_hotel_recommendation = query_analysis['need_hotel_recommendation']
-        should_show_cards = query_analysis['should_show_cards']
-        is_greeting = query_analysis['is_greeting']
-        
-        print(f"🔍 Query Analysis: {query_analysis}")
+    # 4. Xây dựng prompt THÔNG MINH với CONTEXT
+    context_info = build_conversation_context(conversation_history)
+    today = datetime.now().date()
+    upcoming_events = chat_context.timeline.describe(query_city, today, limit=CHAT_UPCOMING_EVENTS)
 
-        # 3. Xây dựng prompt THÔNG MINH với CONTEXT
-        hotel_names_list = [hotel['name'] for hotel in hotels_data]
-        city_events_info = build_city_events_info(events_data)
-        context_info = build_conversation_context(conversation_history)
-        
-        system_prompt = f"""
+    system_prompt = f"""
 Bạn là trợ lý du lịch THÔNG MINH, CHUYÊN NGHIỆP. Hãy phân tích và trả lời câu hỏi MỘT CÁCH PHÙ HỢP.
 
 {context_info}
 
 THÔNG TIN DU LỊCH THEO THÀNH PHỐ (dùng để tư vấn):
-{city_events_info}
+{chat_context.city_events_info}
+
+SỰ KIỆN ĐANG / SẮP DIỄN RA (tính từ hôm nay {today:%d/%m/%Y}):
+{upcoming_events}
 
 DANH SÁCH KHÁCH SẠN THỰC TẾ (CHỈ ĐƯỢC ĐỀ XUẤT NHỮNG KHÁCH SẠN NÀY):
-{', '.join(hotel_names_list)}
+{candidate_text}
 
 QUY TẮC QUAN TRỌNG:
 1. CHỈ đề xuất khách sạn từ danh sách trên
@@ -1401,82 +1525,277 @@ KHI ĐỀ XUẤT KHÁCH SẠN:
 - Kết thúc bằng: "Đây là những khách sạn phù hợp từ hệ thống!"
 """
 
-        # 4. Gọi Gemini
-        max_retries = 2
-        for attempt in range(max_retries):
-            try:
-                full_prompt = system_prompt + f"\n\nCâu hỏi: {user_query}"
-                
-                response = model.generate_content(
-                    full_prompt,
-                    generation_config=genai.GenerationConfig(
-                        temperature=0.3,  # Giảm temperature để ít sáng tạo hơn
-                        max_output_tokens=1500
-                    )
-                )
-                ai_response = response.text
-                
-                # Clean up response
-                cleaned_response = clean_ai_response(ai_response, is_greeting, conversation_history)
-                
-                # Chuẩn bị dữ liệu trả về
-                response_data = {"response": cleaned_response}
-                
-                # Chỉ trả về hotel data khi THỰC SỰ cần thiết
-                if should_show_cards and include_hotels and need_hotel_recommendation:
-                    recommended_hotels = get_recommended_hotels_from_ai_response(
-                        hotels_data, reviews_data, user_query, cleaned_response, query_analysis
-                    )
-                    response_data["hotels"] = recommended_hotels[:3]
-                    print(f"🏨 Showing {len(recommended_hotels[:3])} hotel cards")
-                
-                return jsonify(response_data)
-                
-            except Exception as e:
-                if "quota" in str(e).lower() or "429" in str(e):
-                    if attempt < max_retries - 1:
-                        wait_time = 2 ** attempt
-                        print(f"Quota exceeded, retrying in {wait_time}s...")
-                        time.sleep(wait_time)
-                        continue
-                    else:
-                        return jsonify({"error": "Hệ thống đang quá tải. Vui lòng thử lại sau 1 phút."}), 429
-                else:
-                    raise e
-
-        return jsonify({"error": "Lỗi kết nối. Vui lòng thử lại."}), 500
+    cache_key = None
+    if chat_context.signature is not None:
+        # Chữ ký file (không phải version đếm trong process): cache lưu đĩa / worker khác vẫn đúng
+        cache_key = chat_cache_key(user_query, query_analysis, context_info, (chat_context.signature, today.isoformat()))
+
+    full_prompt = system_prompt + f"\n\nCâu hỏi: {user_query}"
+    prompt_tokens = estimate_tokens(full_prompt)
+    chat_prompt_stats.record(prompt_tokens, len(candidate_ids))
+    print(f"📏 Prompt: ~{prompt_tokens} tokens, {len(candidate_ids)} khách sạn ứng viên")
+
+    return {
+        'user_query': user_query,
+        'include_hotels': payload.get('include_hotels', True),
+        'conversation_history': conversation_history,
+        'max_hotels': max_hotels,
+        'chat_context': chat_context,
+        'query_analysis': query_analysis,
+        'full_prompt': full_prompt,
+        'cache_key': cache_key,
+        'trip_date': parse_trip_date(payload.get('trip_date')) or today
+    }
+
+def strip_greeting_enabled(turn):
+    """Có lược câu chào đầu câu trả lời không (giống điều kiện trong clean_ai_response)"""
+    return not turn['query_analysis']['is_greeting'] and len(turn['conversation_history']) > 0
+
+def select_chat_hotels(turn, cleaned_response):
+    """Chọn card khách sạn cho câu trả lời; None nếu lượt này không hiển thị card"""
+    query_analysis = turn['query_analysis']
+    # Chỉ trả về hotel data khi THỰC SỰ cần thiết
+    if not (query_analysis['should_show_cards'] and turn['include_hotels']
+            and query_analysis['need_hotel_recommendation']):
+        return None
+
+    max_hotels = turn['max_hotels']
+    hotels_data = turn['chat_context'].hotels_copy()  # bản sao: các bước lọc có gán thêm field
+    recommended_hotels = get_recommended_hotels_from_ai_response(
+        hotels_data, synced_review_index(), turn['user_query'], cleaned_response,
+        query_analysis, k=max_hotels, trip_date=turn['trip_date']
+    )
+    print(f"🏨 Showing {len(recommended_hotels[:max_hotels])} hotel cards")
+    return recommended_hotels[:max_hotels]
+
+#  TẠO "CẦU NỐI" (API ENDPOINT) CHO AI CHAT
+@app.route('/api/chat', methods=['POST'])
+def api_chat():
+    if not chat_model_client:
+        return jsonify({"error": "Gemini AI chưa được cấu hình"}), 500
+        
+    try:
+        turn = prepare_chat_turn(request.json)
+        if turn is None:
+            return jsonify({"error": "Missing query"}), 400
+
+        # 5. Gọi Gemini (câu hỏi lặp lại lấy từ cache, không tốn quota)
+        cache_key = turn['cache_key']
+        cached_response = chat_response_cache.get(cache_key) if cache_key else None
+
+        try:
+            if cached_response is not None:
+                ai_response = cached_response
+                print("⚡ Chat cache hit")
+            else:
+                ai_response = chat_model_client.generate(turn['full_prompt'])
+                if cache_key:
+                    chat_response_cache.set(cache_key, ai_response)
+        except Overloaded as e:
+            return overloaded_response(e)
+
+        # Clean up response
+        cleaned_response = clean_ai_response(
+            ai_response, turn['query_analysis']['is_greeting'], turn['conversation_history']
+        )
+
+        # Chuẩn bị dữ liệu trả về
+        response_data = {"response": cleaned_response, "cached": cached_response is not None}
+
+        hotels = select_chat_hotels(turn, cleaned_response)
+        if hotels is not None:
+            response_data["hotels"] = hotels
+
+        return jsonify(response_data)
 
     except Exception as e:
         print(f"Lỗi API chat: {e}")
         return jsonify({"response": "Hiện tại hệ thống đang gặp sự cố kỹ thuật. Tôi vẫn muốn lắng nghe và hỗ trợ bạn. Hãy thử lại sau ít phút nhé!"})
 
+# === AI CHAT DẠNG STREAM (Server-Sent Events) ===
+# Sự kiện: "chunk" {text} từng đoạn câu trả lời (đã lược câu chào) -> "hotels" {hotels} card khách sạn
+# -> "done" {response, cached} câu trả lời đầy đủ; lỗi -> "error" {error}
+@app.route('/api/chat/stream', methods=['POST'])
+def api_chat_stream():
+    if not chat_model_client:
+        return jsonify({"error": "Gemini AI chưa được cấu hình"}), 500
+
+    payload = request.json or {}
+    if not payload.get('query'):
+        return jsonify({"error": "Missing query"}), 400
+
+    # Stream model đang giữ slot (nếu có), để trả slot khi client ngắt giữa chừng
+    opened_streams = []
+
+    def generate():
+        raw_parts = []
+
+        try:
+            # Dựng prompt / xin quyền gọi model ngay trong try: mọi lỗi đều thành sự kiện "error"
+            # (không để lộ 500 trần khiến client kết nối lại)
+            turn = prepare_chat_turn(payload)
+            cache_key = turn['cache_key']
+            cached_response = chat_response_cache.get(cache_key) if cache_key else None
+            if cached_response is not None:
+                chunks = [cached_response]
+            else:
+                chunks = chat_model_client.stream(turn['full_prompt'])
+                opened_streams.append(chunks)
+
+            stripper = GreetingStripper(strip_greeting_enabled(turn))
+            for chunk in chunks:
+                raw_parts.append(chunk)
+                text = stripper.feed(chunk)
+                if text:
+                    yield sse_event('chunk', {'text': text})
+            text = stripper.finish()
+            if text:
+                yield sse_event('chunk', {'text': text})
+        except Overloaded as e:
+            print(f"Lỗi API chat stream: {e}")
+            yield sse_event('error', {'error': "Hệ thống đang quá tải. Vui lòng thử lại sau ít phút.",
+                                      'retry_after': max(1, math.ceil(e.retry_after))})
+            return
+        except Exception as e:
+            print(f"Lỗi API chat stream: {e}")
+            if "quota" in str(e).lower() or "429" in str(e):
+                yield sse_event('error', {'error': "Hệ thống đang quá tải. Vui lòng thử lại sau 1 phút."})
+            else:
+                yield sse_event('error', {'error': "Hiện tại hệ thống đang gặp sự cố kỹ thuật. Hãy thử lại sau ít phút nhé!"})
+            return
+
+        ai_response = ''.join(raw_parts)
+        if cache_key and cached_response is None:
+            chat_response_cache.set(cache_key, ai_response)
+
+        cleaned_response = clean_ai_response(
+            ai_response, turn['query_analysis']['is_greeting'], turn['conversation_history']
+        )
+        hotels = select_chat_hotels(turn, cleaned_response)
+        if hotels is not None:
+            yield sse_event('hotels', {'hotels': hotels})
+        yield sse_event('done', {'response': cleaned_response, 'cached': cached_response is not None})
+
+    response = Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+    def close_model_streams():
+        # Client ngắt khi stream chưa đọc xong: vẫn trả slot của model client
+        for model_stream in opened_streams:
+            model_stream.close()
+
+    response.call_on_close(close_model_streams)
+    return response
+
+@app.route('/api/chat/stats')
+def api_chat_stats():
+    """Thống kê chatbot: cache câu trả lời, model client, kích thước prompt"""
+    return jsonify({
+        "response_cache": chat_response_cache.stats(),
+        "prompt": chat_prompt_stats.stats(),
+        "model_client": chat_model_client.stats() if chat_model_client else None
+    })
+
 # ========== CÁC HÀM HỖ TRỢ MỚI ==========
 
+# Từ điển phân tích câu hỏi / câu trả lời - tất cả được nạp vào MỘT automaton (query_matcher)
+GREETING_KEYWORDS = ['chào', 'hello', 'hi', 'xin chào', 'hey']
+
+SPECIFIC_HOTEL_PATTERNS = [
+    'bạn biết khách sạn', 'bạn biết ks', 'bạn có biết khách sạn',
+    'bạn có biết ks', 'khách sạn này', 'ks này'
+]
+
+RECOMMENDATION_KEYWORDS = [
+    'tìm khách sạn', 'đề xuất khách sạn', 'khách sạn nào', 'ở đâu',
+    'tìm chỗ ở', 'booking', 'đặt phòng', 'recommend', 'suggest', 'hotel',
+    'nghỉ ở đâu', 'chỗ ở', 'khách sạn', 'resort', 'nhà nghỉ', 'tư vấn khách sạn',
+    'nên ở đâu', 'ở khách sạn nào'
+]
+
+SLANG_REPLACEMENTS = {
+    ' ks ': ' khách sạn ',
+    ' ko ': ' không ',
+    ' dc ': ' được ',
+    ' bt ': ' biết ',
+    ' bik ': ' biết ',
+    ' biet ': ' biết ',
+    ' ng ': ' người ',
+    ' tk ': ' tìm kiếm ',
+    ' dl ': ' du lịch ',
+}
+
+AMENITY_KEYWORDS = {
+    'hồ bơi': 'pool', 'pool': 'pool', 'bơi': 'pool',
+    'spa': 'spa', 'massage': 'spa',
+    'gym': 'gym', 'fitness': 'gym', 'thể hình': 'gym',
+    'nhà hàng': 'restaurant', 'restaurant': 'restaurant',
+    'bar': 'bar', 'quầy bar': 'bar',
+    'biển': 'beach', 'beach': 'beach', 'view biển': 'beach'
+}
+
+# Thứ tự ưu tiên khi câu hỏi khớp nhiều loại
+HOTEL_TYPE_KEYWORDS = {
+    'luxury': ['sang trọng', 'luxury', '5 sao', 'năm sao', 'cao cấp'],
+    'budget': ['bình dân', 'budget', 'giá rẻ', 'tiết kiệm', '2 sao', '3 sao'],
+    'midrange': ['trung bình', 'mid-range', '4 sao'],
+}
+
+DENIAL_PHRASES = [
+    'không tìm thấy', 'không có', 'chưa có', 'hiện không',
+    'không thể', 'chưa thể', 'xin lỗi', 'rất tiếc',
+    'không đề xuất', 'không recommend', 'không phù hợp'
+]
+
+HOTEL_MENTION_PHRASES = [
+    'khách sạn', 'resort', 'hotel', 'đề xuất', 'gợi ý',
+    'sau đây', 'các lựa chọn', 'bạn có thể', 'nên chọn',
+    'phù hợp', 'tốt nhất'
+]
+
+CITY_VARIATIONS = {
+    'nha trang': ['nha trang', 'nhatrang'],
+    'hồ chí minh': ['hồ chí minh', 'sài gòn', 'thành phố hồ chí minh'],
+    'hà nội': ['hà nội', 'hanoi'],
+    'đà nẵng': ['đà nẵng', 'danang']
+}
+
+query_matcher = KeywordMatcher({
+    'greeting': GREETING_KEYWORDS,
+    'specific_hotel': SPECIFIC_HOTEL_PATTERNS,
+    'recommendation': RECOMMENDATION_KEYWORDS,
+    'slang': SLANG_REPLACEMENTS,
+    'amenity': AMENITY_KEYWORDS,
+    'hotel_type': {kw: hotel_type for hotel_type, kws in HOTEL_TYPE_KEYWORDS.items() for kw in kws},
+    'denial': DENIAL_PHRASES,
+    'hotel_mention': HOTEL_MENTION_PHRASES,
+    'city_variation': {var: city for city, variations in CITY_VARIATIONS.items() for var in variations},
+}).build()
+
+@lru_cache(maxsize=1024)
+def query_tags(text):
+    """Mọi từ khóa khớp trong text, 1 lần duyệt automaton: {nhóm: {từ khóa: giá trị}} (chỉ đọc)"""
+    return query_matcher.tag(text)
+
 def analyze_user_query(user_query, conversation_history):
     """Phân tích câu hỏi người dùng THÔNG MINH HƠN"""
     query_lower = user_query.lower()
     
     # Chuẩn hóa từ viết tắt
     normalized_query = normalize_vietnamese_slang(query_lower)
+    tags = query_tags(normalized_query)
     
     # Kiểm tra chào hỏi (chỉ chào khi bắt đầu)
-    is_greeting = any(word in normalized_query for word in [
-        'chào', 'hello', 'hi', 'xin chào', 'hey'
-    ]) and len(conversation_history) == 0
+    is_greeting = 'greeting' in tags and len(conversation_history) == 0
     
     # Kiểm tra câu hỏi về khách sạn cụ thể (không hiển thị card)
-    is_specific_hotel_inquiry = any(pattern in normalized_query for pattern in [
-        'bạn biết khách sạn', 'bạn biết ks', 'bạn có biết khách sạn', 
-        'bạn có biết ks', 'khách sạn này', 'ks này'
-    ])
+    is_specific_hotel_inquiry = 'specific_hotel' in tags
     
     # Kiểm tra cần đề xuất khách sạn
-    need_hotel_recommendation = any(keyword in normalized_query for keyword in [
-        'tìm khách sạn', 'đề xuất khách sạn', 'khách sạn nào', 'ở đâu',
-        'tìm chỗ ở', 'booking', 'đặt phòng', 'recommend', 'suggest', 'hotel',
-        'nghỉ ở đâu', 'chỗ ở', 'khách sạn', 'resort', 'nhà nghỉ', 'tư vấn khách sạn',
-        'nên ở đâu', 'ở khách sạn nào'
-    ]) and not is_specific_hotel_inquiry
+    need_hotel_recommendation = 'recommendation' in tags and not is_specific_hotel_inquiry
     
     # Quyết định hiển thị card
     should_show_cards = need_hotel_recommendation and not is_specific_hotel_inquiry
@@ -1490,54 +1809,8 @@ def analyze_user_query(user_query, conversation_history):
     }
 
 def normalize_vietnamese_slang(text):
-    """Chuẩn hóa từ viết tắt tiếng Việt"""
-    replacements = {
-        ' ks ': ' khách sạn ',
-        ' ko ': ' không ',
-        ' dc ': ' được ',
-        ' bt ': ' biết ',
-        ' bik ': ' biết ',
-        ' biet ': ' biết ',
-        ' ng ': ' người ',
-        ' tk ': ' tìm kiếm ',
-        ' dl ': ' du lịch ',
-    }
-    
-    normalized = text
-    for short, full in replacements.items():
-        normalized = normalized.replace(short, full)
-    
-    return normalized
-
-def build_city_events_info(events_data):
-    """Xây dựng thông tin sự kiện theo thành phố"""
-    if not events_data:
-        return "Hiện chưa có thông tin sự kiện."
-    
-    city_events = {}
-    for event in events_data:
-        city = event.get('city', '')
-        if city not in city_events:
-            city_events[city] = []
-        
-        event_info = f"- {event.get('event_name', '')}"
-        if event.get('season'):
-            event_info += f" (Mùa: {event.get('season')})"
-        if event.get('best_time'):
-            event_info += f" - Thời gian tốt: {event.get('best_time')}"
-        if event.get('weather'):
-            event_info += f" - Thời tiết: {event.get('weather')}"
-        if event.get('description'):
-            event_info += f" - {event.get('description')}"
-            
-        city_events[city].append(event_info)
-    
-    result = []
-    for city, events in city_events.items():
-        result.append(f"{city}:")
-        result.extend(events)
-    
-    return "\n".join(result) if result else "Hiện chưa có thông tin sự kiện."
+    """Chuẩn hóa từ viết tắt tiếng Việt (SLANG_REPLACEMENTS, 1 lần duyệt)"""
+    return query_matcher.replace(text, 'slang')
 
 def build_conversation_context(conversation_history):
     """Xây dựng context từ lịch sử hội thoại"""
@@ -1563,11 +1836,7 @@ def clean_ai_response(ai_response, is_greeting, conversation_history):
     
     # Nếu không phải là lời chào đầu tiên, loại bỏ các câu chào không cần thiết
     if not is_greeting and len(conversation_history) > 0:
-        greeting_patterns = [
-            'xin chào', 'chào bạn', 'chào mừng', 'hello', 'hi ',
-            'rất vui được gặp bạn', 'chào anh', 'chào chị'
-        ]
-        for pattern in greeting_patterns:
+        for pattern in GREETING_PATTERNS:
             if cleaned.lower().startswith(pattern):
                 # Tìm vị trí kết thúc lời chào
                 sentences = cleaned.split('.')
@@ -1580,7 +1849,7 @@ def clean_ai_response(ai_response, is_greeting, conversation_history):
     
     return cleaned
 
-def get_recommended_hotels_from_ai_response(hotels_data, reviews_data, user_query, ai_response, query_analysis):
+def get_recommended_hotels_from_ai_response(hotels_data, review_index, user_query, ai_response, query_analysis, k=3, trip_date=None):
     """Lấy khách sạn được đề xuất với độ chính xác cao - FIX ĐỒNG BỘ HOÀN TOÀN"""
     
     print(f"🔍 AI Response: {ai_response}")
@@ -1599,47 +1868,30 @@ def get_recommended_hotels_from_ai_response(hotels_data, reviews_data, user_quer
         target_city = extract_city_from_query(ai_response.lower())
         print(f"🔍 Extracted city from AI response: {target_city}")
     
-    # 2. TÌM KHÁCH SẠN ĐƯỢC AI NHẮC ĐẾN CỤ THỂ
+    # 2. TÌM KHÁCH SẠN ĐƯỢC AI NHẮC ĐẾN CỤ THỂ (tên đầy đủ hoặc tên bỏ từ chung, chịu lỗi gõ)
     mentioned_hotels = []
-    ai_response_lower = ai_response.lower()
+    mentioned_names = set(entity_resolver().values(ai_response, 'hotel'))
     
     for hotel in hotels_data:
         hotel_name = hotel['name']
-        hotel_name_lower = hotel_name.lower()
         hotel_city = hotel.get('city', '').lower().strip()
         
         # KIỂM TRA QUAN TRỌNG: Thành phố phải khớp
         if target_city and hotel_city != target_city.lower():
             continue  # Bỏ qua nếu không cùng thành phố
         
-        # Tìm khách sạn được AI đề cập trong response
-        name_found = False
-        
-        # Kiểm tra tên đầy đủ
-        if hotel_name_lower in ai_response_lower:
-            name_found = True
-        else:
-            # Kiểm tra từ khóa chính trong tên (loại bỏ từ chung)
-            name_parts = [part for part in hotel_name_lower.split() 
-                         if part not in ['khách', 'sạn', 'hotel', 'resort', '&', 'and', 'central'] and len(part) > 2]
-            
-            for part in name_parts:
-                if part in ai_response_lower:
-                    name_found = True
-                    break
-        
-        if name_found:
+        if hotel_name in mentioned_names:
             # Thêm review nếu có
-            hotel_reviews = [r for r in reviews_data if r['hotel_name'] == hotel_name]
-            if hotel_reviews:
-                hotel['review'] = hotel_reviews[0]
+            first_review = review_index.first(hotel_name)
+            if first_review:
+                hotel['review'] = first_review
             
             mentioned_hotels.append(hotel)
             print(f"✅ Found AI-mentioned hotel: {hotel_name} in {hotel_city}")
     
     if mentioned_hotels:
         print(f"🎯 Using {len(mentioned_hotels)} AI-mentioned hotels: {[h['name'] for h in mentioned_hotels]}")
-        return mentioned_hotels[:3]
+        return mentioned_hotels[:k]
     
     # 3. NẾU KHÔNG TÌM THẤY KHÁCH SẠN ĐƯỢC NHẮC, DÙNG THUẬT TOÁN THÔNG MINH CÓ RÀNG BUỘC THÀNH PHỐ
     print("🔄 No AI-mentioned hotels found, using smart filtering with city constraint")
@@ -1658,16 +1910,16 @@ def get_recommended_hotels_from_ai_response(hotels_data, reviews_data, user_quer
     
     print(f"🔍 Final target city: {target_city}")
     
-    filtered_hotels = smart_hotel_filtering_with_city_constraint(hotels_data, reviews_data, user_query, query_analysis, target_city)
+    filtered_hotels = smart_hotel_filtering_with_city_constraint(hotels_data, review_index, user_query, query_analysis, target_city, k=k, trip_date=trip_date)
     
     # 4. QUAN TRỌNG: Kiểm tra xem có nên hiển thị card không
     if filtered_hotels and should_show_hotel_cards(ai_response, filtered_hotels, target_city):
-        return filtered_hotels[:3]
+        return filtered_hotels[:k]
     
     print("🚫 Hotel cards don't match AI content - hiding cards")
     return []
 
-def smart_hotel_filtering_with_city_constraint(hotels_data, reviews_data, user_query, query_analysis, target_city):
+def smart_hotel_filtering_with_city_constraint(hotels_data, review_index, user_query, query_analysis, target_city, k=3, trip_date=None):
     """Lọc khách sạn thông minh với ràng buộc thành phố CHẶT CHẼ"""
     query_lower = query_analysis.get('normalized_query', user_query.lower())
     scored_hotels = []
@@ -1722,20 +1974,19 @@ def smart_hotel_filtering_with_city_constraint(hotels_data, reviews_data, user_q
         score += hotel_rating * 0.5
         
         # Thêm review nếu có
-        hotel_reviews = [r for r in reviews_data if r['hotel_name'] == hotel['name']]
-        if hotel_reviews:
-            hotel['review'] = hotel_reviews[0]
+        first_review = review_index.first(hotel['name'])
+        if first_review:
+            hotel['review'] = first_review
             score += 2
         
         hotel['match_score'] = score
         scored_hotels.append(hotel)
         print(f"📊 Added to results: {hotel['name']} in {hotel_city} - Score: {score}")
     
-    # Sắp xếp theo điểm
-    scored_hotels.sort(key=lambda x: x.get('match_score', 0), reverse=True)
-    
+    # Chọn top-k theo điểm (không sort toàn bộ), hòa điểm giữ thứ tự gốc
     if scored_hotels:
-        result = scored_hotels[:3]
+        top_idx = top_k([h.get('match_score', 0) for h in scored_hotels], k)
+        result = [scored_hotels[i] for i in top_idx]
         print(f"🏨 Final filtered hotels: {[f'{h['name']} ({h.get('city', 'Unknown')}) - {h.get('match_score', 0):.1f}' for h in result]}")
         return result
     
@@ -1744,41 +1995,22 @@ def smart_hotel_filtering_with_city_constraint(hotels_data, reviews_data, user_q
 
 def should_show_hotel_cards(ai_response, filtered_hotels, target_city):
     """Kiểm tra xem có nên hiển thị card khách sạn không - CẢI THIỆN"""
-    ai_lower = ai_response.lower()
+    ai_tags = query_matcher.tag(ai_response.lower())
     
-    # Kiểm tra nếu AI đang từ chối hoặc nói không có khách sạn
-    denial_phrases = [
-        'không tìm thấy', 'không có', 'chưa có', 'hiện không',
-        'không thể', 'chưa thể', 'xin lỗi', 'rất tiếc',
-        'không đề xuất', 'không recommend', 'không phù hợp'
-    ]
-    
-    if any(phrase in ai_lower for phrase in denial_phrases):
+    # Kiểm tra nếu AI đang từ chối hoặc nói không có khách sạn (DENIAL_PHRASES)
+    if 'denial' in ai_tags:
         return False
     
-    # Kiểm tra nếu AI đang đề cập đến khách sạn hoặc thành phố mục tiêu
-    hotel_mention_phrases = [
-        'khách sạn', 'resort', 'hotel', 'đề xuất', 'gợi ý',
-        'sau đây', 'các lựa chọn', 'bạn có thể', 'nên chọn',
-        'phù hợp', 'tốt nhất'
-    ]
-    
-    # Kiểm tra đề cập đến thành phố mục tiêu
+    # Kiểm tra đề cập đến thành phố mục tiêu (CITY_VARIATIONS)
     city_mentioned = False
     if target_city:
-        city_variations = {
-            'nha trang': ['nha trang', 'nhatrang'],
-            'hồ chí minh': ['hồ chí minh', 'sài gòn', 'thành phố hồ chí minh'],
-            'hà nội': ['hà nội', 'hanoi'],
-            'đà nẵng': ['đà nẵng', 'danang']
-        }
-        
-        for city_key, variations in city_variations.items():
+        for city_key in CITY_VARIATIONS:
             if city_key in target_city.lower():
-                city_mentioned = any(var in ai_lower for var in variations)
+                city_mentioned = city_key in ai_tags.get('city_variation', {}).values()
                 break
     
-    has_hotel_mentions = any(phrase in ai_lower for phrase in hotel_mention_phrases)
+    # Kiểm tra nếu AI đang đề cập đến khách sạn (HOTEL_MENTION_PHRASES)
+    has_hotel_mentions = 'hotel_mention' in ai_tags
     
     print(f"🔍 Should show cards - Hotel mentions: {has_hotel_mentions}, City mentioned: {city_mentioned}")
     
@@ -1788,19 +2020,9 @@ def normalize_city_name(city_name):
     """Chuẩn hóa tên thành phố để so sánh"""
     if not city_name:
         return ""
-    
-    city_mapping = {
-        'hà nội': 'Hanoi', 'hanoi': 'Hanoi',
-        'đà nẵng': 'Da Nang', 'danang': 'Da Nang', 
-        'nha trang': 'Nha Trang', 'nhatrang': 'Nha Trang',
-        'hồ chí minh': 'Ho Chi Minh', 'ho chi minh': 'Ho Chi Minh',
-        'sài gòn': 'Ho Chi Minh'
-    }
-    
-    city_lower = city_name.lower().strip()
-    return city_mapping.get(city_lower, city_name)
+    return entity_resolver().best(city_name, 'city') or city_name
 
-def smart_hotel_filtering_with_city_constraint(hotels_data, reviews_data, user_query, query_analysis, target_city):
+def smart_hotel_filtering_with_city_constraint(hotels_data, review_index, user_query, query_analysis, target_city, k=3, trip_date=None):
     """Lọc khách sạn thông minh với ràng buộc thành phố - FIXED VERSION"""
     query_lower = query_analysis.get('normalized_query', user_query.lower())
     scored_hotels = []
@@ -1810,10 +2032,15 @@ def smart_hotel_filtering_with_city_constraint(hotels_data, reviews_data, user_q
     amenities_needed = extract_amenities_from_query(query_lower)
     hotel_type = extract_hotel_type_from_query(query_lower)
     
+    # Độ liên quan (BM25) giữa câu hỏi và mô tả/đánh giá của từng khách sạn
+    text_relevance = review_search().relevance(query_lower, [h['name'] for h in hotels_data])
+    # Điểm ngữ cảnh ngày đi (sự kiện / mùa) tra từ bảng tính sẵn
+    trip_boosts = trip_date_boosts([h['name'] for h in hotels_data], trip_date)
+    
     print(f"🔍 Smart filtering with city constraint - City: {target_city}")
     print(f"🔍 Available hotels in target city: {[h['name'] for h in hotels_data if h.get('city', '').lower() == target_city.lower()]}")
     
-    for hotel in hotels_data:
+    for hotel, relevance, trip_boost in zip(hotels_data, text_relevance, trip_boosts):
         hotel_city = hotel.get('city', '').strip()
         
         # Sử dụng hàm chuẩn hóa để so sánh
@@ -1859,21 +2086,26 @@ def smart_hotel_filtering_with_city_constraint(hotels_data, reviews_data, user_q
         # Điểm cho đánh giá
         score += hotel_rating * 0.5
         
+        # Điểm cho mô tả/đánh giá khớp câu hỏi (vd. "gần chợ đêm")
+        score += 6 * float(relevance)
+        
+        # Điểm cho ngày đi (khách sạn gần sự kiện / hợp mùa vào ngày đó)
+        score += TRIP_DATE_WEIGHT * trip_boost
+        
         # Thêm review nếu có
-        hotel_reviews = [r for r in reviews_data if r['hotel_name'] == hotel['name']]
-        if hotel_reviews:
-            hotel['review'] = hotel_reviews[0]
+        first_review = review_index.first(hotel['name'])
+        if first_review:
+            hotel['review'] = first_review
             score += 2
         
         hotel['match_score'] = score
         scored_hotels.append(hotel)
         print(f"📊 Added to results: {hotel['name']} in {hotel_city} - Score: {score}")
     
-    # Sắp xếp theo điểm
-    scored_hotels.sort(key=lambda x: x.get('match_score', 0), reverse=True)
-    
+    # Chọn top-k theo điểm (không sort toàn bộ), hòa điểm giữ thứ tự gốc
     if scored_hotels:
-        result = scored_hotels[:3]
+        top_idx = top_k([h.get('match_score', 0) for h in scored_hotels], k)
+        result = [scored_hotels[i] for i in top_idx]
         print(f"🏨 Final filtered hotels: {[f'{h['name']} ({h.get('city', 'Unknown')}) - {h.get('match_score', 0):.1f}' for h in result]}")
         return result
     
@@ -1882,26 +2114,8 @@ def smart_hotel_filtering_with_city_constraint(hotels_data, reviews_data, user_q
 
 # Giữ nguyên các hàm extract_* từ bản trước
 def extract_city_from_query(query):
-    """Trích xuất thành phố từ query - FIXED VERSION"""
-    city_mapping = {
-        'hà nội': 'Hanoi', 'hanoi': 'Hanoi', 'ha noi': 'Hanoi',
-        'đà nẵng': 'Da Nang', 'danang': 'Da Nang', 'da nang': 'Da Nang',
-        'nha trang': 'Nha Trang', 'nhatrang': 'Nha Trang',
-        'hồ chí minh': 'Ho Chi Minh', 'sài gòn': 'Ho Chi Minh', 
-        'ho chi minh': 'Ho Chi Minh', 'hcm': 'Ho Chi Minh',
-        'tp.hcm': 'Ho Chi Minh', 'tphcm': 'Ho Chi Minh'
-    }
-    
-    query_lower = query.lower()
-    
-    # Tìm thành phố với độ ưu tiên cao (từ dài trước)
-    sorted_cities = sorted(city_mapping.keys(), key=len, reverse=True)
-    
-    for keyword in sorted_cities:
-        if keyword in query_lower:
-            return city_mapping[keyword]
-    
-    return None
+    """Trích xuất thành phố từ query (chịu được lỗi gõ / thiếu dấu: 'da nag' -> 'Da Nang')"""
+    return entity_resolver().best(query, 'city')
 
 def extract_budget_from_query(query):
     """Trích xuất khoảng ngân sách từ query"""
@@ -1918,31 +2132,15 @@ def extract_budget_from_query(query):
     return (1000000, 5000000)
 
 def extract_amenities_from_query(query):
-    """Trích xuất tiện ích từ query"""
-    amenities = []
-    amenity_mapping = {
-        'hồ bơi': 'pool', 'pool': 'pool', 'bơi': 'pool',
-        'spa': 'spa', 'massage': 'spa',
-        'gym': 'gym', 'fitness': 'gym', 'thể hình': 'gym',
-        'nhà hàng': 'restaurant', 'restaurant': 'restaurant',
-        'bar': 'bar', 'quầy bar': 'bar',
-        'biển': 'beach', 'beach': 'beach', 'view biển': 'beach'
-    }
-    
-    for keyword, amenity in amenity_mapping.items():
-        if keyword in query:
-            amenities.append(amenity)
-    
-    return list(set(amenities))
+    """Trích xuất tiện ích từ query (AMENITY_KEYWORDS)"""
+    return list(set(query_tags(query).get('amenity', {}).values()))
 
 def extract_hotel_type_from_query(query):
-    """Trích xuất loại khách sạn từ query"""
-    if any(word in query for word in ['sang trọng', 'luxury', '5 sao', 'năm sao', 'cao cấp']):
-        return 'luxury'
-    elif any(word in query for word in ['bình dân', 'budget', 'giá rẻ', 'tiết kiệm', '2 sao', '3 sao']):
-        return 'budget'
-    elif any(word in query for word in ['trung bình', 'mid-range', '4 sao']):
-        return 'midrange'
+    """Trích xuất loại khách sạn từ query (HOTEL_TYPE_KEYWORDS)"""
+    found = set(query_tags(query).get('hotel_type', {}).values())
+    for hotel_type in HOTEL_TYPE_KEYWORDS:
+        if hotel_type in found:
+            return hotel_type
     return None
 
 def extract_price_value(price_str):
@@ -1997,23 +2195,7 @@ def event_user_info():
     used_spins = get_used_spins(username)
     
     # Lấy lịch sử đặt phòng trong thời gian sự kiện
-    event_bookings = []
-    if os.path.exists(BOOKINGS_CSV):
-        with open(BOOKINGS_CSV, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                if row['username'] == username and row['status'] == 'completed':
-                    try:
-                        booking_time = datetime.strptime(row['booking_time'], '%Y-%m-%d %H:%M:%S')
-                        if (booking_time.year == datetime.now().year and 
-                            EVENT_CONFIG['start_month'] <= booking_time.month <= EVENT_CONFIG['end_month']):
-                            event_bookings.append({
-                                'hotel': row['hotel_name'],
-                                'amount': float(row['price']),
-                                'date': row['booking_time']
-                            })
-                    except:
-                        continue
+    event_bookings = event_ledger.event_bookings(username, datetime.now().year)
     
     return jsonify({
         'username': username,
@@ -2030,8 +2212,47 @@ def event_user_info():
 
 @app.route('/event')
 def event_page():
-    """Trang thông tin sự kiện"""
-    return render_template('event.html')
+    """Trang thông tin sự kiện (kèm danh sách sự kiện có tọa độ để tìm khách sạn gần đó)"""
+    events = []
+    if geo_search_available():
+        events = [event for event in event_timeline().events
+                  if math.isfinite(event.lat) and math.isfinite(event.lon)]
+    events.sort(key=lambda event: (event.start, event.index))
+    return render_template('event.html', events=events,
+                           default_radius_km=NEARBY_RADIUS_KM, max_radius_km=MAX_RADIUS_KM)
+
+@app.route('/event/nearby-hotels')
+def event_nearby_hotels():
+    """Khách sạn gần một sự kiện trong events.csv: /event/nearby-hotels?event_id=2&radius_km=5&limit=10"""
+    if not geo_search_available():
+        return jsonify({"error": "Chưa có tọa độ khách sạn (thêm cột lat/lon vào hotels.csv)"}), 503
+    event = event_timeline().find(request.args.get('event_id', ''))
+    if event is None:
+        return jsonify({"error": "Không tìm thấy sự kiện"}), 404
+    if not (math.isfinite(event.lat) and math.isfinite(event.lon)):
+        return jsonify({"error": "Sự kiện chưa có tọa độ"}), 400
+
+    radius_km = parse_radius(request.args.get('radius_km'))
+    if radius_km is None:
+        return jsonify({"error": f"radius_km phải là số km lớn hơn 0 và không quá {MAX_RADIUS_KM:g}"}), 400
+    try:
+        limit = min(50, max(1, int(request.args.get('limit', 10))))
+    except ValueError:
+        limit = 10
+
+    hotels = [
+        {
+            "name": h['name'], "city": h.get('city'), "price": h.get('price'), "stars": h.get('stars'),
+            "distance_km": h['distance_km'], "url": url_for('hotel_detail', name=h['name'])
+        }
+        for h in nearby_hotels(event.lat, event.lon, radius_km=radius_km, limit=limit)
+    ]
+    return jsonify({
+        "event": {"event_id": event.event_id, "name": event.name, "city": event.city,
+                  "start_date": event.start.isoformat(), "end_date": event.end.isoformat()},
+        "radius_km": radius_km,
+        "hotels": hotels
+    })
 
 @app.route('/event/check-eligibility')
 def check_eligibility():
@@ -2078,23 +2299,7 @@ def check_eligibility():
 
 def check_event_bookings(username):
     """Kiểm tra user có booking trong thời gian sự kiện không"""
-    if not os.path.exists(BOOKINGS_CSV):
-        return False
-    
-    current_year = datetime.now().year
-    
-    with open(BOOKINGS_CSV, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            if row['username'] == username and row['status'].lower() == 'completed':
-                try:
-                    booking_time = datetime.strptime(row['booking_time'], '%Y-%m-%d %H:%M:%S')
-                    if (booking_time.year == current_year and 
-                        EVENT_CONFIG['start_month'] <= booking_time.month <= EVENT_CONFIG['end_month']):
-                        return True
-                except:
-                    continue
-    return False
+    return event_ledger.has_event_bookings(username, datetime.now().year)
 
 @app.route('/event/spin-wheel', methods=['POST'])
 def spin_wheel():
@@ -2146,27 +2351,38 @@ def spin_wheel():
 
 init_event_files()
 
+repo.bootstrap({
+    'bookings': lambda: csv_rows(BOOKINGS_CSV),
+    'reviews': lambda: csv_rows(REVIEWS_CSV),
+    'event_spins': lambda: csv_rows(EVENT_SPINS_CSV),
+    'event_prizes': lambda: csv_rows(EVENT_PRIZES_CSV),
+})
+# Đánh giá gom theo khách sạn (số lượt / điểm trung bình); synced_review_index() nạp thêm dòng mới từ DB
+review_index = ReviewIndex(repo.reviews_since(0))
+
 # =======================================================
 # 💰 MODULE THANH TOÁN TỰ ĐỘNG (WEBHOOK & CSV)
 # =======================================================
 
 payment_memory_db = {}
 
+def find_booking_by_code(booking_code):
+    """Tra cứu booking theo mã (index DB); nhận cả mã kèm tiền tố trong nội dung CK (VD: BOOK_12345678)"""
+    booking = repo.find_booking(booking_code)
+    if booking is None and booking_code.upper().startswith('BOOK'):
+        booking = repo.find_booking(booking_code[4:].lstrip('_'))
+    return booking
+
 def update_booking_csv_real(booking_code, amount):
-    """Cập nhật trạng thái Paid vào file CSV"""
+    """Cập nhật trạng thái Paid cho đơn (UPDATE 1 dòng trong DB, không ghi lại CSV)"""
     try:
-        if os.path.exists(BOOKINGS_CSV):
-            df = pd.read_csv(BOOKINGS_CSV, encoding='utf-8-sig')
-            # Tìm dòng có mã đơn (Ví dụ: BOOK_12345)
-            mask = df.apply(lambda row: row.astype(str).str.contains(booking_code).any(), axis=1)
-            
-            if mask.any():
-                df.loc[mask, 'status'] = 'PAID'
-                df.to_csv(BOOKINGS_CSV, index=False, encoding='utf-8-sig')
-                print(f"✅ Đã nhận {amount}đ. Đơn {booking_code} -> PAID")
-                return True
+        booking = find_booking_by_code(booking_code)
+        if booking:
+            repo.update_booking(booking['booking_code'], status='PAID')
+            print(f"✅ Đã nhận {amount}đ. Đơn {booking_code} -> PAID")
+            return True
     except Exception as e:
-        print(f"❌ Lỗi ghi file: {e}")
+        print(f"❌ Lỗi ghi DB: {e}")
     return False
 
 # 1. API WEBHOOK (Cái này quan trọng nhất!)
@@ -2204,15 +2420,15 @@ def webhook_payment():
 
 # 2. API CHECK TRẠNG THÁI (Cho web khách hỏi liên tục)
 @app.route('/api/check_status')
-def check_status(booking_code):
+def check_status():
+    booking_code = request.args.get('code', '').strip()
     status = payment_memory_db.get(booking_code, 'pending')
     
-    # Nếu RAM chưa có, check kỹ trong CSV lần nữa cho chắc
-    if status == 'pending' and os.path.exists(BOOKINGS_CSV):
+    # Nếu RAM chưa có, tra lại trong DB (1 lần tìm theo index) cho chắc
+    if status == 'pending' and booking_code:
         try:
-            df = pd.read_csv(BOOKINGS_CSV, encoding='utf-8-sig')
-            mask = df.apply(lambda row: row.astype(str).str.contains(booking_code).any(), axis=1)
-            if mask.any() and df.loc[mask, 'status'].values[0] == 'PAID':
+            booking = find_booking_by_code(booking_code)
+            if booking and booking.get('status') == 'PAID':
                 status = 'PAID'
                 payment_memory_db[booking_code] = 'PAID'
         except: pass
@@ -0,0 +1,87 @@
+import io
+import time
+import contextlib
+
+import numpy as np
+import pandas as pd
+
+from modules.recommend import calculate_scores_and_explain, ScoringMatrices, feature_scores, review_keywords
+
+# =============================
+# BENCHMARK: tính điểm gợi ý với 10k và 100k khách sạn
+# Chạy: python bench_recommend.py
+# =============================
+
+SIZES = [10_000, 100_000]
+REPEAT = 3
+PREFS = {
+    'min_stars': 3,
+    'pool': True,
+    'sea': True,
+    'buffet': True,
+    'text': 'gần biển, yên tĩnh, dịch vụ tốt',
+    'text_query': 'giá rẻ, view đẹp'
+}
+
+
+def make_catalog(n):
+    """Nhân bản hotels.csv thành catalog giả lập n dòng"""
+    base = pd.read_csv("hotels.csv")
+    rng = np.random.default_rng(42)
+    df = base.sample(n, replace=True, random_state=42).reset_index(drop=True)
+    df['gym'] = rng.random(n) > 0.5
+    df['spa'] = rng.random(n) > 0.5
+    df['rating'] = np.round(rng.uniform(3, 5, n), 1)
+    return df
+
+
+def legacy_scores(df, all_prefs):
+    """Cách tính cũ: apply theo từng tiện nghi + str.contains cho từng từ khóa"""
+    df_scored = df.copy()
+    df_scored = df_scored[df_scored['stars'] >= all_prefs['min_stars']].copy()
+    df_scored['recommend_score'] = df_scored['rating'] * 3
+    for feature, score in feature_scores.items():
+        if all_prefs.get(feature, False):
+            df_scored['recommend_score'] += df_scored[feature].apply(lambda has: score if has else -2)
+    combined_text = all_prefs['text'] + " " + all_prefs['text_query']
+    text_score = 0
+    if 'rẻ' in combined_text:
+        df_scored['recommend_score'] += (1 / df_scored['price']) * 1000000
+    for keywords in review_keywords.values():
+        if any(keyword in combined_text for keyword in keywords):
+            for keyword in keywords:
+                text_score += df_scored['review'].str.contains(keyword, case=False, na=False) * 6
+    if 'biển' in all_prefs['text']:
+        text_score += df_scored['sea'].apply(lambda has_sea: 10 if has_sea else -3)
+    if 'yên tĩnh' in all_prefs['text']:
+        text_score += df_scored['review'].str.contains('yên tĩnh|thoải mái', case=False).apply(lambda x: 5 if x else 0)
+    if 'dịch vụ' in all_prefs['text']:
+        text_score += df_scored['review'].str.contains('dịch vụ|thân thiện', case=False).apply(lambda x: 4 if x else 0)
+    df_scored['recommend_score'] += text_score
+    return df_scored.sort_values(by="recommend_score", ascending=False)
+
+
+def best_of(fn):
+    best = None
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000
+
+
+if __name__ == "__main__":
+    for n in SIZES:
+        df = make_catalog(n)
+
+        start = time.perf_counter()
+        matrices = ScoringMatrices(df)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            legacy_ms = best_of(lambda: legacy_scores(df, PREFS))
+            vector_ms = best_of(lambda: calculate_scores_and_explain(df, PREFS, matrices=matrices))
+
+        print(f"{n:>7,} khách sạn | cũ: {legacy_ms:8.1f} ms | vector: {vector_ms:7.1f} ms "
+              f"| nhanh hơn x{legacy_ms / vector_ms:5.1f} | build ma trận (1 lần): {build_ms:7.1f} ms")
@@ -0,0 +1,47 @@
+import argparse
+import time
+
+import pandas as pd
+
+from modules.review_analysis import SentimentService
+
+# =============================
+# BENCHMARK: số đánh giá/giây của SentimentService trên CPU
+# Chạy: python bench_sentiment.py [--n 512] [--batch-sizes 1 8 32]
+# So sánh fp32 và int8 (lượng tử hóa động), không dùng cache kết quả
+# =============================
+
+
+def load_texts(n):
+    """
+    Lặp lại comment trong reviews.csv cho đủ n câu, thêm số thứ tự để câu nào cũng khác nhau
+    (analyze() gộp các câu trùng nhau kể cả khi use_cache=False, lặp nguyên văn sẽ đo sai tốc độ)
+    """
+    comments = pd.read_csv("reviews.csv", encoding="utf-8-sig")["comment"].dropna().astype(str).tolist()
+    return [f"{comments[i % len(comments)]} #{i}" for i in range(n)]
+
+
+def reviews_per_second(service, texts):
+    service.analyze(texts[:service.batch_size], use_cache=False)   # làm nóng (nạp model)
+    started = time.perf_counter()
+    service.analyze(texts, use_cache=False)
+    return len(texts) / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=512)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32])
+    args = parser.parse_args()
+
+    texts = load_texts(args.n)
+    print(f"{'mode':<6} {'batch':>6} {'reviews/s':>10}")
+    for quantize in (False, True):
+        for batch_size in args.batch_sizes:
+            service = SentimentService(batch_size=batch_size, quantize=quantize)
+            rate = reviews_per_second(service, texts)
+            print(f"{'int8' if quantize else 'fp32':<6} {batch_size:>6} {rate:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,55 +1,16 @@
 import pandas as pd
-import sqlite3
 
-# ---- ??c d? li?u CSV ----
-csv_file = "hotels.csv"   # ??t file CSV c?a b?n cng th? m?c v?i file Python
-df = pd.read_csv(csv_file)
+from modules.catalog import normalize_hotels
+from modules.database import HotelRepository
 
-# ---- K?t n?i / t?o database ----
-conn = sqlite3.connect("hotel.db")
-cursor = conn.cursor()
+# ---- Đọc dữ liệu CSV ----
+csv_file = "hotels.csv"   # Đặt file CSV cùng thư mục với file Python
+df = normalize_hotels(pd.read_csv(csv_file, encoding="utf-8-sig"))
 
-# ---- T?o b?ng (n?u ch?a c) ----
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS hotels (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    name TEXT,
-    city TEXT,
-    price REAL,
-    stars INTEGER,
-    rating REAL,
-    image_url TEXT,
-    buffet BOOLEAN,
-    pool BOOLEAN,
-    sea BOOLEAN,
-    view BOOLEAN,
-    review TEXT
-)
-""")
+# ---- Kết nối / tạo database (schema + index) ----
+repo = HotelRepository("hotel.db")
 
-# ---- Xa d? li?u c? ----
-cursor.execute("DELETE FROM hotels")
+# ---- Xóa dữ liệu cũ + chèn toàn bộ bằng executemany trong MỘT transaction ----
+count = repo.import_hotels(df)
 
-# ---- Chn d? li?u t? CSV vo database ----
-for _, row in df.iterrows():
-    cursor.execute("""
-        INSERT INTO hotels (name, city, price, stars, rating, image_url, buffet, pool, sea, view, review)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, (
-        row["name"],
-        row["city"],
-        float(row["price"]),
-        int(row["stars"]),
-        float(row["rating"]),
-        row["image_url"],
-        bool(row["buffet"]),
-        bool(row["pool"]),
-        bool(row["sea"]),
-        bool(row["view"]),
-        row["review"]
-    ))
-
-conn.commit()
-conn.close()
-
-print(f" ? nh?p {len(df)} khach san tu '{csv_file}' vao database 'hotel.db'")
+print(f"✅ Đã nhập {count} khách sạn từ '{csv_file}' vào database 'hotel.db'")
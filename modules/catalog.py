@@ -0,0 +1,140 @@
+import os
+import threading
+
+import pandas as pd
+
+# Các cột tiện nghi dạng True/False trong hotels.csv
+BOOL_COLUMNS = ['buffet', 'pool', 'sea', 'sea_view', 'view', 'bar', 'gym', 'spa']
+COORDINATE_COLUMNS = ['lat', 'lon']
+# Tên cột tọa độ hay gặp trong file nguồn -> lat / lon
+COORDINATE_ALIASES = {
+    'lat': ['latitude', 'Latitude', 'Lat', 'LAT'],
+    'lon': ['longitude', 'Longitude', 'lng', 'Lng', 'long', 'Lon', 'LON'],
+}
+
+
+class CsvCatalog:
+    """
+    Bộ nhớ đệm cho một file CSV dùng chung giữa các route.
+    - Đọc + chuẩn hóa file MỘT lần, giữ DataFrame trong RAM
+    - Chỉ nạp lại khi mtime/size của file thay đổi (hoặc khi gọi invalidate())
+    - Các view dẫn xuất (index, danh sách thành phố...) được tính một lần cho mỗi phiên bản
+    DataFrame trả về là dùng chung: route chỉ được đọc/lọc, KHÔNG được gán cột trực tiếp.
+    """
+
+    def __init__(self, path, loader, normalize=None):
+        self.path = path
+        self._loader = loader
+        self._normalize = normalize
+        self._lock = threading.RLock()
+        self._frame = None
+        self._signature = None
+        self._derived = {}
+        self.version = 0
+
+    def _file_signature(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def snapshot(self):
+        """Trả về (DataFrame, version) hiện tại, nạp lại nếu file đã đổi"""
+        signature = self._file_signature()
+        frame, version = self._frame, self.version
+        if frame is not None and signature == self._signature:
+            return frame, version
+
+        with self._lock:
+            if self._frame is None or signature != self._signature:
+                df = self._loader(self.path)
+                if self._normalize is not None:
+                    df = self._normalize(df)
+                self._frame = df
+                self._signature = signature
+                self._derived = {}
+                self.version += 1
+                print(f"[Catalog] Đã nạp {os.path.basename(self.path)} (v{self.version}, {len(df)} dòng)")
+            return self._frame, self.version
+
+    @property
+    def signature(self):
+        """(mtime_ns, size) của file lúc nạp DataFrame hiện tại - giống nhau giữa các process / lần chạy,
+        khác với version chỉ là bộ đếm số lần nạp trong process này"""
+        return self._signature
+
+    def frame(self):
+        """DataFrame đã chuẩn hóa (chỉ đọc)"""
+        return self.snapshot()[0]
+
+    def derived(self, key, builder):
+        """
+        Lấy view dẫn xuất theo key; builder(df) chỉ chạy lại khi catalog đổi phiên bản.
+        """
+        df, version = self.snapshot()
+        entry = self._derived.get(key)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+
+        with self._lock:
+            entry = self._derived.get(key)
+            if entry is not None and entry[0] == version:
+                return entry[1]
+            value = builder(df)
+            # Chỉ lưu nếu trong lúc build catalog không bị nạp lại
+            if version == self.version:
+                self._derived[key] = (version, value)
+            return value
+
+    def invalidate(self):
+        """Buộc nạp lại ở lần truy cập sau (gọi sau khi chính app ghi file)"""
+        with self._lock:
+            self._signature = None
+
+
+def to_bool_series(series):
+    """Chuyển cột 'True'/'False'/'1'/'yes'... (đọc dạng str) sang bool"""
+    if series.dtype == bool:
+        return series
+    return series.astype(str).str.strip().str.lower().isin(['true', '1', 'yes'])
+
+
+def normalize_hotels(df):
+    """Chuẩn hóa DataFrame khách sạn một lần khi nạp catalog"""
+    df = df.copy()
+    if 'name' not in df.columns:
+        if 'Name' in df.columns:
+            df = df.rename(columns={'Name': 'name'})
+        else:
+            raise KeyError("❌ hotels.csv không có cột 'name'!")
+
+    for col in BOOL_COLUMNS:
+        if col in df.columns:
+            df[col] = to_bool_series(df[col])
+
+    # rooms_available luôn là int, status luôn đồng bộ theo rooms_available
+    if 'rooms_available' not in df.columns:
+        df['rooms_available'] = 0
+    df['rooms_available'] = pd.to_numeric(df['rooms_available'], errors='coerce').fillna(0).astype(int)
+    df['status'] = ['còn' if x > 0 else 'hết' for x in df['rooms_available']]
+
+    # Tọa độ (độ thập phân) cho chỉ mục không gian: lấy từ cột lat/lon hoặc tên tương đương
+    # (latitude, longitude, lng...); thiếu cột / ô trống -> NaN (khách sạn không vào chỉ mục)
+    for col in COORDINATE_COLUMNS:
+        source = next((c for c in [col] + COORDINATE_ALIASES[col] if c in df.columns), None)
+        df[col] = pd.to_numeric(df[source], errors='coerce') if source else float('nan')
+    return df.reset_index(drop=True)
+
+
+def build_hotel_lookup(df):
+    """name -> dict của dòng đầu tiên (giống hotels_df[hotels_df['name'] == name].iloc[0])"""
+    lookup = {}
+    for row in df.to_dict(orient='records'):
+        lookup.setdefault(row['name'], row)
+    return lookup
+
+
+def build_city_list(df):
+    """Danh sách thành phố (đã sắp xếp) cho trang chủ"""
+    return sorted(df['city'].dropna().unique())
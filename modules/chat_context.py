@@ -0,0 +1,188 @@
+import threading
+
+import pandas as pd
+
+try:
+    from .catalog import CsvCatalog
+    from .chat_retrieval import HotelCandidateIndex
+    from .event_timeline import EventTimeline
+except ImportError:  # chạy trực tiếp trong thư mục modules
+    from catalog import CsvCatalog
+    from chat_retrieval import HotelCandidateIndex
+    from event_timeline import EventTimeline
+
+# Dữ liệu mẫu khi không đọc được CSV
+FALLBACK_HOTELS = [
+    {
+        'name': 'Sunrise Nha Trang',
+        'city': 'Nha Trang',
+        'district': 'Trần Phú',
+        'price': '2,500,000 VNĐ',
+        'rating': 4.8,
+        'amenities': 'Pool, Spa, Beach Front, Restaurant, Bar',
+        'description': 'Khách sạn 5 sao view biển tuyệt đẹp với hồ bơi vô cực'
+    }
+]
+
+FALLBACK_EVENTS = [
+    {
+        'event_name': 'Lễ hội biển Nha Trang',
+        'city': 'Nha Trang',
+        'start_date': '2024-06-01',
+        'end_date': '2024-06-07',
+        'season': 'Hè',
+        'description': 'Lễ hội văn hóa biển với nhiều hoạt động hấp dẫn',
+        'best_time': 'Tháng 6-8',
+        'weather': 'Nắng đẹp, nhiệt độ 28-32°C'
+    }
+]
+
+
+def read_raw_csv(path):
+    return pd.read_csv(path, encoding='utf-8-sig')
+
+
+def hotel_records(df):
+    return [
+        {
+            'name': hotel.get('name', ''),
+            'city': hotel.get('city', ''),
+            'district': hotel.get('district', 'Trung tâm'),
+            'price': hotel.get('price', 'Liên hệ'),
+            'rating': hotel.get('rating', 4.0),
+            'amenities': hotel.get('amenities', 'WiFi, Restaurant, Pool'),
+            'description': hotel.get('description', 'Khách sạn chất lượng với đầy đủ tiện ích')
+        }
+        for hotel in df.to_dict(orient='records')
+    ]
+
+
+def review_records(df):
+    return [
+        {
+            'hotel_name': review.get('hotel_name', ''),
+            'user': review.get('user', 'Khách hàng'),
+            'rating': review.get('rating', 4.5),
+            'comment': review.get('comment', 'Trải nghiệm tuyệt vời!')
+        }
+        for review in df.to_dict(orient='records')
+    ]
+
+
+def event_records(df):
+    return [
+        {
+            'event_name': event.get('event_name', ''),
+            'city': event.get('city', ''),
+            'start_date': event.get('start_date', ''),
+            'end_date': event.get('end_date', ''),
+            'season': event.get('season', 'Không xác định'),
+            'description': event.get('description', ''),
+            'best_time': event.get('best_time', ''),
+            'weather': event.get('weather', '')
+        }
+        for event in df.to_dict(orient='records')
+    ]
+
+
+def build_city_events_info(events_data):
+    """Xây dựng thông tin sự kiện theo thành phố"""
+    if not events_data:
+        return "Hiện chưa có thông tin sự kiện."
+
+    city_events = {}
+    for event in events_data:
+        city = event.get('city', '')
+        if city not in city_events:
+            city_events[city] = []
+
+        event_info = f"- {event.get('event_name', '')}"
+        if event.get('season'):
+            event_info += f" (Mùa: {event.get('season')})"
+        if event.get('best_time'):
+            event_info += f" - Thời gian tốt: {event.get('best_time')}"
+        if event.get('weather'):
+            event_info += f" - Thời tiết: {event.get('weather')}"
+        if event.get('description'):
+            event_info += f" - {event.get('description')}"
+
+        city_events[city].append(event_info)
+
+    result = []
+    for city, events in city_events.items():
+        result.append(f"{city}:")
+        result.extend(events)
+
+    return "\n".join(result) if result else "Hiện chưa có thông tin sự kiện."
+
+
+class ChatContext:
+    """
+    Dữ liệu chat dựng sẵn cho một phiên bản (hotels, reviews, events).
+    Các list/chuỗi bên trong dùng chung giữa request: chỉ đọc, muốn sửa dict
+    khách sạn thì lấy bản sao qua hotels_copy().
+    """
+
+    def __init__(self, version, hotels, reviews, events, candidates=None, timeline=None, signature=None):
+        self.version = version
+        # Chữ ký (mtime_ns, size) của 3 file CSV: dùng cho khóa cache lưu xuống đĩa / chia sẻ giữa worker
+        self.signature = signature
+        self.hotels = hotels
+        self.reviews = reviews
+        self.events = events
+        self.hotel_names = [hotel['name'] for hotel in hotels]
+        self.hotel_names_text = ', '.join(str(name) for name in self.hotel_names)
+        self.city_events_info = build_city_events_info(events)
+        # Chỉ mục chọn khách sạn ứng viên cho prompt (dựng từ CSV gốc để có đủ cột tiện ích)
+        if candidates is None:
+            candidates = HotelCandidateIndex(pd.DataFrame(hotels))
+        self.candidates = candidates
+        # Lịch sự kiện theo ngày (sự kiện đang / sắp diễn ra ở mỗi thành phố)
+        if timeline is None:
+            timeline = EventTimeline(pd.DataFrame(events))
+        self.timeline = timeline
+
+    def hotels_copy(self):
+        return [dict(hotel) for hotel in self.hotels]
+
+
+class ChatContextBuilder:
+    """
+    Cung cấp ChatContext cho /api/chat: đọc + dựng lại chỉ khi một trong ba file CSV
+    đổi (mtime/size), các request còn lại dùng lại kết quả đã dựng.
+    events_catalog: CsvCatalog events.csv dùng chung với app (để chung một EventTimeline)
+    """
+
+    def __init__(self, hotels_path, reviews_path, events_path, events_catalog=None):
+        self.hotels = CsvCatalog(hotels_path, read_raw_csv)
+        self.reviews = CsvCatalog(reviews_path, read_raw_csv)
+        self.events = events_catalog if events_catalog is not None else CsvCatalog(events_path, read_raw_csv)
+        self._lock = threading.Lock()
+        self._context = None
+
+    def get(self):
+        try:
+            hotels_df, hotels_version = self.hotels.snapshot()
+            reviews_df, reviews_version = self.reviews.snapshot()
+            events_df, events_version = self.events.snapshot()
+        except Exception as e:
+            print(f"Lỗi đọc CSV: {e}")
+            return ChatContext(None, FALLBACK_HOTELS, [], FALLBACK_EVENTS)
+
+        version = (hotels_version, reviews_version, events_version)
+        context = self._context
+        if context is not None and context.version == version:
+            return context
+
+        with self._lock:
+            if self._context is None or self._context.version != version:
+                self._context = ChatContext(
+                    version,
+                    hotel_records(hotels_df),
+                    review_records(reviews_df),
+                    event_records(events_df),
+                    HotelCandidateIndex(hotels_df),
+                    self.events.derived('event_timeline', EventTimeline),
+                    (self.hotels.signature, self.reviews.signature, self.events.signature)
+                )
+            return self._context
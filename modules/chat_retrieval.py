@@ -0,0 +1,181 @@
+import threading
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+try:
+    from .ranking import top_k
+except ImportError:  # chạy trực tiếp trong thư mục modules
+    from ranking import top_k
+
+# Cột tiện ích (True/False) trong hotels.csv -> tên tiện ích dùng trong extract_amenities_from_query
+AMENITY_COLUMNS = {
+    'pool': 'pool',
+    'sea': 'beach',
+    'buffet': 'restaurant',
+    'spa': 'spa',
+    'gym': 'gym',
+    'bar': 'bar'
+}
+
+AMENITY_LABELS = {
+    'pool': 'hồ bơi',
+    'beach': 'gần biển',
+    'restaurant': 'buffet/nhà hàng',
+    'spa': 'spa',
+    'gym': 'gym',
+    'bar': 'bar'
+}
+
+
+def estimate_tokens(text):
+    """Ước lượng số token (~4 ký tự / token) - đủ dùng để giới hạn và theo dõi kích thước prompt"""
+    return (len(text) + 3) // 4
+
+
+def _price_values(series):
+    """Giá dạng số ('2,500,000 VNĐ' -> 2500000); không đọc được -> NaN"""
+    digits = series.astype(str).str.replace(r'[^\d]', '', regex=True)
+    return pd.to_numeric(digits, errors='coerce').to_numpy(dtype=float)
+
+
+def _bool_column(df, column):
+    if column not in df.columns:
+        return np.zeros(len(df), dtype=bool)
+    return df[column].astype(str).str.strip().str.lower().isin(['true', '1', 'yes']).to_numpy()
+
+
+def _amenities_from_text(df, amenity):
+    """Fallback cho dữ liệu có cột 'amenities' dạng chuỗi ('Pool, Spa, Beach Front...')"""
+    if 'amenities' not in df.columns:
+        return np.zeros(len(df), dtype=bool)
+    return df['amenities'].fillna('').astype(str).str.lower().str.contains(amenity).to_numpy()
+
+
+def _fact_line(name, city, price, stars, rating, amenities):
+    parts = [f"- {name} ({city})"]
+    if not np.isnan(price):
+        parts.append(f"{price:,.0f}đ/đêm")
+    if not np.isnan(stars):
+        parts.append(f"{stars:.0f} sao")
+    if not np.isnan(rating):
+        parts.append(f"đánh giá {rating:.1f}")
+    if amenities:
+        parts.append(', '.join(amenities))
+    return ' | '.join(parts)
+
+
+class HotelCandidateIndex:
+    """
+    Chọn trước các khách sạn ứng viên cho prompt chatbot (thay vì gửi cả danh sách tên):
+    lọc theo thành phố, chấm điểm theo ngân sách / tiện ích / rating, lấy top-N và
+    ghi mỗi khách sạn thành 1 dòng thông tin ngắn, dừng khi hết token_budget.
+    Dựng 1 lần cho mỗi phiên bản catalog; chỉ đọc nên dùng chung giữa các request.
+    """
+
+    def __init__(self, hotels_df):
+        df = hotels_df.reset_index(drop=True)
+        n = len(df)
+        self.names = df['name'].fillna('').astype(str).tolist() if 'name' in df.columns else [''] * n
+        self.positions = {name: i for i, name in reversed(list(enumerate(self.names)))}
+        cities = df['city'].fillna('').astype(str) if 'city' in df.columns else pd.Series([''] * n)
+        self.cities = cities.to_numpy()
+        self.cities_lower = cities.str.strip().str.lower().to_numpy()
+        self.prices = _price_values(df['price']) if 'price' in df.columns else np.full(n, np.nan)
+        self.stars = (pd.to_numeric(df['stars'], errors='coerce').to_numpy(dtype=float)
+                      if 'stars' in df.columns else np.full(n, np.nan))
+        self.ratings = (pd.to_numeric(df['rating'], errors='coerce').to_numpy(dtype=float)
+                        if 'rating' in df.columns else np.full(n, np.nan))
+
+        self.amenities = {}
+        for column, amenity in AMENITY_COLUMNS.items():
+            self.amenities[amenity] = _bool_column(df, column) | _amenities_from_text(df, amenity)
+
+        self.fact_lines = [
+            _fact_line(
+                self.names[i], self.cities[i], self.prices[i], self.stars[i], self.ratings[i],
+                [AMENITY_LABELS[a] for a in AMENITY_LABELS if self.amenities[a][i]]
+            )
+            for i in range(n)
+        ]
+
+    def __len__(self):
+        return len(self.names)
+
+    def scores(self, city=None, budget=None, amenities=()):
+        """Điểm từng khách sạn; -inf nếu khác thành phố được hỏi"""
+        ratings = np.nan_to_num(self.ratings, nan=0.0)
+        scores = ratings * 2.0
+
+        if budget:
+            min_price, max_price = budget
+            prices = self.prices
+            in_budget = (prices >= min_price) & (prices <= max_price)
+            near_budget = ~in_budget & (prices <= max_price * 1.2)
+            scores = scores + np.where(in_budget, 8.0, np.where(near_budget, 4.0, 0.0))
+
+        for amenity in amenities:
+            if amenity in self.amenities:
+                scores = scores + self.amenities[amenity] * 3.0
+
+        if city:
+            in_city = self.cities_lower == city.strip().lower()
+            if in_city.any():
+                scores = np.where(in_city, scores, -np.inf)
+        return scores
+
+    def select(self, mentioned_names=(), city=None, budget=None, amenities=(), top_n=15, token_budget=600):
+        """
+        Trả về (danh sách vị trí, khối văn bản cho prompt).
+        Khách sạn được nhắc tên (mentioned_names) đứng đầu, sau đó là top-N theo điểm;
+        dừng khi vượt token_budget.
+        """
+        scores = self.scores(city, budget, amenities)
+        order = [self.positions[name] for name in mentioned_names if name in self.positions]
+        for i in top_k(scores, top_n):
+            if np.isfinite(scores[i]) and i not in order:
+                order.append(int(i))
+
+        chosen, lines, used = [], [], 0
+        for i in order:
+            line = self.fact_lines[i]
+            cost = estimate_tokens(line) + 1
+            if lines and used + cost > token_budget:
+                break
+            chosen.append(i)
+            lines.append(line)
+            used += cost
+        return chosen, '\n'.join(lines)
+
+
+class PromptSizeStats:
+    """Số liệu kích thước prompt gửi model (ước lượng token) trên `window` request gần nhất"""
+
+    def __init__(self, window=200):
+        self._lock = threading.Lock()
+        self._tokens = deque(maxlen=window)
+        self._candidates = deque(maxlen=window)
+        self.requests = 0
+
+    def record(self, prompt_tokens, candidates):
+        with self._lock:
+            self.requests += 1
+            self._tokens.append(prompt_tokens)
+            self._candidates.append(candidates)
+
+    def stats(self):
+        with self._lock:
+            tokens = list(self._tokens)
+            candidates = list(self._candidates)
+            requests = self.requests
+        if not tokens:
+            return {'requests': requests, 'last_tokens': 0, 'avg_tokens': 0.0,
+                    'max_tokens': 0, 'avg_candidates': 0.0}
+        return {
+            'requests': requests,
+            'last_tokens': tokens[-1],
+            'avg_tokens': round(sum(tokens) / len(tokens), 1),
+            'max_tokens': max(tokens),
+            'avg_candidates': round(sum(candidates) / len(candidates), 1)
+        }
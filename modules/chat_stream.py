@@ -0,0 +1,135 @@
+import json
+import time
+
+# Các câu chào bị lược bỏ ở đầu câu trả lời khi đang giữa cuộc trò chuyện
+GREETING_PATTERNS = [
+    'xin chào', 'chào bạn', 'chào mừng', 'hello', 'hi ',
+    'rất vui được gặp bạn', 'chào anh', 'chào chị'
+]
+
+
+def sse_event(event, data):
+    """Một sự kiện Server-Sent Events (data dạng JSON)"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+class GreetingStripper:
+    """
+    Làm sạch câu trả lời theo từng đoạn stream, cho kết quả giống clean_ai_response():
+    bỏ dấu '*' markdown, bỏ khoảng trắng đầu/cuối, và (khi enabled) bỏ câu chào đầu tiên
+    tới dấu '.' đầu tiên. Chỉ giữ lại phần đầu câu trả lời đến khi đủ dữ liệu để quyết định,
+    sau đó đẩy thẳng từng đoạn ra ngoài.
+    """
+
+    def __init__(self, enabled):
+        self.enabled = enabled
+        self.state = 'lead'     # lead -> (drop -> after -> after_comma) -> pass
+        self.buffer = ''        # phần chưa quyết định được
+        self.held_space = ''    # khoảng trắng cuối đang giữ lại (bỏ nếu là cuối câu trả lời)
+
+    def feed(self, chunk):
+        self.buffer += chunk.replace('*', '')
+        return self._process()
+
+    def finish(self):
+        """Phần còn lại khi stream kết thúc"""
+        if self.state in ('lead', 'drop'):
+            rest = self.buffer.strip()
+            self.buffer = ''
+            return rest
+        return ''
+
+    def _process(self):
+        if self.state == 'lead':
+            text = self.buffer.lstrip()
+            self.buffer = text
+            if not text:
+                return ''
+            lower = text.lower()
+            if not self.enabled:
+                self.state = 'pass'
+            elif any(lower.startswith(p) for p in GREETING_PATTERNS):
+                self.state = 'drop'
+            elif any(p.startswith(lower) for p in GREETING_PATTERNS):
+                return ''   # chưa đủ ký tự để biết có phải câu chào không
+            else:
+                self.state = 'pass'
+
+        if self.state == 'drop':
+            dot = self.buffer.find('.')
+            if dot < 0:
+                return ''
+            self.buffer = self.buffer[dot + 1:]
+            self.state = 'after'
+
+        if self.state == 'after':
+            text = self.buffer.lstrip()
+            self.buffer = text
+            if not text:
+                return ''
+            if text.startswith(','):
+                self.buffer = text[1:]
+            self.state = 'after_comma'
+
+        if self.state == 'after_comma':
+            text = self.buffer.lstrip()
+            self.buffer = text
+            if not text:
+                return ''
+            self.state = 'pass'
+
+        # pass: đẩy ra ngay, chỉ giữ lại khoảng trắng cuối
+        text = self.held_space + self.buffer
+        self.buffer = ''
+        out = text.rstrip()
+        self.held_space = text[len(out):]
+        return out
+
+
+# =============================
+# BACKEND MODEL (có thể thay thế)
+# =============================
+class GeminiChatBackend:
+    """Gọi model Gemini: trả lời cả câu (generate) hoặc từng đoạn (stream)"""
+
+    def __init__(self, model, generation_config=None):
+        self.model = model
+        self.generation_config = generation_config
+
+    def generate(self, prompt):
+        response = self.model.generate_content(prompt, generation_config=self.generation_config)
+        return response.text
+
+    def stream(self, prompt):
+        response = self.model.generate_content(
+            prompt, generation_config=self.generation_config, stream=True
+        )
+        for chunk in response:
+            try:
+                text = chunk.text
+            except ValueError:  # đoạn không có text (bị chặn / chỉ có metadata)
+                continue
+            if text:
+                yield text
+
+
+class FakeChatBackend:
+    """
+    Model giả để chạy offline / test: reply là chuỗi cố định hoặc hàm reply(prompt) -> str,
+    stream() cắt câu trả lời thành các đoạn chunk_size ký tự, cách nhau delay giây.
+    """
+
+    def __init__(self, reply=None, chunk_size=16, delay=0.0):
+        self.reply = reply or "Mình là trợ lý thử nghiệm. Đây là những khách sạn phù hợp từ hệ thống!"
+        self.chunk_size = chunk_size
+        self.delay = delay
+
+    def generate(self, prompt):
+        return self.reply(prompt) if callable(self.reply) else self.reply
+
+    def stream(self, prompt):
+        text = self.generate(prompt)
+        for i in range(0, len(text), self.chunk_size):
+            if self.delay:
+                time.sleep(self.delay)
+            yield text[i:i + self.chunk_size]
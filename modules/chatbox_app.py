@@ -2,7 +2,9 @@ import streamlit as st
 import pandas as pd
 import re 
 from filter import filter_by_location, filter_by_budget
-from recommend import calculate_scores_and_explain
+from recommend import calculate_scores_and_explain, ScoringMatrices
+from text_index import ReviewSearchIndex
+from entity_resolver import EntityResolver
 
 
 
@@ -14,15 +16,8 @@ def parse_budget(text):
     return None
 
 def parse_city(text):
-    """Kiểm tra các thành phố đã biết"""
-    text_lower = text.lower()
-    if "hanoi" in text_lower or "hà nội" in text_lower:
-        return "Hanoi"
-    if "da nang" in text_lower or "đà nẵng" in text_lower:
-        return "Da Nang"
-    if "ho chi minh" in text_lower or "sài gòn" in text_lower or "saigon" in text_lower:
-        return "Ho Chi Minh City"
-    return None
+    """Kiểm tra các thành phố đã biết (chịu được lỗi gõ / thiếu dấu)"""
+    return city_resolver.best(text, 'city')
 
 def parse_stars(text):
     """Trích xuất số sao (1-5)"""
@@ -45,7 +40,32 @@ def load_data(csv_path):
         st.error(f"LỖI: Không tìm thấy file {csv_path}.")
         return None
 
+# Ma trận tính điểm dựng 1 lần cho mỗi lần nạp dữ liệu
+@st.cache_resource
+def load_scoring_matrices(csv_path):
+    df = load_data(csv_path)
+    return ScoringMatrices(df) if df is not None else None
+
+# Chỉ mục BM25 trên mô tả khách sạn + đánh giá, dựng 1 lần
+@st.cache_resource
+def load_review_search(hotels_path, reviews_path):
+    df = load_data(hotels_path)
+    try:
+        reviews = pd.read_csv(reviews_path, encoding='utf-8-sig').to_dict(orient='records')
+    except FileNotFoundError:
+        reviews = []
+    return ReviewSearchIndex.from_sources(df, reviews) if df is not None else None
+
+# Nhận diện thành phố trong câu trả lời của người dùng
+@st.cache_resource
+def load_city_resolver(csv_path):
+    df = load_data(csv_path)
+    return EntityResolver.from_catalog(city_names=df['city'].unique() if df is not None else ())
+
 base_data = load_data("hotels.csv")
+scoring_matrices = load_scoring_matrices("hotels.csv")
+review_search = load_review_search("hotels.csv", "reviews.csv")
+city_resolver = load_city_resolver("hotels.csv")
 
 # --- Giao diện Chatbot ---
 st.title("Chatbot Gợi ý Khách sạn")
@@ -155,7 +175,10 @@ if prompt := st.chat_input("Nhập câu trả lời của bạn..."):
                 # 2. Xếp hạng AI (Code TV4)
                 final_results_sorted, explanation = calculate_scores_and_explain(
                     filtered_data.copy(), 
-                    prefs
+                    prefs,
+                    matrices=scoring_matrices,
+                    k=3,
+                    text_index=review_search
                 )
 
                 # 3. Trả kết quả ra Chat
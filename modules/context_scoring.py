@@ -0,0 +1,210 @@
+import numpy as np
+import pandas as pd
+
+try:
+    from .entity_resolver import canonical_city
+    from .event_timeline import EventTimeline, to_date
+    from .geo_index import haversine
+    from .ranking import top_k
+except ImportError:  # chạy trực tiếp trong thư mục modules
+    from entity_resolver import canonical_city
+    from event_timeline import EventTimeline, to_date
+    from geo_index import haversine
+    from ranking import top_k
+
+# Trọng số điểm tổng (giữ như AI.py)
+EVENT_WEIGHT = 0.4
+WEATHER_WEIGHT = 0.3
+SEASON_WEIGHT = 0.3
+
+# Điểm sự kiện khi thành phố không có sự kiện sắp tới
+NO_EVENT_SCORE = 0.1
+# Khách sạn chưa có tọa độ nhưng thành phố có sự kiện: coi như cách sự kiện chừng này km
+UNKNOWN_DISTANCE_KM = 5.0
+
+# Luật thời tiết / mùa: điều kiện -> (các cờ, điểm nếu có ít nhất 1 cờ, điểm nếu không có)
+# Cờ 'tag:xxx' lấy từ cột tags, còn lại lấy từ cột amenities
+WEATHER_RULES = {
+    'sunny': (('pool_outdoor', 'beach_nearby'), 1.0, 0.3),
+    'rain': (('indoor', 'spa', 'near_center'), 1.0, 0.3),
+    'cold': (('heating', 'near_cafe'), 1.0, 0.4),
+    'hot': (('pool_outdoor', 'aircon'), 1.0, 0.4),
+    'default': ((), 0.5, 0.5),
+}
+
+SEASON_RULES = {
+    'spring': (('garden_view', 'tag:romantic'), 1.0, 0.5),
+    'summer': (('beach_nearby', 'pool_outdoor'), 1.0, 0.4),
+    'autumn': (('city_view', 'near_center'), 1.0, 0.5),
+    'winter': (('heating', 'spa'), 1.0, 0.4),
+}
+DEFAULT_SEASON_SCORE = 0.5
+
+# hotels.csv hiện chưa có cột amenities/tags: suy ra cờ từ các cột True/False
+BOOL_COLUMN_FLAGS = {
+    'pool': 'pool_outdoor',
+    'sea': 'beach_nearby',
+    'spa': 'spa',
+}
+
+def month_to_season(month):
+    if month in (3, 4, 5):
+        return 'spring'
+    if month in (6, 7, 8):
+        return 'summer'
+    if month in (9, 10, 11):
+        return 'autumn'
+    return 'winter'
+
+
+def split_flags(value, prefix=''):
+    """'pool_outdoor; spa' -> ['pool_outdoor', 'spa'] (ô trống / NaN -> [])"""
+    if not isinstance(value, str):
+        return []
+    return [prefix + item.strip().lower() for item in value.split(';') if item.strip()]
+
+
+class ContextScorer:
+    """
+    Chấm điểm ngữ cảnh (sự kiện, thời tiết, mùa) cho khách sạn - bản vector hóa của AI.py.
+    - amenities/tags được tách MỘT lần thành ma trận bool (khách sạn x cờ)
+    - luật thời tiết/mùa là phép OR trên vài cột của ma trận + np.where
+    - sự kiện kế tiếp của mỗi thành phố tra bằng EventTimeline (bisect), khoảng cách tới
+      khách sạn tính bằng haversine dạng mảng numpy
+    Dựng lại khi hotels.csv / events.csv đổi; score() chỉ đọc nên dùng chung giữa các request.
+    events: EventTimeline dùng chung hoặc DataFrame events.csv
+    """
+
+    def __init__(self, hotels_df, events):
+        n = len(hotels_df)
+        self.names = hotels_df['name'].tolist() if 'name' in hotels_df.columns else [''] * n
+        self.cities = np.array([canonical_city(c) for c in hotels_df.get('city', pd.Series([''] * n))], dtype=object)
+        self.prices = self._numeric(hotels_df, 'price', n)
+        self.stars = self._numeric(hotels_df, 'stars', n)
+        self.lat = self._numeric(hotels_df, 'lat', n, default=np.nan)
+        self.lon = self._numeric(hotels_df, 'lon', n, default=np.nan)
+        self._build_flags(hotels_df, n)
+        self.timeline = events if isinstance(events, EventTimeline) else EventTimeline(events)
+
+    @staticmethod
+    def _numeric(df, column, n, default=0.0):
+        if column not in df.columns:
+            return np.full(n, default, dtype=float)
+        return pd.to_numeric(df[column], errors='coerce').fillna(default).to_numpy(dtype=float)
+
+    def _build_flags(self, hotels_df, n):
+        rows = [[] for _ in range(n)]
+        if 'amenities' in hotels_df.columns:
+            for row, value in zip(rows, hotels_df['amenities']):
+                row.extend(split_flags(value))
+        else:
+            for column, flag in BOOL_COLUMN_FLAGS.items():
+                if column in hotels_df.columns:
+                    for row, value in zip(rows, hotels_df[column]):
+                        if value is True or str(value).strip().lower() in ('true', '1', 'yes'):
+                            row.append(flag)
+        if 'tags' in hotels_df.columns:
+            for row, value in zip(rows, hotels_df['tags']):
+                row.extend(split_flags(value, prefix='tag:'))
+
+        vocabulary = set()
+        for flags, _, _ in list(WEATHER_RULES.values()) + list(SEASON_RULES.values()):
+            vocabulary.update(flags)
+        for row in rows:
+            vocabulary.update(row)
+        self.flag_names = sorted(vocabulary)
+        self.flag_columns = {flag: i for i, flag in enumerate(self.flag_names)}
+
+        self.flags = np.zeros((n, len(self.flag_names)), dtype=bool)
+        for i, row in enumerate(rows):
+            for flag in row:
+                self.flags[i, self.flag_columns[flag]] = True
+
+    def __len__(self):
+        return len(self.names)
+
+    # -------------------------
+    # ĐIỂM TỪNG THÀNH PHẦN
+    # -------------------------
+    def _rule_scores(self, rows, rule):
+        flags, hit, miss = rule
+        columns = [self.flag_columns[flag] for flag in flags]
+        if not columns:
+            return np.full(len(rows), hit, dtype=float)
+        matched = self.flags[np.ix_(rows, columns)].any(axis=1)
+        return np.where(matched, hit, miss)
+
+    def weather_scores(self, rows, weather):
+        return self._rule_scores(rows, WEATHER_RULES.get(weather, WEATHER_RULES['default']))
+
+    def season_scores(self, rows, season):
+        rule = SEASON_RULES.get(season)
+        if rule is None:
+            return np.full(len(rows), DEFAULT_SEASON_SCORE)
+        return self._rule_scores(rows, rule)
+
+    def event_scores(self, rows, date):
+        """
+        (điểm, index sự kiện hoặc -1, khoảng cách km) cho mỗi khách sạn:
+        sự kiện đang / sắp diễn ra gần nhất của thành phố, điểm = 1 / (km + 1)
+        """
+        day = to_date(date)
+        cities = self.cities[rows]
+        event_ids = np.full(len(rows), -1, dtype=int)
+        for city in set(cities):                      # mỗi thành phố một lần bisect
+            event = self.timeline.next_event(city, day)
+            if event is not None:
+                event_ids[cities == city] = event.index
+        has_event = event_ids >= 0
+
+        km = np.full(len(rows), np.nan)
+        if has_event.any():
+            chosen = event_ids[has_event]
+            km[has_event] = haversine(self.lat[rows][has_event], self.lon[rows][has_event],
+                                      self.timeline.lat[chosen], self.timeline.lon[chosen])
+        km = np.where(has_event & np.isnan(km), UNKNOWN_DISTANCE_KM, km)
+
+        scores = np.where(has_event, 1.0 / (km + 1.0), NO_EVENT_SCORE)
+        return scores, event_ids, km
+
+    # -------------------------
+    # ĐIỂM TỔNG
+    # -------------------------
+    def rows_for_city(self, city=None):
+        if not city:
+            return np.arange(len(self.names))
+        return np.flatnonzero(self.cities == canonical_city(city))
+
+    def score_arrays(self, rows, date=None, weather='default', season=None):
+        """Các mảng điểm cho những khách sạn ở vị trí rows (season=None: suy từ tháng của date)"""
+        rows = np.asarray(rows, dtype=int)
+        day = to_date(date)
+        if season is None:
+            season = month_to_season(day.month)
+        event, event_ids, event_km = self.event_scores(rows, day)
+        weather_score = self.weather_scores(rows, weather)
+        season_score = self.season_scores(rows, season)
+        total = EVENT_WEIGHT * event + WEATHER_WEIGHT * weather_score + SEASON_WEIGHT * season_score
+        return {
+            'event': event, 'event_ids': event_ids, 'event_km': event_km,
+            'weather': weather_score, 'season': season_score, 'total': total
+        }
+
+    def score(self, city=None, date=None, weather='default', season=None, k=None):
+        """DataFrame xếp theo điểm tổng giảm dần (k: chỉ lấy k khách sạn đầu)"""
+        rows = self.rows_for_city(city)
+        arrays = self.score_arrays(rows, date, weather, season)
+        order = top_k(arrays['total'], k)
+        event_ids = arrays['event_ids'][order]
+        return pd.DataFrame({
+            'Hotel': [self.names[i] for i in rows[order]],
+            'City': self.cities[rows[order]],
+            'Price': self.prices[rows[order]],
+            'Stars': self.stars[rows[order]],
+            'Event': [self.timeline.events[e].name if e >= 0 else '' for e in event_ids],
+            'Event_Km': np.round(arrays['event_km'][order], 2),
+            'Score_Event': np.round(arrays['event'][order], 3),
+            'Score_Weather': np.round(arrays['weather'][order], 3),
+            'Score_Season': np.round(arrays['season'][order], 3),
+            'Total_Score': np.round(arrays['total'][order], 3),
+        })
@@ -0,0 +1,120 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+import numpy as np
+
+try:
+    from .context_scoring import ContextScorer
+    from .event_timeline import EventTimeline, to_date
+except ImportError:  # chạy trực tiếp trong thư mục modules
+    from context_scoring import ContextScorer
+    from event_timeline import EventTimeline, to_date
+
+# Thời tiết chưa biết trước khi đặt phòng: bảng dùng luật 'default' (điểm thời tiết như nhau)
+TABLE_WEATHER = 'default'
+
+
+def score_city(job):
+    """Worker: ma trận điểm tổng (khách sạn x ngày) cho các khách sạn của MỘT thành phố"""
+    city_hotels, events_df, start, days = job
+    scorer = ContextScorer(city_hotels, EventTimeline(events_df))
+    rows = np.arange(len(scorer))
+    scores = np.empty((len(rows), days), dtype=np.float32)
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        scores[:, offset] = scorer.score_arrays(rows, day, TABLE_WEATHER)['total']
+    return scorer.names, scores
+
+
+class ContextScoreTable:
+    """
+    Bảng điểm ngữ cảnh tính sẵn: (khách sạn, ngày) -> điểm tổng sự kiện/thời tiết/mùa trong [0, 1].
+    - Dựng bằng build_context_table() (job precompute_context_scores.py), mỗi thành phố một process
+    - Lưu dạng cột trong 1 file .npz nén (tên, thành phố, ngày đầu, ma trận float16)
+    - Tra cứu lúc chạy chỉ là 1 lần lấy phần tử mảng: scores[dòng khách sạn, ngày - ngày đầu]
+    """
+
+    def __init__(self, names, cities, start, scores):
+        self.names = [str(name) for name in names]
+        self.cities = [str(city) for city in cities]
+        self.start = to_date(start)
+        self.scores = np.asarray(scores)
+        self.rows = {}
+        for i, name in enumerate(self.names):
+            self.rows.setdefault(name, i)
+
+    def __len__(self):
+        return len(self.names)
+
+    @property
+    def days(self):
+        return self.scores.shape[1] if self.scores.ndim == 2 else 0
+
+    @property
+    def end(self):
+        """Ngày cuối cùng có trong bảng"""
+        return self.start + timedelta(days=self.days - 1)
+
+    def day_index(self, day):
+        """Cột của ngày day, None nếu ngoài khung ngày của bảng"""
+        offset = (to_date(day) - self.start).days
+        return offset if 0 <= offset < self.days else None
+
+    def lookup(self, names, day, default=0.0):
+        """Mảng điểm của các khách sạn vào ngày day (khách sạn lạ / ngày ngoài bảng -> default)"""
+        result = np.full(len(names), default, dtype=float)
+        column = self.day_index(day)
+        if column is None:
+            return result
+        for i, name in enumerate(names):
+            row = self.rows.get(name)
+            if row is not None:
+                result[i] = self.scores[row, column]
+        return result
+
+    def score(self, name, day, default=None):
+        column = self.day_index(day)
+        row = self.rows.get(name)
+        if column is None or row is None:
+            return default
+        return float(self.scores[row, column])
+
+    # -------------------------
+    # FILE .NPZ
+    # -------------------------
+    def save(self, path):
+        """Ghi file mới rồi đổi tên (app đang đọc không bao giờ thấy file ghi dở)"""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez_compressed(
+                f,
+                names=np.array(self.names, dtype=str),
+                cities=np.array(self.cities, dtype=str),
+                start=np.array(np.datetime64(self.start, 'D')),
+                scores=self.scores.astype(np.float16)
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data['names'], data['cities'], data['start'].item(), data['scores'])
+
+
+def build_context_table(hotels_df, events_df, start=None, days=180, workers=None):
+    """Tính bảng cho days ngày từ start (mặc định hôm nay), mỗi thành phố chạy trên một process"""
+    start = to_date(start)
+    cities = [city for city in hotels_df['city'].dropna().unique()]
+    jobs = [(hotels_df[hotels_df['city'] == city], events_df, start, days) for city in cities]
+
+    names, city_column, blocks = [], [], []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for city, (city_names, scores) in zip(cities, pool.map(score_city, jobs)):
+            names.extend(city_names)
+            city_column.extend([city] * len(city_names))
+            blocks.append(scores)
+
+    scores = np.vstack(blocks) if blocks else np.zeros((0, days), dtype=np.float32)
+    return ContextScoreTable(names, city_column, start, scores)
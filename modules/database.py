@@ -0,0 +1,349 @@
+import json
+import math
+import sqlite3
+from contextlib import contextmanager
+
+try:
+    from .storage import BOOKING_COLUMNS, REVIEW_COLUMNS
+except ImportError:  # chạy trực tiếp trong thư mục modules
+    from storage import BOOKING_COLUMNS, REVIEW_COLUMNS
+
+# =============================
+# SCHEMA (bảng hotels do import_hotels.py nạp, app không ghi vào)
+# =============================
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS hotels (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT,
+    city TEXT,
+    price REAL,
+    stars INTEGER,
+    rating REAL,
+    image_url TEXT,
+    buffet BOOLEAN,
+    pool BOOLEAN,
+    sea BOOLEAN,
+    view BOOLEAN,
+    review TEXT
+);
+
+CREATE TABLE IF NOT EXISTS bookings (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    booking_code TEXT,
+    hotel_name TEXT,
+    room_type TEXT,
+    price REAL,
+    user_name TEXT,
+    phone TEXT,
+    email TEXT,
+    num_adults INTEGER,
+    num_children INTEGER,
+    checkin_date TEXT,
+    nights INTEGER,
+    special_requests TEXT,
+    booking_time TEXT,
+    status TEXT,
+    payment_status TEXT,
+    username TEXT,
+    user_email TEXT
+);
+
+CREATE TABLE IF NOT EXISTS reviews (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    hotel_name TEXT,
+    user TEXT,
+    rating INTEGER,
+    comment TEXT
+);
+
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY,
+    password TEXT,
+    full_name TEXT,
+    dob TEXT,
+    gender TEXT,
+    email TEXT,
+    phone TEXT,
+    total_spent REAL DEFAULT 0,
+    history TEXT
+);
+
+CREATE TABLE IF NOT EXISTS event_spins (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT,
+    spin_date TEXT,
+    year INTEGER,
+    is_free_spin BOOLEAN
+);
+
+CREATE TABLE IF NOT EXISTS event_prizes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT,
+    prize_value REAL,
+    prize_name TEXT,
+    created_at TEXT
+);
+"""
+
+# Cột thêm vào các bảng đã tồn tại từ phiên bản cũ (ALTER TABLE nếu thiếu)
+EXTRA_COLUMNS = {
+    'hotels': {'status': 'TEXT', 'rooms_available': 'INTEGER', 'lat': 'REAL', 'lon': 'REAL'},
+}
+
+INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_hotels_name ON hotels(name);
+CREATE INDEX IF NOT EXISTS idx_hotels_city ON hotels(city);
+CREATE INDEX IF NOT EXISTS idx_hotels_price ON hotels(price);
+CREATE INDEX IF NOT EXISTS idx_hotels_stars ON hotels(stars);
+CREATE INDEX IF NOT EXISTS idx_bookings_code ON bookings(booking_code);
+CREATE INDEX IF NOT EXISTS idx_bookings_email ON bookings(email);
+CREATE INDEX IF NOT EXISTS idx_bookings_username ON bookings(username);
+CREATE INDEX IF NOT EXISTS idx_bookings_user_time ON bookings(username, booking_time);
+CREATE INDEX IF NOT EXISTS idx_bookings_time ON bookings(booking_time);
+CREATE INDEX IF NOT EXISTS idx_reviews_hotel ON reviews(hotel_name);
+CREATE INDEX IF NOT EXISTS idx_users_email ON users(email);
+CREATE INDEX IF NOT EXISTS idx_event_spins_username ON event_spins(username);
+CREATE INDEX IF NOT EXISTS idx_event_spins_user_date ON event_spins(username, spin_date);
+CREATE INDEX IF NOT EXISTS idx_event_prizes_username ON event_prizes(username);
+"""
+
+# booking_time / spin_date lưu dạng 'YYYY-MM-DD HH:MM:SS' nên so sánh chuỗi = so sánh thời gian;
+# GLOB loại các dòng sai định dạng (trước đây bị strptime bỏ qua)
+ISO_TIME_GLOB = '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9] [0-9][0-9]:[0-9][0-9]:[0-9][0-9]'
+
+HOTEL_COLUMNS = ['name', 'city', 'price', 'stars', 'rating', 'image_url',
+                 'buffet', 'pool', 'sea', 'view', 'review', 'status', 'rooms_available', 'lat', 'lon']
+USER_COLUMNS = ['username', 'password', 'full_name', 'dob', 'gender', 'email', 'phone', 'total_spent', 'history']
+EVENT_SPIN_COLUMNS = ['username', 'spin_date', 'year', 'is_free_spin']
+EVENT_PRIZE_COLUMNS = ['username', 'prize_value', 'prize_name', 'created_at']
+
+TABLE_COLUMNS = {
+    'hotels': HOTEL_COLUMNS,
+    'bookings': BOOKING_COLUMNS,
+    'reviews': REVIEW_COLUMNS,
+    'users': USER_COLUMNS,
+    'event_spins': EVENT_SPIN_COLUMNS,
+    'event_prizes': EVENT_PRIZE_COLUMNS,
+}
+
+
+def _clean(value):
+    """NaN của pandas -> NULL; numpy scalar -> kiểu Python; list/dict -> JSON"""
+    if value is None:
+        return None
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, ensure_ascii=False)
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if hasattr(value, 'item'):
+        value = value.item()
+        if isinstance(value, float) and math.isnan(value):
+            return None
+    return value
+
+
+def _values(row, columns):
+    return tuple(_clean(row.get(col)) for col in columns)
+
+
+def _user_from_row(row):
+    """Dòng bảng users -> dict user (history JSON -> list, total_spent thiếu -> 0)"""
+    user = dict(row)
+    user['total_spent'] = user.get('total_spent') or 0
+    try:
+        user['history'] = json.loads(user.get('history') or '[]')
+    except ValueError:
+        user['history'] = []
+    return user
+
+
+class HotelRepository:
+    """
+    Lớp truy cập dữ liệu SQLite (hotel.db) cho hotels, bookings, reviews, users,
+    lượt quay và giải thưởng sự kiện. Mỗi thao tác mở kết nối riêng nên dùng được
+    từ nhiều thread/worker; tra cứu dùng index thay vì đọc cả file CSV.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.init_schema()
+
+    @contextmanager
+    def connect(self):
+        """Kết nối + transaction: commit khi thành công, rollback khi lỗi"""
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def init_schema(self):
+        with self.connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            for table, columns in EXTRA_COLUMNS.items():
+                existing = {r['name'] for r in conn.execute(f"PRAGMA table_info({table})")}
+                for col, col_type in columns.items():
+                    if col not in existing:
+                        conn.execute(f"ALTER TABLE {table} ADD COLUMN {col} {col_type}")
+            conn.executescript(INDEXES)
+
+    # -------------------------
+    # IMPORT (executemany trong 1 transaction)
+    # -------------------------
+    def _insert_many(self, conn, table, columns, rows):
+        placeholders = ", ".join("?" for _ in columns)
+        conn.executemany(
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})",
+            (_values(row, columns) for row in rows)
+        )
+
+    def replace_table(self, table, rows):
+        """Xóa dữ liệu cũ và nạp lại toàn bộ bảng trong MỘT transaction"""
+        rows = list(rows)
+        with self.connect() as conn:
+            conn.execute(f"DELETE FROM {table}")
+            self._insert_many(conn, table, TABLE_COLUMNS[table], rows)
+        return len(rows)
+
+    def import_hotels(self, df):
+        return self.replace_table('hotels', df.to_dict(orient='records'))
+
+    def is_empty(self, table):
+        with self.connect() as conn:
+            return conn.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone() is None
+
+    def bootstrap(self, sources):
+        """
+        Nạp dữ liệu ban đầu từ CSV cho các bảng còn trống (lần chạy đầu tiên).
+        sources: {table: rows_loader} - rows_loader() trả về list dict
+        """
+        for table, rows_loader in sources.items():
+            if self.is_empty(table):
+                count = self.replace_table(table, rows_loader())
+                if count:
+                    print(f"[DB] Đã nạp {count} dòng vào bảng {table}")
+
+    # -------------------------
+    # BOOKINGS
+    # -------------------------
+    def add_booking(self, booking):
+        """Thêm 1 booking, trả về id của dòng mới"""
+        placeholders = ", ".join("?" for _ in BOOKING_COLUMNS)
+        with self.connect() as conn:
+            cur = conn.execute(
+                f"INSERT INTO bookings ({', '.join(BOOKING_COLUMNS)}) VALUES ({placeholders})",
+                _values(booking, BOOKING_COLUMNS)
+            )
+            return cur.lastrowid
+
+    def find_booking(self, booking_code):
+        with self.connect() as conn:
+            row = conn.execute(
+                "SELECT * FROM bookings WHERE booking_code = ? LIMIT 1", (str(booking_code).strip(),)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def bookings_by_email(self, email):
+        with self.connect() as conn:
+            return [dict(r) for r in conn.execute("SELECT * FROM bookings WHERE email = ? ORDER BY id", (email,))]
+
+    def completed_bookings_between(self, username, start, end):
+        """Booking 'completed' của user có booking_time trong [start, end) (chuỗi ISO so sánh trực tiếp)"""
+        with self.connect() as conn:
+            return [dict(r) for r in conn.execute(
+                "SELECT hotel_name, price, booking_time FROM bookings "
+                "WHERE username = ? AND booking_time >= ? AND booking_time < ? "
+                "AND booking_time GLOB ? AND lower(status) = 'completed' ORDER BY id",
+                (username, start, end, ISO_TIME_GLOB)
+            )]
+
+    def user_has_bookings(self, username):
+        with self.connect() as conn:
+            return conn.execute(
+                "SELECT 1 FROM bookings WHERE username = ? LIMIT 1", (username,)
+            ).fetchone() is not None
+
+    def all_bookings(self):
+        with self.connect() as conn:
+            return [dict(r) for r in conn.execute("SELECT * FROM bookings ORDER BY id")]
+
+    def count_bookings(self):
+        with self.connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM bookings").fetchone()[0]
+
+    def update_booking(self, booking_code, **fields):
+        """Cập nhật các cột của 1 booking theo mã (point update qua index)"""
+        assignments = ", ".join(f"{col} = ?" for col in fields)
+        with self.connect() as conn:
+            cur = conn.execute(
+                f"UPDATE bookings SET {assignments} WHERE booking_code = ?",
+                (*[_clean(v) for v in fields.values()], str(booking_code).strip())
+            )
+            return cur.rowcount
+
+    def set_booking_status_by_time(self, booking_time, status):
+        with self.connect() as conn:
+            conn.execute("UPDATE bookings SET status = ? WHERE booking_time = ?", (status, booking_time))
+
+    def delete_booking_by_time(self, booking_time):
+        with self.connect() as conn:
+            conn.execute("DELETE FROM bookings WHERE booking_time = ?", (booking_time,))
+
+    # -------------------------
+    # REVIEWS
+    # -------------------------
+    def add_review(self, review):
+        with self.connect() as conn:
+            self._insert_many(conn, 'reviews', REVIEW_COLUMNS, [review])
+
+    def reviews_since(self, last_id):
+        """Đánh giá có id > last_id (tra theo khóa chính), kèm id"""
+        with self.connect() as conn:
+            return [dict(r) for r in conn.execute(
+                "SELECT id, hotel_name, COALESCE(user, '') AS user, rating, comment "
+                "FROM reviews WHERE id > ? ORDER BY id",
+                (last_id,)
+            )]
+
+    # -------------------------
+    # USERS
+    # -------------------------
+    def upsert_user(self, username, data):
+        row = dict(data, username=username)
+        columns = USER_COLUMNS
+        updates = ", ".join(f"{c} = excluded.{c}" for c in columns if c != 'username')
+        with self.connect() as conn:
+            conn.execute(
+                f"INSERT INTO users ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)}) "
+                f"ON CONFLICT(username) DO UPDATE SET {updates}",
+                _values(row, columns)
+            )
+
+    def all_users(self):
+        """{username: dict user} (không kèm khóa username trong dict, giống users_db)"""
+        with self.connect() as conn:
+            rows = [_user_from_row(r) for r in conn.execute("SELECT * FROM users")]
+        return {user.pop('username'): user for user in rows}
+
+    # -------------------------
+    # SỰ KIỆN VÒNG QUAY
+    # -------------------------
+    def add_event_spin(self, spin):
+        with self.connect() as conn:
+            self._insert_many(conn, 'event_spins', EVENT_SPIN_COLUMNS, [spin])
+
+    def count_event_spins(self, username, year, start, end):
+        """Số lượt quay của user trong năm có spin_date trong [start, end)"""
+        with self.connect() as conn:
+            return conn.execute(
+                "SELECT COUNT(*) FROM event_spins "
+                "WHERE username = ? AND year = ? AND spin_date >= ? AND spin_date < ? AND spin_date GLOB ?",
+                (username, year, start, end, ISO_TIME_GLOB)
+            ).fetchone()[0]
+
+    def add_event_prize(self, prize):
+        with self.connect() as conn:
+            self._insert_many(conn, 'event_prizes', EVENT_PRIZE_COLUMNS, [prize])
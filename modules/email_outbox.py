@@ -0,0 +1,311 @@
+import heapq
+import json
+import os
+import random
+import threading
+import time
+import uuid
+
+import requests
+from requests.adapters import HTTPAdapter
+
+RESEND_URL = "https://api.resend.com/emails"
+# File .inflight không ai đụng tới lâu hơn chừng này giây: process giữ nó đã chết, trả lại pending/
+STALE_INFLIGHT_SECONDS = 600
+
+
+class TransientEmailError(Exception):
+    """Lỗi tạm thời (mạng, timeout, 429, 5xx) - sẽ gửi lại sau"""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class PermanentEmailError(Exception):
+    """Lỗi không thể gửi lại (4xx: sai địa chỉ, sai API key...)"""
+
+
+# =============================
+# TRANSPORT (có thể thay thế)
+# =============================
+class ResendTransport:
+    """Gửi email qua API Resend bằng một requests.Session dùng chung (giữ kết nối keep-alive)"""
+
+    def __init__(self, api_key, timeout=10, pool_size=4):
+        self.api_key = api_key
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json"
+        })
+
+    def send(self, message):
+        try:
+            response = self.session.post(RESEND_URL, json=message, timeout=self.timeout)
+        except requests.RequestException as e:
+            raise TransientEmailError(str(e))
+
+        if response.status_code == 429 or response.status_code >= 500:
+            retry_after = response.headers.get("Retry-After")
+            raise TransientEmailError(
+                f"Resend {response.status_code}: {response.text}",
+                retry_after=float(retry_after) if retry_after and retry_after.isdigit() else None
+            )
+        if response.status_code >= 400:
+            raise PermanentEmailError(f"Resend {response.status_code}: {response.text}")
+        return response.text
+
+
+class FakeTransport:
+    """Transport giả cho test/chạy local: lưu email vào list, có thể cho lỗi n lần đầu"""
+
+    def __init__(self, fail_times=0):
+        self.sent = []
+        self.fail_times = fail_times
+        self.attempts = 0
+        self._lock = threading.Lock()
+
+    def send(self, message):
+        with self._lock:
+            self.attempts += 1
+            if self.attempts <= self.fail_times:
+                raise TransientEmailError("fake transient error")
+            self.sent.append(message)
+        return "ok"
+
+
+# =============================
+# OUTBOX
+# =============================
+class EmailOutbox:
+    """
+    Hàng đợi email gửi nền, lưu trên đĩa (mỗi email 1 file JSON trong <outbox_dir>/pending).
+    - enqueue() ghi file rồi trả về ngay, request không phải chờ HTTP tới Resend
+    - worker thread pool lấy email đến hạn, gửi qua transport
+    - lỗi tạm thời: gửi lại với backoff lũy thừa (+ jitter); quá max_attempts -> chuyển sang failed/
+    - khởi động lại app: email còn trong pending/ được nạp lại và gửi tiếp
+    - nhiều process (gunicorn) dùng chung thư mục: trước khi gửi, worker "giành" email bằng
+      os.rename pending/<id>.json -> <id>.json.inflight (atomic), process nào đổi tên được mới gửi
+    """
+
+    def __init__(self, outbox_dir, transport, workers=2, max_attempts=5, base_delay=2.0, max_delay=300.0):
+        self.pending_dir = os.path.join(outbox_dir, "pending")
+        self.failed_dir = os.path.join(outbox_dir, "failed")
+        os.makedirs(self.pending_dir, exist_ok=True)
+        os.makedirs(self.failed_dir, exist_ok=True)
+        self.transport = transport
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self._heap = []            # (thời điểm đến hạn, id)
+        self._in_flight = 0
+        self._cond = threading.Condition()
+        self._threads = []
+        self._started = False
+        self._stopping = False
+
+    # -------------------------
+    # FILE
+    # -------------------------
+    def _path(self, msg_id, folder=None):
+        return os.path.join(folder or self.pending_dir, f"{msg_id}.json")
+
+    def _inflight_path(self, msg_id):
+        return self._path(msg_id) + ".inflight"
+
+    def _write(self, record, folder=None):
+        path = self._path(record["id"], folder)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(record, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def _read(self, path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _claim(self, msg_id):
+        """Giành quyền gửi email (đổi tên sang .inflight); False nếu process/thread khác đã lấy"""
+        try:
+            os.rename(self._path(msg_id), self._inflight_path(msg_id))
+        except FileNotFoundError:
+            return False
+        os.utime(self._inflight_path(msg_id))   # mốc thời gian để nhận ra file .inflight bị bỏ rơi
+        return True
+
+    def _unclaim(self, msg_id):
+        """Trả email đang giữ về pending/ (gửi lại sau)"""
+        os.rename(self._inflight_path(msg_id), self._path(msg_id))
+
+    def _recover_stale(self):
+        """Trả về pending/ các file .inflight của process đã chết giữa chừng"""
+        now = time.time()
+        for filename in os.listdir(self.pending_dir):
+            if not filename.endswith(".json.inflight"):
+                continue
+            try:
+                if now - os.path.getmtime(os.path.join(self.pending_dir, filename)) > STALE_INFLIGHT_SECONDS:
+                    self._unclaim(filename[:-len(".json.inflight")])
+            except OSError:
+                continue
+
+    # -------------------------
+    # API
+    # -------------------------
+    def enqueue(self, message):
+        """Lưu email vào outbox và lên lịch gửi ngay; trả về id"""
+        record = {
+            "id": f"{int(time.time() * 1000)}-{uuid.uuid4().hex[:8]}",
+            "message": message,
+            "attempts": 0,
+            "next_attempt_at": time.time(),
+            "last_error": None
+        }
+        self._write(record)
+        self._schedule(record["id"], record["next_attempt_at"])
+        return record["id"]
+
+    def start(self):
+        """Nạp email còn tồn từ lần chạy trước và khởi động worker (gọi nhiều lần không sao)"""
+        with self._cond:
+            if self._started:
+                return
+            self._started = True
+            self._stopping = False
+
+        self._recover_stale()
+        for filename in sorted(os.listdir(self.pending_dir)):
+            if filename.endswith(".json"):
+                record = self._read(os.path.join(self.pending_dir, filename))
+                if record:
+                    self._schedule(record["id"], record.get("next_attempt_at", 0))
+
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"email-outbox-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=5):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        self._started = False
+
+    def flush(self, timeout=10):
+        """Chờ tới khi không còn email đến hạn/đang gửi (dùng trong test); trả về True nếu xong"""
+        deadline = time.time() + timeout
+        with self._cond:
+            while self._in_flight or any(ready <= time.time() for ready, _ in self._heap):
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(min(remaining, 0.05))
+        return True
+
+    def pending_count(self):
+        with self._cond:
+            return len(self._heap) + self._in_flight
+
+    # -------------------------
+    # WORKER
+    # -------------------------
+    def _schedule(self, msg_id, ready_at):
+        with self._cond:
+            heapq.heappush(self._heap, (ready_at, msg_id))
+            self._cond.notify()
+
+    def _next(self):
+        with self._cond:
+            while not self._stopping:
+                if self._heap:
+                    ready_at, msg_id = self._heap[0]
+                    wait = ready_at - time.time()
+                    if wait <= 0:
+                        heapq.heappop(self._heap)
+                        self._in_flight += 1
+                        return msg_id
+                    self._cond.wait(wait)
+                else:
+                    self._cond.wait()
+            return None
+
+    def _done(self):
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    def _backoff(self, attempts, retry_after=None):
+        delay = min(self.max_delay, self.base_delay * (2 ** (attempts - 1)))
+        delay = delay * random.uniform(0.8, 1.2)
+        return max(delay, retry_after or 0)
+
+    def _worker(self):
+        while True:
+            msg_id = self._next()
+            if msg_id is None:
+                return
+            try:
+                self._deliver(msg_id)
+            except Exception as e:
+                # Lỗi ghi/xóa file: giữ thread sống, trả email về pending/ để thử lại sau
+                print(f"❌ Lỗi xử lý email {msg_id}: {e}")
+                self._retry_later(msg_id)
+            finally:
+                self._done()
+
+    def _retry_later(self, msg_id):
+        try:
+            if os.path.exists(self._inflight_path(msg_id)):
+                self._unclaim(msg_id)
+                self._schedule(msg_id, time.time() + self._backoff(1))
+        except OSError as e:
+            print(f"❌ Không trả được email {msg_id} về hàng đợi: {e}")
+
+    def _deliver(self, msg_id):
+        if not self._claim(msg_id):
+            return      # đã được process khác gửi / đang gửi
+        record = self._read(self._inflight_path(msg_id))
+        if record is None:
+            os.replace(self._inflight_path(msg_id), self._path(msg_id, self.failed_dir))
+            print(f"❌ Bỏ email {msg_id}: file hỏng")
+            return
+
+        record["attempts"] += 1
+        try:
+            self.transport.send(record["message"])
+        except PermanentEmailError as e:
+            record["last_error"] = str(e)
+            self._move_to_failed(record)
+            return
+        except Exception as e:
+            record["last_error"] = str(e)
+            if record["attempts"] >= self.max_attempts:
+                self._move_to_failed(record)
+                return
+            delay = self._backoff(record["attempts"], getattr(e, "retry_after", None))
+            record["next_attempt_at"] = time.time() + delay
+            self._write(record)
+            os.remove(self._inflight_path(msg_id))
+            self._schedule(msg_id, record["next_attempt_at"])
+            print(f"⚠️ Gửi email {msg_id} lỗi (lần {record['attempts']}), thử lại sau {delay:.1f}s: {e}")
+            return
+
+        os.remove(self._inflight_path(msg_id))
+        print(f"📧 Đã gửi email {msg_id} tới {record['message'].get('to')}")
+
+    def _move_to_failed(self, record):
+        self._write(record, self.failed_dir)
+        os.remove(self._inflight_path(record["id"]))
+        print(f"❌ Bỏ email {record['id']} sau {record['attempts']} lần: {record['last_error']}")
@@ -0,0 +1,235 @@
+import re
+import unicodedata
+from collections import namedtuple
+
+try:
+    from .text_index import fold_diacritics
+except ImportError:  # chạy trực tiếp trong thư mục modules (chatbox_app)
+    from text_index import fold_diacritics
+
+# Tên gọi khác của các thành phố -> tên chuẩn trong hotels.csv
+CITY_ALIASES = {
+    'hà nội': 'Hanoi', 'hanoi': 'Hanoi',
+    'đà nẵng': 'Da Nang', 'danang': 'Da Nang',
+    'nha trang': 'Nha Trang', 'nhatrang': 'Nha Trang',
+    'hồ chí minh': 'Ho Chi Minh', 'thành phố hồ chí minh': 'Ho Chi Minh',
+    'sài gòn': 'Ho Chi Minh', 'saigon': 'Ho Chi Minh',
+    'hcm': 'Ho Chi Minh', 'tp.hcm': 'Ho Chi Minh', 'tphcm': 'Ho Chi Minh'
+}
+
+# Từ chung trong tên khách sạn, bỏ đi để có thêm tên gọi ngắn ('Apricot Hotel' -> 'apricot')
+GENERIC_NAME_WORDS = {'khách', 'sạn', 'hotel', 'hotels', 'resort', 'the', '&', 'and', 'central'}
+# Tên gọi ngắn chỉ 1 từ phải dài tối thiểu chừng này ký tự ('rice', 'nexy' dễ trùng từ thường)
+MIN_SINGLE_CORE_LENGTH = 5
+
+WORD_PATTERN = re.compile(r'\w+')
+
+_FOLDED_CITY_ALIASES = {fold_diacritics(alias): city for alias, city in CITY_ALIASES.items()}
+
+EntityMatch = namedtuple('EntityMatch', 'kind value alias start end edits')
+
+
+def canonical_city(name):
+    """Tên thành phố chuẩn như trong hotels.csv ('Ho Chi Minh City' -> 'Ho Chi Minh'); không biết thì giữ nguyên"""
+    if not isinstance(name, str):
+        return ''
+    key = fold_diacritics(name.strip().lower())
+    if key.endswith(' city'):
+        key = key[:-5]
+    return _FOLDED_CITY_ALIASES.get(key, _FOLDED_CITY_ALIASES.get(key.replace(' ', ''), name.strip()))
+
+
+def words(text):
+    """Các từ chữ thường (Unicode NFC), bỏ dấu câu"""
+    if not isinstance(text, str):
+        return []
+    return WORD_PATTERN.findall(unicodedata.normalize('NFC', text).lower())
+
+
+def trigrams(token):
+    padded = f"^{token}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def max_edits(token):
+    """Số lỗi gõ cho phép theo độ dài: từ ngắn phải khớp đúng"""
+    if len(token) <= 3:
+        return 0
+    if len(token) <= 7:
+        return 1
+    return 2
+
+
+def bounded_edit_distance(a, b, bound):
+    """Khoảng cách Levenshtein nếu <= bound, ngược lại None (dừng sớm khi vượt ngưỡng)"""
+    if abs(len(a) - len(b)) > bound:
+        return None
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i] + [0] * len(b)
+        for j, cb in enumerate(b, 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb))
+        if min(current) > bound:
+            return None
+        previous = current
+    return previous[-1] if previous[-1] <= bound else None
+
+
+class _Vocabulary:
+    """Tập từ + chỉ mục trigram ký tự để tìm nhanh các từ gần đúng"""
+
+    def __init__(self):
+        self.tokens = set()
+        self._trigrams = {}
+
+    def add(self, token):
+        if token in self.tokens:
+            return
+        self.tokens.add(token)
+        for gram in trigrams(token):
+            self._trigrams.setdefault(gram, set()).add(token)
+
+    def similar(self, token):
+        """{từ trong tập: số lỗi} với số lỗi <= max_edits(từ đó)"""
+        found = {token: 0} if token in self.tokens else {}
+        if len(token) < 3:
+            return found
+        candidates = set()
+        for gram in trigrams(token):
+            candidates |= self._trigrams.get(gram, set())
+        for candidate in candidates:
+            if candidate in found:
+                continue
+            edits = bounded_edit_distance(token, candidate, max_edits(candidate))
+            if edits is not None:
+                found[candidate] = edits
+        return found
+
+
+class EntityResolver:
+    """
+    Nhận diện thành phố / khách sạn được nhắc tới trong một đoạn văn bản bất kỳ.
+    - Mỗi tên gọi (alias) là một dãy từ; từ trong văn bản khớp từ của alias nếu giống hệt
+      hoặc sai tối đa max_edits ký tự (tìm ứng viên qua chỉ mục trigram, kiểm tra bằng Levenshtein)
+    - Từ gõ có dấu so với alias có dấu, gõ không dấu thì so với dạng bỏ dấu ('da nag' ~ 'đà nẵng')
+    - Alias nhiều từ có lỗi gõ phải có ít nhất 1 từ riêng (không thuộc GENERIC_NAME_WORDS) khớp đúng,
+      tổng số lỗi tối đa max(1, số từ // 2): 'nice hotel' không thành 'rice hotel'
+    - Alias exact=True (tên gọi ngắn 1 từ của khách sạn) phải khớp đúng từng ký tự
+    """
+
+    def __init__(self):
+        self.aliases = []                   # id -> (kind, value, alias, [từ có dấu], [từ bỏ dấu], exact)
+        self._by_first = {}                 # (dạng, từ đầu) -> [id alias]
+        self._accented = _Vocabulary()
+        self._folded = _Vocabulary()
+        self._token_cache = {}
+
+    @classmethod
+    def from_catalog(cls, hotel_names=(), city_names=()):
+        resolver = cls()
+        for alias, city in CITY_ALIASES.items():
+            resolver.add(alias, 'city', city)
+        for city in city_names:
+            if isinstance(city, str) and city.strip():
+                resolver.add(city, 'city', city.strip())
+        hotel_names = [name for name in hotel_names if isinstance(name, str) and name.strip()]
+        word_counts = {}                    # từ -> số tên khách sạn chứa từ đó
+        for name in set(hotel_names):
+            for w in set(words(name)):
+                word_counts[w] = word_counts.get(w, 0) + 1
+        for name in hotel_names:
+            resolver.add(name, 'hotel', name)
+            name_words = words(name)
+            core = [w for w in name_words if w not in GENERIC_NAME_WORDS]
+            if not core or core == name_words or max(len(w) for w in core) < 4:
+                continue
+            if len(core) > 1:
+                resolver.add(' '.join(core), 'hotel', name)
+                continue
+            # Tên 1 từ: bỏ từ chung ở đầu ('The Rice Hotel' -> 'rice hotel'); riêng từ đó chỉ
+            # dùng khi đủ dài, không có trong tên khách sạn khác ('golden') và phải khớp đúng
+            start = name_words.index(core[0])
+            if start:
+                resolver.add(' '.join(name_words[start:]), 'hotel', name)
+            if len(core[0]) >= MIN_SINGLE_CORE_LENGTH and word_counts.get(core[0]) == 1:
+                resolver.add(core[0], 'hotel', name, exact=True)
+        return resolver
+
+    def add(self, alias, kind, value, exact=False):
+        accented = words(alias)
+        if not accented:
+            return
+        folded = [fold_diacritics(w) for w in accented]
+        alias_id = len(self.aliases)
+        self.aliases.append((kind, value, alias, accented, folded, exact))
+        self._by_first.setdefault(('a', accented[0]), []).append(alias_id)
+        self._by_first.setdefault(('f', folded[0]), []).append(alias_id)
+        for token in accented:
+            self._accented.add(token)
+        for token in folded:
+            self._folded.add(token)
+        self._token_cache.clear()
+
+    def _lookup(self, token):
+        """(dạng so khớp, {từ alias: số lỗi}) cho một từ trong văn bản - có cache"""
+        cached = self._token_cache.get(token)
+        if cached is None:
+            folded = fold_diacritics(token)
+            if folded == token:
+                cached = ('f', self._folded.similar(token))
+            else:
+                cached = ('a', self._accented.similar(token))
+            if len(self._token_cache) > 10000:
+                self._token_cache.clear()
+            self._token_cache[token] = cached
+        return cached
+
+    def _match_alias(self, alias_id, lookups, start):
+        """Số lỗi nếu alias khớp các từ bắt đầu tại start, ngược lại None"""
+        _, _, _, accented, folded, exact_only = self.aliases[alias_id]
+        if start + len(accented) > len(lookups):
+            return None
+        total, exact = 0, 0
+        for offset in range(len(accented)):
+            form, similar = lookups[start + offset]
+            edits = similar.get(accented[offset] if form == 'a' else folded[offset])
+            if edits is None:
+                return None
+            total += edits
+            exact += edits == 0 and accented[offset] not in GENERIC_NAME_WORDS
+        if total and (exact_only or exact == 0 and len(accented) > 1 or total > max(1, len(accented) // 2)):
+            return None
+        return total
+
+    def find(self, text, kind=None):
+        """Mọi thực thể trong text (có thể chồng lấn), theo vị trí từ"""
+        tokens = words(text)
+        lookups = [self._lookup(token) for token in tokens]
+        matches = []
+        for start, (form, similar) in enumerate(lookups):
+            alias_ids = set()
+            for token in similar:
+                alias_ids.update(self._by_first.get((form, token), ()))
+            for alias_id in sorted(alias_ids):
+                alias_kind, value, alias, accented, _, _ = self.aliases[alias_id]
+                if kind is not None and alias_kind != kind:
+                    continue
+                edits = self._match_alias(alias_id, lookups, start)
+                if edits is not None:
+                    matches.append(EntityMatch(alias_kind, value, alias, start, start + len(accented), edits))
+        return matches
+
+    def values(self, text, kind):
+        """Các giá trị (không trùng) theo thứ tự xuất hiện đầu tiên"""
+        seen = {}
+        for match in self.find(text, kind):
+            seen.setdefault(match.value, None)
+        return list(seen)
+
+    def best(self, text, kind):
+        """Giá trị khớp tốt nhất: alias dài nhất, ít lỗi nhất, xuất hiện trước; None nếu không có"""
+        matches = self.find(text, kind)
+        if not matches:
+            return None
+        best = min(matches, key=lambda m: (-(m.end - m.start), -len(m.alias), m.edits, m.start))
+        return best.value
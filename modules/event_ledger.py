@@ -0,0 +1,61 @@
+class EventLedger:
+    """
+    Tra cứu sự kiện vòng quay theo từng user, đọc thẳng từ DB (hotel.db):
+    - số lượt quay đã dùng theo năm (chỉ tính lượt trong tháng sự kiện)
+    - chi tiêu + danh sách booking 'completed' trong thời gian sự kiện theo năm
+    - user đã từng có booking hay chưa
+    Thời gian lưu dạng chuỗi ISO 'YYYY-MM-DD HH:MM:SS' nên khoảng tháng sự kiện được lọc
+    ngay trong SQL (index username + thời gian), không tải và parse từng dòng bằng Python.
+    Không giữ trạng thái trong bộ nhớ nên mọi worker gunicorn đều thấy lượt quay /
+    booking vừa được worker khác ghi.
+    """
+
+    def __init__(self, repo, start_month, end_month):
+        self.repo = repo
+        self.start_month = start_month
+        self.end_month = end_month
+
+    def _window(self, year):
+        """[start, end) của thời gian sự kiện trong năm, dạng chuỗi so sánh được với DB"""
+        start = f"{year:04d}-{self.start_month:02d}-01 00:00:00"
+        if self.end_month >= 12:
+            end = f"{year + 1:04d}-01-01 00:00:00"
+        else:
+            end = f"{year:04d}-{self.end_month + 1:02d}-01 00:00:00"
+        return start, end
+
+    @staticmethod
+    def _entry(booking):
+        """entry của booking, None nếu giá không hợp lệ (giống cách bỏ qua trước đây)"""
+        try:
+            amount = float(booking.get('price') or 0)
+        except (TypeError, ValueError):
+            return None
+        return {
+            'hotel': booking.get('hotel_name'),
+            'amount': amount,
+            'date': booking.get('booking_time')
+        }
+
+    # -------------------------
+    # ĐỌC
+    # -------------------------
+    def used_spins(self, username, year):
+        return self.repo.count_event_spins(username, year, *self._window(year))
+
+    def event_bookings(self, username, year):
+        entries = []
+        for booking in self.repo.completed_bookings_between(username, *self._window(year)):
+            entry = self._entry(booking)
+            if entry is not None:
+                entries.append(entry)
+        return entries
+
+    def event_spending(self, username, year):
+        return sum(entry['amount'] for entry in self.event_bookings(username, year))
+
+    def has_event_bookings(self, username, year):
+        return bool(self.event_bookings(username, year))
+
+    def has_bookings(self, username):
+        return self.repo.user_has_bookings(username)
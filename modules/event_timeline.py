@@ -0,0 +1,180 @@
+from bisect import bisect_right
+from collections import namedtuple
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+try:
+    from .entity_resolver import canonical_city
+except ImportError:  # chạy trực tiếp trong thư mục modules
+    from entity_resolver import canonical_city
+
+# index: vị trí trong EventTimeline.events; start/end: datetime.date (end >= start)
+TimelineEvent = namedtuple('TimelineEvent', 'index event_id name city start end lat lon season')
+
+
+def to_date(value=None):
+    """Ngày (str / date / datetime / numpy datetime64) -> datetime.date; None -> hôm nay"""
+    if value is None:
+        return date.today()
+    if type(value) is date:
+        return value
+    return pd.Timestamp(value).date()
+
+
+class EventTimeline:
+    """
+    Lịch sự kiện theo thành phố, nạp MỘT lần từ events.csv (dựng lại khi file đổi).
+    - Mỗi thành phố giữ ngày bắt đầu đã sắp xếp: "sự kiện kế tiếp từ ngày D" là một lần bisect
+    - Sự kiện nhiều ngày (start_date..end_date) đang diễn ra vào ngày D cũng được tính,
+      tìm bằng bisect + mảng max(end_date) cộng dồn theo thứ tự ngày bắt đầu
+    - Tên thành phố được chuẩn hóa ('Ho Chi Minh City' == 'Ho Chi Minh' trong hotels.csv)
+    Dùng chung giữa bộ chấm điểm ngữ cảnh và chatbot; chỉ đọc sau khi dựng.
+    """
+
+    def __init__(self, events_df):
+        events_df = events_df.rename(columns=lambda c: str(c).strip())
+        columns = set(events_df.columns)
+
+        parsed = []
+        for row in events_df.to_dict(orient='records'):
+            start = pd.to_datetime(row.get('start_date'), errors='coerce')
+            if pd.isna(start):
+                continue
+            end = pd.to_datetime(row.get('end_date'), errors='coerce')
+            start = start.date()
+            end = start if pd.isna(end) or end.date() < start else end.date()
+            parsed.append((canonical_city(row.get('city')), start, end, row))
+        parsed.sort(key=lambda item: (item[0], item[1], item[2]))
+
+        self.events = []
+        self._starts = {}       # thành phố -> [ordinal ngày bắt đầu] tăng dần
+        self._ids = {}          # thành phố -> [index sự kiện] cùng thứ tự
+        self._max_end = {}      # thành phố -> max ordinal ngày kết thúc của các sự kiện [0..i]
+        self._max_end_ids = {}  # thành phố -> index sự kiện đạt max đó
+        for city, start, end, row in parsed:
+            event = TimelineEvent(
+                len(self.events),
+                row.get('event_id'),
+                row.get('event_name', '') if 'event_name' in columns else '',
+                city, start, end,
+                pd.to_numeric(row.get('lat'), errors='coerce'),
+                pd.to_numeric(row.get('lon'), errors='coerce'),
+                row.get('season', '') if 'season' in columns else ''
+            )
+            self.events.append(event)
+            starts = self._starts.setdefault(city, [])
+            ids = self._ids.setdefault(city, [])
+            max_end = self._max_end.setdefault(city, [])
+            max_end_ids = self._max_end_ids.setdefault(city, [])
+            if max_end and max_end[-1] >= end.toordinal():
+                max_end.append(max_end[-1])
+                max_end_ids.append(max_end_ids[-1])
+            else:
+                max_end.append(end.toordinal())
+                max_end_ids.append(event.index)
+            starts.append(start.toordinal())
+            ids.append(event.index)
+
+        # Tọa độ theo index sự kiện (NaN nếu thiếu) để tính khoảng cách dạng mảng
+        self.lat = np.array([event.lat for event in self.events], dtype=float)
+        self.lon = np.array([event.lon for event in self.events], dtype=float)
+
+    def __len__(self):
+        return len(self.events)
+
+    def cities(self):
+        return sorted(self._starts)
+
+    def _city_keys(self, city):
+        return self.cities() if not city else [canonical_city(city)]
+
+    # -------------------------
+    # TRA CỨU
+    # -------------------------
+    def next_event(self, city, day=None):
+        """
+        Sự kiện đang diễn ra vào ngày day (nếu nhiều: cái kết thúc muộn nhất),
+        nếu không có thì sự kiện bắt đầu sớm nhất sau day; None nếu thành phố không còn sự kiện
+        """
+        city = canonical_city(city)
+        starts = self._starts.get(city)
+        if not starts:
+            return None
+        ordinal = to_date(day).toordinal()
+
+        started = bisect_right(starts, ordinal)     # các sự kiện [0, started) đã bắt đầu
+        if started and self._max_end[city][started - 1] >= ordinal:
+            return self.events[self._max_end_ids[city][started - 1]]
+        if started < len(starts):
+            return self.events[self._ids[city][started]]
+        return None
+
+    def ongoing(self, city, day=None):
+        """Các sự kiện của thành phố đang diễn ra vào ngày day"""
+        return self.between(city, day, day)
+
+    def upcoming(self, city=None, day=None, limit=None):
+        """Sự kiện đang diễn ra hoặc sắp diễn ra từ ngày day, theo ngày bắt đầu (city=None: mọi thành phố)"""
+        ordinal = to_date(day).toordinal()
+        found = []
+        for key in self._city_keys(city):
+            starts = self._starts.get(key, [])
+            started = bisect_right(starts, ordinal)
+            found.extend(self.ongoing(key, day))
+            found.extend(self.events[i] for i in self._ids.get(key, [])[started:started + limit if limit else None])
+        found.sort(key=lambda event: (event.start, event.end, event.index))
+        return found[:limit] if limit else found
+
+    def between(self, city, start, end=None):
+        """Sự kiện có ít nhất 1 ngày nằm trong [start, end] (vd. trùng thời gian chuyến đi)"""
+        first = to_date(start).toordinal()
+        last = to_date(end).toordinal() if end is not None else first
+        found = []
+        for key in self._city_keys(city):
+            starts = self._starts.get(key, [])
+            stop = bisect_right(starts, last)        # bắt đầu sau last thì chắc chắn không trùng
+            found.extend(
+                self.events[i] for i in self._ids.get(key, [])[:stop]
+                if self.events[i].end.toordinal() >= first
+            )
+        found.sort(key=lambda event: (event.start, event.end, event.index))
+        return found
+
+    def find(self, event_id):
+        """Sự kiện theo event_id trong events.csv (so dạng chuỗi), None nếu không có"""
+        for event in self.events:
+            if str(event.event_id).strip() == str(event_id).strip():
+                return event
+        return None
+
+    def center(self, city):
+        """Tọa độ trung bình các sự kiện của thành phố (mốc vị trí khi không có tọa độ khác), None nếu không có"""
+        ids = self._ids.get(canonical_city(city), [])
+        points = [(self.lat[i], self.lon[i]) for i in ids if np.isfinite(self.lat[i]) and np.isfinite(self.lon[i])]
+        if not points:
+            return None
+        lats, lons = zip(*points)
+        return float(np.mean(lats)), float(np.mean(lons))
+
+    # -------------------------
+    # HIỂN THỊ CHO CHATBOT
+    # -------------------------
+    def describe(self, city=None, day=None, limit=5):
+        """Văn bản ngắn các sự kiện đang / sắp diễn ra cho prompt chatbot"""
+        day = to_date(day)
+        lines = []
+        for event in self.upcoming(city, day, limit):
+            when = f"{event.start:%d/%m/%Y}" + (f" - {event.end:%d/%m/%Y}" if event.end != event.start else "")
+            if event.start <= day:
+                status = "đang diễn ra"
+            else:
+                status = f"còn {(event.start - day).days} ngày"
+            lines.append(f"- {event.name} ({event.city}): {when}, {status}")
+        return "\n".join(lines) if lines else "Chưa có sự kiện sắp tới."
+
+    def days_until(self, event, day=None):
+        """Số ngày tới khi sự kiện bắt đầu (0 nếu đang diễn ra)"""
+        return max(0, (event.start - to_date(day)).days)
+
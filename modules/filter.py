@@ -1,5 +1,10 @@
 import pandas as pd
 
+try:
+    from .keyword_matcher import KeywordMatcher
+except ImportError:  # chạy trực tiếp trong thư mục modules (chatbox_app)
+    from keyword_matcher import KeywordMatcher
+
 def filter_by_location(df, location_city):
     """
     Lọc DataFrame dựa trên thành phố 
@@ -49,27 +54,24 @@ def filter_combined(df, min_stars, preferences):
                 
     return filtered_df
 
+# Các tính năng khách sạn - MỞ RỘNG THÊM
+FEATURE_KEYWORDS = {
+    'pool': ['hồ bơi', 'bể bơi', 'pool', 'bơi lội', 'swimming'],
+    'buffet': ['buffet', 'buffet sáng', 'ăn sáng', 'bữa sáng', 'breakfast'],
+    'gym': ['gym', 'phòng gym', 'thể hình', 'tập thể dục', 'fitness'],
+    'spa': ['spa', 'massage', 'xông hơi', 'thư giãn'],
+    'sea': ['biển', 'gần biển', 'view biển', 'bãi biển', 'biển đẹp', 'sea', 'beach'],
+    'view': ['view', 'cảnh đẹp', 'tầm nhìn', 'view thành phố', 'city view'],
+    'wifi': ['wifi', 'internet', 'mạng'],
+    'parking': ['bãi đỗ', 'đỗ xe', 'parking', 'garage'],
+    'breakfast': ['bữa sáng', 'ăn sáng', 'breakfast included'],
+    'restaurant': ['nhà hàng', 'restaurant', 'quán ăn']
+}
+
+# Mỗi từ khóa là 1 mẫu trong nhóm của tính năng tương ứng
+feature_matcher = KeywordMatcher(FEATURE_KEYWORDS).build()
+
 def parse_features_from_text(text):
-    """Trích xuất các tính năng từ câu hỏi tự nhiên - MỞ RỘNG"""
-    text_lower = text.lower()
-    features = {}
-    
-    # Các tính năng khách sạn - MỞ RỘNG THÊM
-    feature_keywords = {
-        'pool': ['hồ bơi', 'bể bơi', 'pool', 'bơi lội', 'swimming'],
-        'buffet': ['buffet', 'buffet sáng', 'ăn sáng', 'bữa sáng', 'breakfast'],
-        'gym': ['gym', 'phòng gym', 'thể hình', 'tập thể dục', 'fitness'],
-        'spa': ['spa', 'massage', 'xông hơi', 'thư giãn'],
-        'sea': ['biển', 'gần biển', 'view biển', 'bãi biển', 'biển đẹp', 'sea', 'beach'],
-        'view': ['view', 'cảnh đẹp', 'tầm nhìn', 'view thành phố', 'city view'],
-        'wifi': ['wifi', 'internet', 'mạng'],
-        'parking': ['bãi đỗ', 'đỗ xe', 'parking', 'garage'],
-        'breakfast': ['bữa sáng', 'ăn sáng', 'breakfast included'],
-        'restaurant': ['nhà hàng', 'restaurant', 'quán ăn']
-    }
-    
-    for feature, keywords in feature_keywords.items():
-        if any(keyword in text_lower for keyword in keywords):
-            features[feature] = True
-    
-    return features
+    """Trích xuất các tính năng từ câu hỏi tự nhiên - MỞ RỘNG (1 lần duyệt qua FEATURE_KEYWORDS)"""
+    tags = feature_matcher.tag(text.lower())
+    return {feature: True for feature in FEATURE_KEYWORDS if feature in tags}
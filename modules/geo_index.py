@@ -0,0 +1,104 @@
+import math
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180     # ~111.2 km mỗi độ vĩ
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """Khoảng cách km giữa các tọa độ; nhận số hoặc mảng numpy (broadcast được)"""
+    phi1 = np.radians(lat1)
+    phi2 = np.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = np.radians(lon2) - np.radians(lon1)
+    a = np.sin(dphi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(dlambda / 2) ** 2
+    return EARTH_RADIUS_KM * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+class GeoIndex:
+    """
+    Chỉ mục không gian dạng lưới cho câu hỏi "điểm nào trong bán kính N km / k điểm gần nhất".
+    - Chia bản đồ thành ô cell_km x cell_km (theo độ vĩ/kinh), điểm được sắp theo ô;
+      mỗi ô là một đoạn liên tiếp trong mảng (tra dict -> slice, không duyệt toàn bộ)
+    - Câu hỏi bán kính chỉ lấy các ô chạm hình chữ nhật bao quanh vòng tròn,
+      rồi tính haversine chính xác dạng mảng trên các điểm ứng viên đó
+    - k điểm gần nhất: hỏi bán kính tăng dần (x2) tới khi đủ k điểm
+    Điểm thiếu tọa độ (NaN) bị bỏ qua. Chỉ đọc sau khi dựng.
+    """
+
+    def __init__(self, lats, lons, ids=None, cell_km=2.0):
+        lats = np.asarray(lats, dtype=float)
+        lons = np.asarray(lons, dtype=float)
+        ids = np.arange(len(lats)) if ids is None else np.asarray(ids)
+        valid = np.isfinite(lats) & np.isfinite(lons)
+
+        self.cell_deg = cell_km / KM_PER_DEGREE
+        cell_lat = np.floor(lats[valid] / self.cell_deg).astype(np.int64)
+        cell_lon = np.floor(lons[valid] / self.cell_deg).astype(np.int64)
+        order = np.lexsort((cell_lon, cell_lat))
+
+        self.lats = lats[valid][order]
+        self.lons = lons[valid][order]
+        self.ids = ids[valid][order]
+        self._cells = {}    # (ô vĩ độ, ô kinh độ) -> (đầu, cuối) trong các mảng trên
+        keys = np.stack([cell_lat[order], cell_lon[order]], axis=1)
+        if len(keys):
+            starts = np.flatnonzero(np.r_[True, np.any(keys[1:] != keys[:-1], axis=1)])
+            ends = np.r_[starts[1:], len(keys)]
+            for start, end in zip(starts.tolist(), ends.tolist()):
+                self._cells[(int(keys[start, 0]), int(keys[start, 1]))] = (start, end)
+
+    @classmethod
+    def from_frame(cls, df, lat_column='lat', lon_column='lon', cell_km=2.0):
+        """Index trên các dòng DataFrame có tọa độ; id = vị trí dòng"""
+        if lat_column not in df.columns or lon_column not in df.columns:
+            return cls([], [], cell_km=cell_km)
+        return cls(df[lat_column].to_numpy(dtype=float), df[lon_column].to_numpy(dtype=float), cell_km=cell_km)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _candidates(self, lat, lon, radius_km):
+        """Vị trí (trong mảng đã sắp) của các điểm thuộc những ô chạm hình bao của vòng tròn"""
+        dlat = radius_km / KM_PER_DEGREE
+        max_lat = min(89.9, abs(lat) + dlat)
+        dlon = min(180.0, dlat / math.cos(math.radians(max_lat)))
+        lat_range = range(math.floor((lat - dlat) / self.cell_deg), math.floor((lat + dlat) / self.cell_deg) + 1)
+        lon_range = range(math.floor((lon - dlon) / self.cell_deg), math.floor((lon + dlon) / self.cell_deg) + 1)
+
+        slices = []
+        if len(lat_range) * len(lon_range) > len(self._cells):
+            # Vòng tròn phủ nhiều ô hơn số ô có điểm: duyệt các ô có điểm
+            for (cell_lat, cell_lon), (start, end) in self._cells.items():
+                if cell_lat in lat_range and cell_lon in lon_range:
+                    slices.append(np.arange(start, end))
+        else:
+            for cell_lat in lat_range:
+                for cell_lon in lon_range:
+                    span = self._cells.get((cell_lat, cell_lon))
+                    if span is not None:
+                        slices.append(np.arange(span[0], span[1]))
+        return np.concatenate(slices) if slices else np.empty(0, dtype=np.intp)
+
+    def within(self, lat, lon, radius_km):
+        """(ids, km) các điểm cách (lat, lon) không quá radius_km, gần trước"""
+        candidates = self._candidates(lat, lon, radius_km)
+        distances = haversine(lat, lon, self.lats[candidates], self.lons[candidates])
+        inside = distances <= radius_km
+        candidates, distances = candidates[inside], distances[inside]
+        order = np.argsort(distances, kind='stable')
+        return self.ids[candidates[order]], distances[order]
+
+    def nearest(self, lat, lon, k=5, max_km=None):
+        """(ids, km) của k điểm gần nhất (giới hạn trong max_km nếu có), gần trước"""
+        if k <= 0 or not len(self):
+            return self.ids[:0], np.empty(0)
+        radius = self.cell_deg * KM_PER_DEGREE
+        limit = max_km if max_km is not None else math.pi * EARTH_RADIUS_KM
+        while True:
+            radius = min(radius, limit)
+            ids, distances = self.within(lat, lon, radius)
+            if len(ids) >= k or radius >= limit:
+                return ids[:k], distances[:k]
+            radius *= 2
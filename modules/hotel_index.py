@@ -0,0 +1,105 @@
+import numpy as np
+import pandas as pd
+
+# Giá trị checkbox tiện nghi trên form /recommend -> các cột bool tương ứng (OR)
+AMENITY_COLUMNS = {
+    'pool': ['pool'],
+    'sea': ['sea', 'sea_view'],
+    'breakfast': ['buffet'],
+    'buffet': ['buffet'],
+    'bar': ['bar'],
+}
+
+# Khoảng diện tích phòng (m2) theo lựa chọn 'size'
+SIZE_RANGES = {
+    'small': lambda s: s < 25,
+    'medium': lambda s: (s >= 25) & (s <= 40),
+    'large': lambda s: s > 40,
+}
+
+
+class HotelFilterIndex:
+    """
+    Index dựng sẵn cho bộ lọc /recommend, build một lần cho mỗi phiên bản catalog.
+    - city: thành phố (lowercase) -> mảng row id đã sắp xếp
+    - price/stars: mảng giá trị đã sắp xếp + thứ tự dòng, tra khoảng bằng searchsorted
+    - tiện nghi: bitset (mảng bool) cho pool/sea/buffet/bar
+    Truy vấn = giao các tập row id, chi phí tỉ lệ với số ứng viên thay vì cả catalog.
+    """
+
+    def __init__(self, df):
+        self.frame = df
+        self.size = len(df)
+
+        cities = df['city'].astype(str).str.lower() if 'city' in df.columns else pd.Series([''] * self.size)
+        city_codes, city_names = pd.factorize(cities)
+        self.city_rows = {
+            name: np.flatnonzero(city_codes == code)
+            for code, name in enumerate(city_names)
+        }
+
+        self.price = self._numeric(df, 'price')
+        self.price_order = np.argsort(self.price, kind='stable')
+        self.price_sorted = self.price[self.price_order]
+
+        self.stars = self._numeric(df, 'stars')
+        self.stars_order = np.argsort(self.stars, kind='stable')
+        self.stars_sorted = self.stars[self.stars_order]
+
+        # Không có cột size / giá trị không phải số -> coi như 0 m2, tức phòng 'small'
+        # (giống row.get('size', 0) và except: s = 0 trước đây)
+        if 'size' in df.columns:
+            self.room_size = pd.to_numeric(df['size'], errors='coerce').fillna(0).to_numpy(dtype=float)
+        else:
+            self.room_size = np.zeros(self.size)
+
+        self.amenity_bits = {}
+        for amen, columns in AMENITY_COLUMNS.items():
+            bits = np.zeros(self.size, dtype=bool)
+            for col in columns:
+                if col in df.columns:
+                    bits |= (df[col] == True).to_numpy()  # noqa: E712
+            self.amenity_bits[amen] = bits
+
+    def _numeric(self, df, col):
+        if col not in df.columns:
+            return np.full(self.size, np.nan)
+        return pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=float)
+
+    def query(self, city=None, max_price=None, min_stars=None, amenities=(), size=None):
+        """Trả về mảng row id (tăng dần, giữ thứ tự gốc) thỏa mọi điều kiện"""
+        rows = None
+
+        if city:
+            rows = self.city_rows.get(str(city).lower(), np.empty(0, dtype=np.intp))
+
+        if max_price is not None:
+            if rows is None:
+                end = np.searchsorted(self.price_sorted, max_price, side='right')
+                rows = np.sort(self.price_order[:end])
+            else:
+                rows = rows[self.price[rows] <= max_price]
+
+        if min_stars is not None:
+            if rows is None:
+                start = np.searchsorted(self.stars_sorted, min_stars, side='left')
+                # NaN luôn nằm cuối mảng đã sắp xếp, loại bỏ
+                end = np.searchsorted(self.stars_sorted, np.inf, side='right')
+                rows = np.sort(self.stars_order[start:end])
+            else:
+                rows = rows[self.stars[rows] >= min_stars]
+
+        for amen in amenities:
+            bits = self.amenity_bits.get(amen)
+            if bits is None:
+                continue  # tiện nghi không hỗ trợ -> bỏ qua như trước
+            rows = np.flatnonzero(bits) if rows is None else rows[bits[rows]]
+
+        if size in SIZE_RANGES:
+            if rows is None:
+                rows = np.arange(self.size)
+            rows = rows[SIZE_RANGES[size](self.room_size[rows])]
+
+        if rows is None:
+            rows = np.arange(self.size)
+        return rows
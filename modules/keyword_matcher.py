@@ -0,0 +1,100 @@
+from collections import deque
+
+
+class KeywordMatcher:
+    """
+    Tìm nhiều từ khóa cùng lúc bằng automaton Aho–Corasick: duyệt văn bản 1 lần,
+    chi phí không tăng theo số từ khóa trong từ điển.
+    Từ khóa chia theo nhóm (ý định, tiện ích, thành phố, viết tắt...), mỗi từ khóa mang 1 giá trị.
+    Kết quả khớp giống hệt `keyword in text` cho từng từ khóa.
+    """
+
+    def __init__(self, groups=None):
+        self._goto = [{}]       # trạng thái -> {ký tự: trạng thái kế}
+        self._fail = [0]
+        self._out = [[]]        # trạng thái -> [id từ khóa kết thúc tại đây]
+        self.patterns = []      # id -> (từ khóa, nhóm, giá trị)
+        self._built = False
+        for group, keywords in (groups or {}).items():
+            self.add_group(group, keywords)
+
+    def add(self, keyword, group, value=None):
+        if not keyword:
+            return
+        state = 0
+        for ch in keyword:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = nxt
+        self._out[state].append(len(self.patterns))
+        self.patterns.append((keyword, group, keyword if value is None else value))
+        self._built = False
+
+    def add_group(self, group, keywords):
+        """keywords: dict {từ khóa: giá trị} hoặc list từ khóa (giá trị = chính từ khóa)"""
+        items = keywords.items() if isinstance(keywords, dict) else ((k, None) for k in keywords)
+        for keyword, value in items:
+            self.add(keyword, group, value)
+
+    def build(self):
+        """Tính liên kết fail (BFS); gọi tự động ở lần tìm đầu tiên"""
+        queue = deque()
+        for state in self._goto[0].values():
+            self._fail[state] = 0
+            queue.append(state)
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+        self._built = True
+        return self
+
+    def finditer(self, text):
+        """Sinh (vị trí bắt đầu, vị trí kết thúc, id từ khóa) cho mọi lần xuất hiện, kể cả chồng lấn"""
+        if not self._built:
+            self.build()
+        goto, fail, out, patterns = self._goto, self._fail, self._out, self.patterns
+        state = 0
+        for end, ch in enumerate(text, 1):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for pattern_id in out[state]:
+                yield end - len(patterns[pattern_id][0]), end, pattern_id
+
+    def tag(self, text):
+        """{nhóm: {từ khóa khớp: giá trị}} theo thứ tự xuất hiện trong văn bản"""
+        tags = {}
+        for _, _, pattern_id in self.finditer(text):
+            keyword, group, value = self.patterns[pattern_id]
+            tags.setdefault(group, {}).setdefault(keyword, value)
+        return tags
+
+    def replace(self, text, group):
+        """
+        Thay mọi từ khóa của nhóm bằng giá trị của nó. Dùng cho từ khóa bọc bởi ký tự biên
+        (vd. ' ks ' -> ' khách sạn '): 2 lần khớp liền nhau chỉ chung ký tự biên nên
+        chỉ thay phần bên trong, ký tự biên giữ nguyên.
+        """
+        pieces, last = [], 0
+        for start, end, pattern_id in self.finditer(text):
+            keyword, pattern_group, value = self.patterns[pattern_id]
+            if pattern_group != group or start + 1 < last:
+                continue
+            pieces.append(text[last:start + 1])
+            pieces.append(value[1:-1])
+            last = end - 1
+        if not pieces:
+            return text
+        pieces.append(text[last:])
+        return ''.join(pieces)
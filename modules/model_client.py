@@ -0,0 +1,274 @@
+import threading
+import time
+from collections import deque
+
+
+class Overloaded(Exception):
+    """Từ chối ngay (không chờ) khi hết quota / quá nhiều request / circuit đang mở"""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(f"{reason} (thử lại sau {retry_after:.0f}s)")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def is_rate_limit_error(error):
+    text = str(error).lower()
+    return "quota" in text or "429" in text
+
+
+class TokenBucket:
+    """Token bucket: nạp rate token/giây, tối đa capacity token (cho phép burst)"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self):
+        """Lấy 1 token; trả về 0 nếu được, ngược lại số giây phải chờ tới token kế tiếp"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+
+class CircuitBreaker:
+    """
+    Sau `threshold` lỗi 429 liên tiếp: mở mạch, không gọi API trong `cooldown` giây.
+    Hết cooldown cho 1 request thử (half-open): thành công -> đóng, lại 429 -> mở tiếp.
+    """
+
+    def __init__(self, threshold=3, cooldown=60.0):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at < self.cooldown:
+            return 'open'
+        return 'half-open'
+
+    def allow(self):
+        """Trả về 0 nếu được gọi, ngược lại số giây còn lại trước khi thử lại"""
+        with self._lock:
+            if self.opened_at is None:
+                return 0.0
+            remaining = self.cooldown - (time.monotonic() - self.opened_at)
+            if remaining > 0:
+                return remaining
+            if self.trial_running:
+                return 1.0
+            self.trial_running = True
+            return 0.0
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def record_rate_limited(self):
+        with self._lock:
+            self.failures += 1
+            self.trial_running = False
+            if self.failures >= self.threshold or self.opened_at is not None:
+                self.opened_at = time.monotonic()
+
+    def record_other_error(self):
+        with self._lock:
+            self.trial_running = False
+
+
+class ModelStream:
+    """
+    Một lời gọi stream đã được nhận (đang giữ 1 slot): lặp để lấy các đoạn text.
+    Slot được trả đúng 1 lần: khi đọc hết / lỗi, hoặc khi close() (stream bỏ dở / chưa từng đọc).
+    """
+
+    def __init__(self, client, prompt):
+        self._client = client
+        self._prompt = prompt
+        self._started = time.monotonic()
+        self._released = False
+        self._lock = threading.Lock()
+
+    def __iter__(self):
+        error, completed = None, False
+        try:
+            for chunk in self._client.backend.stream(self._prompt):
+                yield chunk
+            completed = True
+        except Exception as e:
+            error = e
+            if is_rate_limit_error(e):
+                raise self._client._rate_limited(e)
+            raise
+        finally:
+            self._finish(error, abandoned=error is None and not completed)
+
+    def _finish(self, error=None, abandoned=False):
+        with self._lock:
+            if self._released:
+                return
+            self._released = True
+        self._client._release(self._started, error, abandoned)
+
+    def close(self):
+        """Trả slot nếu stream chưa kết thúc (gọi nhiều lần không sao)"""
+        self._finish(abandoned=True)
+
+
+class ModelClient:
+    """
+    Client dùng chung cho mọi lời gọi model, bảo vệ quota:
+    - token bucket: tối đa rate_per_minute lời gọi/phút (burst tối đa `burst`)
+    - semaphore: tối đa max_in_flight lời gọi cùng lúc
+    - không chờ trong request: thiếu slot hoặc token thì ném Overloaded ngay (kèm retry_after)
+    - circuit breaker: ngừng gọi API sau nhiều lỗi 429 liên tiếp
+    - số liệu: thời gian xin quyền, độ trễ lời gọi, số lần bị từ chối
+    backend: đối tượng có generate(prompt) và stream(prompt)
+    """
+
+    def __init__(self, backend, rate_per_minute=10, burst=None, max_in_flight=4,
+                 breaker=None, window=200):
+        self.backend = backend
+        self.bucket = TokenBucket(rate_per_minute / 60.0, burst or max(1, rate_per_minute // 2))
+        self.max_in_flight = max_in_flight
+        self.breaker = breaker or CircuitBreaker()
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._lock = threading.Lock()
+        self._queue_times = deque(maxlen=window)
+        self._latencies = deque(maxlen=window)
+        self._counters = {'calls': 0, 'succeeded': 0, 'failed': 0, 'rate_limited': 0,
+                          'rejected_breaker': 0, 'rejected_quota': 0, 'rejected_busy': 0, 'abandoned': 0}
+        self._in_flight = 0
+
+    # -------------------------
+    # NHẬN / TỪ CHỐI
+    # -------------------------
+    def _count(self, key):
+        with self._lock:
+            self._counters[key] += 1
+
+    def _admit(self):
+        """Xin quyền gọi model; trả về thời gian đã chờ (giây) hoặc ném Overloaded"""
+        started = time.monotonic()
+
+        retry_after = self.breaker.allow()
+        if retry_after:
+            self._count('rejected_breaker')
+            raise Overloaded("Circuit breaker đang mở do quota", retry_after)
+
+        # Slot trước, token sau: bị từ chối vì bận thì không mất token của quota
+        if not self._slots.acquire(blocking=False):
+            self._count('rejected_busy')
+            self.breaker.record_other_error()
+            raise Overloaded("Quá nhiều yêu cầu đang xử lý", 1.0)
+
+        wait = self.bucket.try_acquire()
+        if wait:
+            self._slots.release()
+            self._count('rejected_quota')
+            self.breaker.record_other_error()
+            raise Overloaded("Vượt giới hạn số lời gọi/phút", wait)
+
+        queue_time = time.monotonic() - started
+        with self._lock:
+            self._counters['calls'] += 1
+            self._in_flight += 1
+            self._queue_times.append(queue_time)
+        return queue_time
+
+    def _release(self, started, error=None, abandoned=False):
+        latency = time.monotonic() - started
+        with self._lock:
+            self._in_flight -= 1
+            self._latencies.append(latency)
+        self._slots.release()
+
+        if abandoned:
+            # Stream bị đóng trước khi đọc hết (client ngắt): không tính là thành công/thất bại
+            self.breaker.record_other_error()
+            self._count('abandoned')
+        elif error is None:
+            self.breaker.record_success()
+            self._count('succeeded')
+        elif is_rate_limit_error(error):
+            self.breaker.record_rate_limited()
+            self._count('rate_limited')
+        else:
+            self.breaker.record_other_error()
+            self._count('failed')
+
+    def _rate_limited(self, error):
+        retry_after = self.breaker.cooldown if self.breaker.state == 'open' else 60.0
+        return Overloaded(f"Model báo hết quota: {error}", retry_after)
+
+    # -------------------------
+    # GỌI MODEL
+    # -------------------------
+    def generate(self, prompt):
+        self._admit()
+        started = time.monotonic()
+        try:
+            text = self.backend.generate(prompt)
+        except Exception as e:
+            self._release(started, e)
+            if is_rate_limit_error(e):
+                raise self._rate_limited(e)
+            raise
+        self._release(started)
+        return text
+
+    def stream(self, prompt):
+        """
+        Xin quyền NGAY (để route trả 429 trước khi bắt đầu stream), trả về ModelStream.
+        Người gọi PHẢI đảm bảo close() được gọi (vd. Response.call_on_close) để trả slot
+        cả khi stream không bao giờ được đọc.
+        """
+        self._admit()
+        return ModelStream(self, prompt)
+
+    # -------------------------
+    # SỐ LIỆU
+    # -------------------------
+    @staticmethod
+    def _summary(values):
+        if not values:
+            return {'avg_ms': 0.0, 'p50_ms': 0.0, 'p95_ms': 0.0, 'max_ms': 0.0}
+        ordered = sorted(values)
+        pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+        return {
+            'avg_ms': round(sum(ordered) / len(ordered) * 1000, 1),
+            'p50_ms': round(pick(0.5) * 1000, 1),
+            'p95_ms': round(pick(0.95) * 1000, 1),
+            'max_ms': round(ordered[-1] * 1000, 1)
+        }
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+            queue_times = list(self._queue_times)
+            latencies = list(self._latencies)
+            in_flight = self._in_flight
+        return dict(
+            counters,
+            in_flight=in_flight,
+            max_in_flight=self.max_in_flight,
+            circuit=self.breaker.state,
+            queue_time=self._summary(queue_times),
+            latency=self._summary(latencies)
+        )
@@ -0,0 +1,30 @@
+import numpy as np
+
+
+def top_k(scores, k=None):
+    """
+    Chọn vị trí của k điểm cao nhất, trả về theo thứ tự giảm dần - O(n) nhờ argpartition.
+    - Điểm bằng nhau: vị trí nhỏ hơn (đứng trước trong danh sách gốc) xếp trước
+    - NaN luôn xếp cuối
+    - k=None hoặc k >= n: xếp toàn bộ (ổn định)
+    scores: list hoặc mảng numpy điểm số
+    """
+    neg = -np.asarray(scores, dtype=float)
+    n = len(neg)
+
+    if k is None or k >= n:
+        return np.argsort(neg, kind='stable')
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+
+    # Ngưỡng = điểm thứ k; lấy mọi phần tử tốt hơn ngưỡng + các phần tử bằng ngưỡng có vị trí nhỏ nhất
+    threshold = np.partition(neg, k - 1)[k - 1]
+    if np.isnan(threshold):
+        better = np.flatnonzero(~np.isnan(neg))
+        ties = np.flatnonzero(np.isnan(neg))
+    else:
+        better = np.flatnonzero(neg < threshold)
+        ties = np.flatnonzero(neg == threshold)
+    selected = np.concatenate([better, ties[:k - len(better)]])
+
+    return selected[np.lexsort((selected, neg[selected]))]
@@ -1,108 +1,209 @@
+import numpy as np
 import pandas as pd
 
-def calculate_scores_and_explain(df, all_prefs):
+try:
+    from .ranking import top_k
+except ImportError:  # chạy trực tiếp trong thư mục modules (chatbox_app)
+    from ranking import top_k
+
+# Điểm cộng cho từng tiện nghi được yêu cầu (không có thì -2)
+feature_scores = {
+    'pool': 8,
+    'buffet': 5,
+    'gym': 4,
+    'spa': 4,
+    'sea': 6,
+    'view': 3
+}
+
+# Các từ khóa trong đánh giá, mỗi lần khớp +6
+review_keywords = {
+    'biển đẹp': ['biển đẹp', 'view biển tuyệt', 'bãi biển đẹp'],
+    'dịch vụ tốt': ['dịch vụ tốt', 'nhân viên thân thiện', 'phục vụ chu đáo'],
+    'yên tĩnh': ['yên tĩnh', 'thanh bình', 'tĩnh lặng'],
+    'view đẹp': ['view đẹp', 'cảnh đẹp', 'tầm nhìn đẹp']
+}
+
+# Điểm cộng tối đa theo độ liên quan BM25 giữa mô tả tự do và đánh giá (khách sạn liên quan nhất)
+TEXT_MATCH_WEIGHT = 6
+
+# Mẫu regex trong đánh giá cho luật text tự do (review trống vẫn tính là khớp như bản cũ)
+QUIET_PATTERN = 'yên tĩnh|thoải mái'
+SERVICE_PATTERN = 'dịch vụ|thân thiện'
+
+
+class ScoringMatrices:
     """
-    Hàm tính điểm, sắp xếp và giải thích 
-    Trả về 2 giá trị: (dataframe_sorted, explanation_string)
+    Ma trận tính điểm dựng sẵn cho một DataFrame khách sạn (build 1 lần mỗi lần nạp catalog).
+    Cột của matrix: [tiện nghi..., từ khóa review..., sea, yên tĩnh, dịch vụ, rating]
     """
-    print(f"[AI] Bắt đầu tính điểm. Sở thích: {all_prefs}")
-    
-    # Một danh sách để lưu lại các lý do giải thích
-    explanation_log = ["Bắt đầu quá trình xếp hạng:"]
-    
-    # Tạo bản sao để tính toán
-    df_scored = df.copy()
-    
-    # LỌC CỨNG (Hard Filter) ---
-    min_stars = all_prefs.get('min_stars', 0)
-    if min_stars > 0:
-        df_scored = df_scored[df_scored['stars'] >= min_stars].copy()
-        explanation_log.append(f"Loại bỏ các khách sạn dưới {min_stars} sao.")
-    
-    if df_scored.empty:
-        return df_scored, "Không tìm thấy khách sạn nào sau khi lọc theo số sao."
-
-    # TÍNH ĐIỂM (Scoring Logic) ---
-    # 
-    df_scored['recommend_score'] = df_scored['rating'] * 3
-
-    # 1. Tính điểm sở thích 
-    feature_scores = {
-        'pool': 8,
-        'buffet': 5, 
-        'gym': 4,
-        'spa': 4,
-        'sea': 6,
-        'view': 3
-    }
 
+    def __init__(self, df):
+        n = len(df)
+        self.index = df.index
+        self.stars = pd.to_numeric(df['stars'], errors='coerce').to_numpy(dtype=float)
+        rating = pd.to_numeric(df['rating'], errors='coerce').to_numpy(dtype=float)
+        price = pd.to_numeric(df['price'], errors='coerce').to_numpy(dtype=float)
+        with np.errstate(divide='ignore'):
+            self.inv_price = 1000000 / price
+
+        columns = []
+        self.feature_cols = {}
+        for feature in feature_scores:
+            self.feature_cols[feature] = len(columns)
+            columns.append(self._truthy(df, feature, n))
+
+        reviews = df['review'] if 'review' in df.columns else pd.Series([np.nan] * n, index=df.index)
+        # Hạ chữ thường 1 lần rồi tìm chuỗi con (nhanh hơn nhiều so với regex case=False)
+        reviews_lower = reviews.str.lower()
+        self.keyword_cols = {}
+        for keywords in review_keywords.values():
+            for keyword in keywords:
+                if keyword not in self.keyword_cols:
+                    self.keyword_cols[keyword] = len(columns)
+                    columns.append(self._contains(reviews_lower, [keyword], na=False))
+
+        self.sea_col = len(columns)
+        columns.append(self._truthy(df, 'sea', n))
+        self.quiet_col = len(columns)
+        columns.append(self._contains(reviews_lower, QUIET_PATTERN.split('|'), na=True))
+        self.service_col = len(columns)
+        columns.append(self._contains(reviews_lower, SERVICE_PATTERN.split('|'), na=True))
+        self.rating_col = len(columns)
+        columns.append(rating)
+
+        self.matrix = np.column_stack(columns) if n else np.zeros((0, len(columns)))
+
+    @staticmethod
+    def _truthy(df, col, n):
+        # Giống lambda x: ... if x else ... trên từng giá trị (cột thiếu -> False)
+        if col not in df.columns:
+            return np.zeros(n)
+        return df[col].astype(bool).to_numpy(dtype=float)
+
+    @staticmethod
+    def _contains(reviews_lower, keywords, na):
+        # Khớp bất kỳ từ khóa nào; review trống -> na
+        hits = np.zeros(len(reviews_lower), dtype=bool)
+        for keyword in keywords:
+            hits |= reviews_lower.str.contains(keyword.lower(), regex=False, na=na).to_numpy(dtype=bool)
+        return hits.astype(float)
+
+    def rows_for(self, df):
+        """Vị trí các dòng của df trong matrix, None nếu df không thuộc catalog này"""
+        positions = self.index.get_indexer(df.index)
+        if len(positions) and (positions < 0).any():
+            return None
+        return positions
+
+
+def build_weights(matrices, all_prefs, explanation_log):
+    """
+    Tạo vector trọng số (và hằng số cộng thêm) từ sở thích người dùng.
+    Ghi lại giải thích theo đúng thứ tự luật như bản cũ.
+    """
+    weights = np.zeros(matrices.matrix.shape[1])
+    constant = 0.0
+    price_weight = 0.0
+
+    weights[matrices.rating_col] = 3
+
+    # 1. Tính điểm sở thích: có -> +score, không -> -2
     for feature, score in feature_scores.items():
         if all_prefs.get(feature, False):
-            df_scored['recommend_score'] += df_scored[feature].apply(
-                lambda has_feature: score if has_feature else -2
-            )
+            weights[matrices.feature_cols[feature]] += score + 2
+            constant -= 2
             explanation_log.append(f"Ưu tiên khách sạn có {feature}.")
 
-    # 2. Tính điểm Text 
+    # 2. Tính điểm Text
     user_text = all_prefs.get('text', '').lower()
-    user_query = all_prefs.get('text_query', '').lower()  # THÊM DÒNG NÀY
+    user_query = all_prefs.get('text_query', '').lower()
     combined_text = user_text + " " + user_query
 
-    text_score = 0
-
-    # Xử lý "bao nhiêu sao cũng được"
     if 'bao nhiêu sao cũng được' in combined_text or 'sao nào cũng được' in combined_text:
         explanation_log.append("Không yêu cầu số sao cụ thể.")
-    
-    # Xử lý "giá rẻ"
+
     if 'giá rẻ' in combined_text or 'rẻ' in combined_text or 'giá thấp' in combined_text:
-        df_scored['recommend_score'] += (1 / df_scored['price']) * 1000000
+        price_weight = 1
         explanation_log.append("Ưu tiên khách sạn giá rẻ.")
-    
-    # Xử lý "nhiều đánh giá tích cực"
+
     if 'nhiều đánh giá tích cực' in combined_text or 'đánh giá tốt' in combined_text:
-        df_scored['recommend_score'] += df_scored['rating'] * 2
+        weights[matrices.rating_col] += 2
         explanation_log.append("Ưu tiên khách sạn có đánh giá cao.")
-    
-    # Xử lý các từ khóa trong đánh giá
-    review_keywords = {
-        'biển đẹp': ['biển đẹp', 'view biển tuyệt', 'bãi biển đẹp'],
-        'dịch vụ tốt': ['dịch vụ tốt', 'nhân viên thân thiện', 'phục vụ chu đáo'],
-        'yên tĩnh': ['yên tĩnh', 'thanh bình', 'tĩnh lặng'],
-        'view đẹp': ['view đẹp', 'cảnh đẹp', 'tầm nhìn đẹp']
-    }
-    
+
     for aspect, keywords in review_keywords.items():
         if any(keyword in combined_text for keyword in keywords):
             for keyword in keywords:
-                mask = df_scored['review'].str.contains(keyword, case=False, na=False)
-                text_score += mask * 6
+                weights[matrices.keyword_cols[keyword]] += 6
             explanation_log.append(f"Tìm kiếm khách sạn có '{aspect}' trong đánh giá.")
-    
+
     if 'biển' in user_text:
-        text_score += df_scored['sea'].apply(lambda has_sea: 10 if has_sea else -3)
+        weights[matrices.sea_col] += 13
+        constant -= 3
         explanation_log.append("Tìm kiếm từ khóa 'biển', ưu tiên khách sạn gần biển.")
-    
+
     if 'yên tĩnh' in user_text:
-        text_score += df_scored['review'].str.contains('yên tĩnh|thoải mái', case=False).apply(lambda x: 5 if x else 0)
+        weights[matrices.quiet_col] += 5
         explanation_log.append("Tìm kiếm từ khóa 'yên tĩnh' trong đánh giá.")
 
     if 'dịch vụ' in user_text or 'thân thiện' in user_text:
-         text_score += df_scored['review'].str.contains('dịch vụ|thân thiện', case=False).apply(lambda x: 4 if x else 0)
-         explanation_log.append("Tìm kiếm từ khóa 'dịch vụ', 'thân thiện' trong đánh giá.")
+        weights[matrices.service_col] += 4
+        explanation_log.append("Tìm kiếm từ khóa 'dịch vụ', 'thân thiện' trong đánh giá.")
 
-    df_scored['recommend_score'] += text_score
+    return weights, constant, price_weight
 
-    # SẮP XẾP (Sorting) ---
-    # Sắp xếp theo yêu cầu mới
-    final_results_sorted = df_scored.sort_values(by="recommend_score", ascending=False)
+
+def calculate_scores_and_explain(df, all_prefs, matrices=None, k=None, text_index=None):
+    """
+    Hàm tính điểm, sắp xếp và giải thích
+    Trả về 2 giá trị: (dataframe_sorted, explanation_string)
+    matrices: ScoringMatrices dựng sẵn cho catalog (df có thể là tập con của catalog đó)
+    k: chỉ lấy k khách sạn tốt nhất (chọn từng phần, không sort toàn bộ); None = trả về tất cả
+    text_index: ReviewSearchIndex - cộng điểm theo độ liên quan BM25 của mô tả tự do
+    """
+    print(f"[AI] Bắt đầu tính điểm. Sở thích: {all_prefs}")
+
+    # Một danh sách để lưu lại các lý do giải thích
+    explanation_log = ["Bắt đầu quá trình xếp hạng:"]
+
+    positions = matrices.rows_for(df) if matrices is not None else None
+    if positions is None:
+        matrices = ScoringMatrices(df)
+        positions = np.arange(len(df))
+
+    # LỌC CỨNG (Hard Filter) ---
+    min_stars = all_prefs.get('min_stars', 0)
+    if min_stars > 0:
+        keep = matrices.stars[positions] >= min_stars
+        df = df[keep]
+        positions = positions[keep]
+        explanation_log.append(f"Loại bỏ các khách sạn dưới {min_stars} sao.")
+
+    if df.empty:
+        return df.copy(), "Không tìm thấy khách sạn nào sau khi lọc theo số sao."
+
+    # TÍNH ĐIỂM (Scoring Logic): một phép nhân ma trận - vector ---
+    weights, constant, price_weight = build_weights(matrices, all_prefs, explanation_log)
+    scores = matrices.matrix[positions] @ weights + constant
+    if price_weight:
+        scores = scores + price_weight * matrices.inv_price[positions]
+
+    free_text = all_prefs.get('text', '').strip()
+    if text_index is not None and free_text and 'name' in df.columns:
+        relevance = text_index.relevance(free_text, df['name'].tolist())
+        if relevance.any():
+            scores = scores + TEXT_MATCH_WEIGHT * relevance
+            explanation_log.append(f"Xếp hạng theo mức độ liên quan của đánh giá với '{free_text}'.")
+
+    # SẮP XẾP (Sorting): chọn top-k, hòa điểm thì giữ thứ tự catalog ---
+    order = top_k(scores, k)
+    final_results_sorted = df.iloc[order].assign(recommend_score=scores[order])
     explanation_log.append("Hoàn tất! Đã sắp xếp kết quả.")
 
     # TRẢ VỀ KẾT QUẢ ---
     final_explanation = " ".join(explanation_log)
 
-    num_results = min(3, len(final_results_sorted))
+    num_results = min(3 if k is None else k, len(final_results_sorted))
     print(f"[AI] Trả về {num_results} khách sạn")
-    
-    return final_results_sorted, final_explanation
 
+    return final_results_sorted, final_explanation
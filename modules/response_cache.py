@@ -0,0 +1,107 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+def make_cache_key(*parts):
+    """Khóa cache ổn định từ các thành phần (chuỗi, số, list, dict...)"""
+    raw = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """
+    Cache câu trả lời của model: LRU (tối đa max_entries) + TTL (giây).
+    - persist_path: nếu có, nạp lại khi khởi động và ghi xuống đĩa (tối đa 1 lần / persist_interval giây)
+    - đếm hits / misses để theo dõi hiệu quả
+    """
+
+    def __init__(self, max_entries=512, ttl=3600, persist_path=None, persist_interval=5.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.persist_path = persist_path
+        self.persist_interval = persist_interval
+        self._entries = OrderedDict()   # key -> (hết hạn lúc, value)
+        self._lock = threading.Lock()
+        self._last_saved = 0.0
+        self._dirty = False
+        self.hits = 0
+        self.misses = 0
+        if persist_path:
+            self._load()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._dirty = True
+        if self.persist_path and time.time() - self._last_saved >= self.persist_interval:
+            self.save()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._dirty = True
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 3) if total else 0.0,
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl
+            }
+
+    # -------------------------
+    # LƯU XUỐNG ĐĨA
+    # -------------------------
+    def save(self):
+        if not self.persist_path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            now = time.time()
+            data = [[key, expires, value] for key, (expires, value) in self._entries.items() if expires > now]
+            self._dirty = False
+            self._last_saved = now
+        tmp_path = self.persist_path + '.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.persist_path)
+        except OSError as e:
+            print(f"⚠️ Không lưu được cache {self.persist_path}: {e}")
+
+    def _load(self):
+        try:
+            with open(self.persist_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        now = time.time()
+        for key, expires, value in data[-self.max_entries:]:
+            if expires > now:
+                self._entries[key] = (expires, value)
+        print(f"[Cache] Đã nạp {len(self._entries)} câu trả lời từ {self.persist_path}")
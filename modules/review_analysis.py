@@ -3,14 +3,144 @@
 # Buoc 1: Cai pip(Kiem tra xem pip da cai chua, neu cai roi thi thoi)
 # Buoc 2: Cai transformer: ghi pip install transformers torch vao terminal của VS2022
 
-from transformers import pipeline
-# Dung pipeline phan tich cam xuc
-review_analysis = pipeline("sentiment-analysis")
+import hashlib
+import json
+import os
+import threading
+
+# Model mặc định của pipeline("sentiment-analysis")
+DEFAULT_MODEL = "distilbert-base-uncased-finetuned-sst-2-english"
+
+
+def content_hash(text, model_name, quantize):
+    """Khóa cache: cùng nội dung + cùng model (+ chế độ int8) -> cùng kết quả"""
+    raw = f"{model_name}|{'int8' if quantize else 'fp32'}|{text}"
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+class SentimentService:
+    """
+    Phân tích cảm xúc đánh giá, dùng chung 1 instance (SentimentService.instance()).
+    - Model chỉ được nạp ở lần phân tích đầu tiên (import module không tốn gì)
+    - Chạy CPU; quantize=True: lượng tử hóa động int8 các lớp Linear (nhanh hơn, lệch điểm rất ít)
+    - analyze() nhận cả danh sách, chạy model theo lô batch_size
+    - Kết quả cache theo hash nội dung, lưu xuống cache_path (JSON) để lần chạy sau dùng lại
+    """
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, model_name=None, cache_path=None, batch_size=32, quantize=False, pipeline_factory=None):
+        self.model_name = model_name or os.getenv("SENTIMENT_MODEL", DEFAULT_MODEL)
+        self.cache_path = cache_path
+        self.batch_size = batch_size
+        self.quantize = quantize
+        self._pipeline_factory = pipeline_factory or self._build_pipeline
+        self._pipeline = None
+        self._lock = threading.Lock()
+        self._cache = {}    # hash -> [label, score]
+        self._dirty = False
+        if cache_path:
+            self._load_cache()
+
+    @classmethod
+    def instance(cls, **kwargs):
+        """Instance dùng chung; tham số chỉ có tác dụng ở lần gọi đầu tiên"""
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = cls(**kwargs)
+        return cls._instance
+
+    # -------------------------
+    # MODEL
+    # -------------------------
+    def _build_pipeline(self):
+        import torch
+        from transformers import pipeline
+
+        classifier = pipeline("sentiment-analysis", model=self.model_name, device=-1)  # -1 = CPU
+        if self.quantize:
+            classifier.model = torch.quantization.quantize_dynamic(
+                classifier.model, {torch.nn.Linear}, dtype=torch.qint8
+            )
+        print(f"[Sentiment] Đã nạp model {self.model_name} (CPU, {'int8' if self.quantize else 'fp32'})")
+        return classifier
+
+    def _classifier(self):
+        if self._pipeline is None:
+            with self._lock:
+                if self._pipeline is None:
+                    self._pipeline = self._pipeline_factory()
+        return self._pipeline
+
+    # -------------------------
+    # PHÂN TÍCH
+    # -------------------------
+    def analyze(self, texts, use_cache=True):
+        """Danh sách {'label', 'score'} theo đúng thứ tự texts"""
+        texts = ['' if text is None else str(text) for text in texts]
+        keys = [content_hash(text, self.model_name, self.quantize) for text in texts]
+
+        results = [None] * len(texts)
+        missing = {}    # hash -> vị trí đầu tiên cần chạy model
+        for i, key in enumerate(keys):
+            cached = self._cache.get(key) if use_cache else None
+            if cached is not None:
+                results[i] = {'label': cached[0], 'score': cached[1]}
+            elif key not in missing:
+                missing[key] = i
+
+        if missing:
+            pending = list(missing.items())
+            classifier = self._classifier()
+            for start in range(0, len(pending), self.batch_size):
+                batch = pending[start:start + self.batch_size]
+                outputs = classifier([texts[i] for _, i in batch], batch_size=self.batch_size, truncation=True)
+                with self._lock:
+                    for (key, _), output in zip(batch, outputs):
+                        self._cache[key] = [output['label'], float(output['score'])]
+                    self._dirty = True
+
+        for i, key in enumerate(keys):
+            if results[i] is None:
+                label, score = self._cache[key]
+                results[i] = {'label': label, 'score': score}
+        return results
+
+    def analyze_one(self, text):
+        return self.analyze([text])[0]
+
+    # -------------------------
+    # CACHE TRÊN ĐĨA
+    # -------------------------
+    def _load_cache(self):
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                self._cache = json.load(f)
+        except (OSError, ValueError):
+            self._cache = {}
+
+    def save(self):
+        if not self.cache_path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            data = dict(self._cache)
+            self._dirty = False
+        tmp_path = self.cache_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.cache_path)
+
+
 def analyze_review(review: str):
-    result = review_analysis(review)[0]
-    label = result['label']
-    score = result['score']
-    return f"{label} ({score:.2f})"
+    result = SentimentService.instance().analyze_one(review)
+    return f"{result['label']} ({result['score']:.2f})"
+
+
 # Demo ----------------------------------
-print(analyze_review("I love this product, it's umazing"))
-print(analyze_review("This thing is shit"))
+if __name__ == "__main__":
+    print(analyze_review("I love this product, it's umazing"))
+    print(analyze_review("This thing is shit"))
@@ -0,0 +1,78 @@
+import threading
+
+
+class ReviewIndex:
+    """
+    Đánh giá gom theo khách sạn + số liệu cộng dồn (số lượt, tổng điểm, điểm trung bình).
+    - Dựng 1 lần từ toàn bộ đánh giá, add() cập nhật khi có đánh giá mới
+    - sync() nạp thêm các dòng DB có id lớn hơn id đã thấy (đánh giá do worker khác ghi)
+    - Mọi truy vấn theo tên khách sạn là O(1), không phải quét toàn bộ danh sách đánh giá
+    """
+
+    def __init__(self, reviews=()):
+        self._lock = threading.Lock()
+        self._reviews = {}      # tên khách sạn -> [review theo thứ tự thêm]
+        self._totals = {}       # tên khách sạn -> [số lượt, tổng điểm]
+        self.last_id = 0        # id DB lớn nhất đã nạp
+        for review in reviews:
+            self.add(review)
+
+    @staticmethod
+    def _rating(review):
+        try:
+            return float(review.get('rating', 0) or 0)
+        except (TypeError, ValueError):
+            return 0.0
+
+    def add(self, review):
+        with self._lock:
+            self._add(review)
+
+    def _add(self, review):
+        # 'id' của DB chỉ dùng để theo dõi last_id, không đưa vào dữ liệu đánh giá trả ra ngoài
+        review_id = review.get('id') or 0
+        review = {key: value for key, value in review.items() if key != 'id'}
+        name = review.get('hotel_name', '')
+        self._reviews.setdefault(name, []).append(review)
+        totals = self._totals.setdefault(name, [0, 0.0])
+        totals[0] += 1
+        totals[1] += self._rating(review)
+        self.last_id = max(self.last_id, review_id)
+
+    def sync(self, rows):
+        """Thêm các dòng DB (có 'id') chưa nạp; dòng có id <= last_id bị bỏ qua. Trả về số dòng mới"""
+        added = 0
+        with self._lock:
+            for review in rows:
+                if review['id'] > self.last_id:
+                    self._add(review)
+                    added += 1
+        return added
+
+    def reviews_for(self, name):
+        """Bản sao danh sách đánh giá của khách sạn (cũ -> mới)"""
+        with self._lock:
+            return list(self._reviews.get(name, ()))
+
+    def first(self, name):
+        """Đánh giá đầu tiên của khách sạn, None nếu chưa có"""
+        reviews = self._reviews.get(name)
+        return reviews[0] if reviews else None
+
+    def count(self, name):
+        totals = self._totals.get(name)
+        return totals[0] if totals else 0
+
+    def average(self, name, default=None):
+        """Điểm trung bình (làm tròn 1 chữ số), default nếu chưa có đánh giá"""
+        with self._lock:
+            totals = self._totals.get(name)
+            if not totals:
+                return default
+            return round(totals[1] / totals[0], 1)
+
+    def stats(self, name):
+        """(số lượt, tổng điểm, trung bình chưa làm tròn hoặc None)"""
+        with self._lock:
+            count, total = self._totals.get(name, (0, 0.0))
+        return count, total, (total / count if count else None)
@@ -0,0 +1,85 @@
+import csv
+import os
+
+from filelock import FileLock
+
+# Header chuẩn của các file CSV ghi thêm (append-only), dùng chung cho bảng bookings / reviews của hotel.db
+BOOKING_COLUMNS = [
+    "hotel_name", "room_type", "price", "user_name", "phone", "email",
+    "num_adults", "num_children", "checkin_date", "nights",
+    "special_requests", "booking_time", "status", "username", "user_email", "booking_code",
+    "payment_status"
+]
+REVIEW_COLUMNS = ["hotel_name", "user", "rating", "comment"]
+
+
+def file_lock(path, timeout=10):
+    """
+    Khóa liên tiến trình cho một file CSV (file <path>.lock bên cạnh).
+    Mọi thao tác ghi (append hoặc đọc-sửa-ghi) lên cùng file phải giữ khóa này,
+    để các worker gunicorn chạy song song không làm mất dòng của nhau.
+    """
+    return FileLock(path + ".lock", timeout=timeout)
+
+
+def _read_header(path):
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return None
+    with open(path, "r", newline="", encoding="utf-8-sig") as f:
+        return next(csv.reader(f), None)
+
+
+def _ensure_trailing_newline(path):
+    # File sửa tay có thể thiếu '\n' cuối, nếu không thêm thì dòng mới sẽ dính vào dòng cuối
+    with open(path, "rb+") as f:
+        f.seek(0, os.SEEK_END)
+        if f.tell() == 0:
+            return
+        f.seek(-1, os.SEEK_END)
+        if f.read(1) not in (b"\n", b"\r"):
+            f.write(b"\n")
+
+
+def _rewrite_with_header(path, header):
+    """Trường hợp hiếm: dòng mới có cột chưa có trong file -> ghi lại file với header mở rộng"""
+    with open(path, "r", newline="", encoding="utf-8-sig") as f:
+        rows = list(csv.DictReader(f))
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.DictWriter(f, fieldnames=header, lineterminator="\n")
+        writer.writeheader()
+        writer.writerows(rows)
+    os.replace(tmp_path, path)
+
+
+def append_row(path, row, columns):
+    """
+    Ghi thêm MỘT dòng vào cuối file CSV dưới khóa file - chi phí không phụ thuộc kích thước file.
+    Cột được sắp theo header hiện có của file; file chưa có thì tạo với header `columns`.
+    """
+    with file_lock(path):
+        header = _read_header(path)
+        if header is None:
+            header = list(columns) + [c for c in row if c not in columns]
+            with open(path, "w", newline="", encoding="utf-8-sig") as f:
+                csv.writer(f, lineterminator="\n").writerow(header)
+
+        missing = [c for c in row if c not in header]
+        if missing:
+            header = header + missing
+            _rewrite_with_header(path, header)
+
+        _ensure_trailing_newline(path)
+        with open(path, "a", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=header, lineterminator="\n")
+            writer.writerow(row)
+
+
+def append_booking(path, booking):
+    """Lưu một đơn đặt phòng mới vào bookings CSV"""
+    append_row(path, booking, BOOKING_COLUMNS)
+
+
+def append_review(path, review):
+    """Lưu một đánh giá mới vào reviews CSV"""
+    append_row(path, review, REVIEW_COLUMNS)
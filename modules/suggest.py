@@ -0,0 +1,98 @@
+import heapq
+import re
+from bisect import bisect_left
+
+import pandas as pd
+
+try:
+    from .text_index import fold_diacritics
+    from .entity_resolver import CITY_ALIASES
+except ImportError:  # chạy trực tiếp trong thư mục modules
+    from text_index import fold_diacritics
+    from entity_resolver import CITY_ALIASES
+
+SPACE_PATTERN = re.compile(r'[\W_]+')
+
+
+def normalize_key(text):
+    """Khóa so khớp: chữ thường, bỏ dấu, bỏ dấu câu ('Đà Nẵng!' -> 'da nang')"""
+    if not isinstance(text, str):
+        return ''
+    return SPACE_PATTERN.sub(' ', fold_diacritics(text).lower()).strip()
+
+
+class SuggestIndex:
+    """
+    Gợi ý khi gõ (autocomplete) cho tên khách sạn và thành phố.
+    Mảng khóa đã sắp xếp + bisect: mỗi khách sạn có 1 khóa cho mỗi vị trí bắt đầu từ
+    ('hanoi pearl hotel', 'pearl hotel', 'hotel') nên gõ giữa tên vẫn ra. Dựng 1 lần mỗi phiên bản catalog.
+    """
+
+    def __init__(self, hotels_df):
+        self.entries = []       # id -> dict thông tin gợi ý
+        keys = []
+
+        names = hotels_df['name'] if 'name' in hotels_df.columns else pd.Series(dtype=object)
+        cities = hotels_df['city'] if 'city' in hotels_df.columns else pd.Series([None] * len(names))
+        ratings = (pd.to_numeric(hotels_df['rating'], errors='coerce').fillna(0).tolist()
+                   if 'rating' in hotels_df.columns else [0.0] * len(names))
+
+        seen_names = set()
+        hotel_counts = {}
+        for name, city, rating in zip(names, cities, ratings):
+            if not isinstance(name, str) or not name.strip() or name in seen_names:
+                continue
+            seen_names.add(name)
+            city = city.strip() if isinstance(city, str) else ''
+            if city:
+                hotel_counts[city] = hotel_counts.get(city, 0) + 1
+            entry_id = len(self.entries)
+            self.entries.append({'type': 'hotel', 'label': name, 'city': city, 'rating': float(rating)})
+            words = normalize_key(name).split()
+            for i in range(len(words)):
+                keys.append((' '.join(words[i:]), entry_id, i == 0))
+
+        # Thành phố: tên trong catalog + các tên gọi khác (Sài Gòn, HCM...)
+        city_ids = {}
+        for city, count in hotel_counts.items():
+            city_ids[city] = len(self.entries)
+            self.entries.append({'type': 'city', 'label': city, 'hotel_count': count})
+        for alias, city in list(CITY_ALIASES.items()) + [(city, city) for city in city_ids]:
+            if city in city_ids:
+                keys.append((normalize_key(alias), city_ids[city], True))
+
+        keys.sort()
+        self._keys = [key for key, _, _ in keys]
+        self._targets = [(entry_id, is_start) for _, entry_id, is_start in keys]
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _score(self, entry, from_start, popularity):
+        """Thành phố trước; khớp từ đầu tên trước; rồi rating, rồi độ phổ biến"""
+        if entry['type'] == 'city':
+            return (1, 1, entry['hotel_count'], 0)
+        pop = popularity(entry['label']) if popularity else 0
+        return (0, int(from_start), entry['rating'], pop)
+
+    def query(self, text, limit=8, popularity=None):
+        """
+        Các gợi ý có khóa bắt đầu bằng text (đã chuẩn hóa), tối đa limit kết quả.
+        popularity: hàm tên khách sạn -> số (vd. số lượt đánh giá), dùng để xếp khi rating bằng nhau
+        """
+        prefix = normalize_key(text)
+        if not prefix:
+            return []
+
+        best = {}   # entry id -> khớp từ đầu tên?
+        i = bisect_left(self._keys, prefix)
+        while i < len(self._keys) and self._keys[i].startswith(prefix):
+            entry_id, is_start = self._targets[i]
+            best[entry_id] = best.get(entry_id, False) or is_start
+            i += 1
+
+        top = heapq.nlargest(
+            limit, best.items(),
+            key=lambda item: (self._score(self.entries[item[0]], item[1], popularity), -item[0])
+        )
+        return [dict(self.entries[entry_id]) for entry_id, _ in top]
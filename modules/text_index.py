@@ -0,0 +1,154 @@
+import html
+import math
+import re
+import threading
+import unicodedata
+from collections import Counter
+
+import numpy as np
+
+try:
+    from .ranking import top_k
+except ImportError:  # chạy trực tiếp trong thư mục modules (chatbox_app)
+    from ranking import top_k
+
+TAG_PATTERN = re.compile(r'<[^>]*>')
+WORD_PATTERN = re.compile(r'\w+')
+
+
+def strip_html(text):
+    """Bỏ thẻ HTML + giải mã entity ('&amp;' -> '&')"""
+    if not isinstance(text, str):
+        return ''
+    return html.unescape(TAG_PATTERN.sub(' ', text))
+
+
+def fold_diacritics(text):
+    """Bỏ dấu tiếng Việt: 'chợ đêm' -> 'cho dem'"""
+    decomposed = unicodedata.normalize('NFD', text)
+    stripped = ''.join(ch for ch in decomposed if unicodedata.category(ch) != 'Mn')
+    return stripped.replace('đ', 'd').replace('Đ', 'D')
+
+
+def tokenize(text):
+    """Tách từ (âm tiết) chữ thường, chuẩn hóa Unicode NFC để 'ợ' dựng sẵn và tổ hợp là một"""
+    if not isinstance(text, str) or not text:
+        return []
+    return WORD_PATTERN.findall(unicodedata.normalize('NFC', text).lower())
+
+
+def _terms(tokens):
+    """Âm tiết + cặp âm tiết liền nhau (tiếng Việt: từ thường gồm 2 âm tiết, 'chợ đêm')"""
+    return tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+
+class ReviewSearchIndex:
+    """
+    Chỉ mục đảo (inverted index) + xếp hạng BM25 trên mô tả/đánh giá, mỗi khách sạn là 1 tài liệu.
+    - Mỗi term lưu 2 dạng: có dấu và bỏ dấu. Từ khóa gõ có dấu chỉ khớp đúng dấu
+      ('chợ' khác 'chó'), gõ không dấu thì khớp mọi cách viết ('cho dem' ~ 'chợ đêm')
+    - add() cập nhật tăng dần (đánh giá mới), không phải dựng lại chỉ mục
+    - sync() nạp thêm các đánh giá trong DB có id lớn hơn id đã thấy (do worker khác ghi)
+    """
+
+    def __init__(self, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.keys = []                  # doc id -> tên khách sạn
+        self._doc_ids = {}              # tên khách sạn -> doc id
+        self._doc_lengths = []
+        self._total_length = 0
+        self._exact = {}                # term có dấu -> {doc id: tf}
+        self._folded = {}               # term bỏ dấu -> {doc id: tf}
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self.last_id = 0                # id DB lớn nhất của đánh giá đã nạp
+
+    @classmethod
+    def from_sources(cls, hotels_df, reviews):
+        """Dựng từ cột review (HTML) của hotels.csv + comment trong danh sách đánh giá"""
+        index = cls()
+        if 'name' in hotels_df.columns:
+            texts = hotels_df['review'] if 'review' in hotels_df.columns else [''] * len(hotels_df)
+            for name, text in zip(hotels_df['name'], texts):
+                index.add(name, strip_html(text))
+        index.sync(reviews)
+        return index
+
+    def sync(self, reviews):
+        """Thêm comment của các đánh giá chưa nạp; đánh giá có 'id' <= last_id bị bỏ qua"""
+        added = 0
+        with self._sync_lock:
+            for review in reviews:
+                review_id = review.get('id')
+                if review_id is not None:
+                    if review_id <= self.last_id:
+                        continue
+                    self.last_id = review_id
+                self.add(review.get('hotel_name', ''), review.get('comment', ''))
+                added += 1
+        return added
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add(self, key, text):
+        """Thêm văn bản vào tài liệu của key (tạo tài liệu mới nếu chưa có)"""
+        if not isinstance(key, str) or not key:
+            return
+        tokens = tokenize(text)
+        with self._lock:
+            doc_id = self._doc_ids.get(key)
+            if doc_id is None:
+                doc_id = len(self.keys)
+                self._doc_ids[key] = doc_id
+                self.keys.append(key)
+                self._doc_lengths.append(0)
+            if not tokens:
+                return
+            self._doc_lengths[doc_id] += len(tokens)
+            self._total_length += len(tokens)
+            for term, tf in Counter(_terms(tokens)).items():
+                postings = self._exact.setdefault(term, {})
+                postings[doc_id] = postings.get(doc_id, 0) + tf
+                postings = self._folded.setdefault(fold_diacritics(term), {})
+                postings[doc_id] = postings.get(doc_id, 0) + tf
+
+    def _postings(self, term):
+        folded = fold_diacritics(term)
+        if folded == term:
+            return self._folded.get(term)
+        return self._exact.get(term)
+
+    def scores(self, query):
+        """Mảng điểm BM25 theo doc id (0 = không khớp từ nào)"""
+        terms = set(_terms(tokenize(query)))
+        with self._lock:
+            n = len(self.keys)
+            scores = np.zeros(n)
+            if not n or not terms or not self._total_length:
+                return scores
+            avg_length = self._total_length / n
+            lengths = self._doc_lengths
+            for term in terms:
+                postings = self._postings(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, tf in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * lengths[doc_id] / avg_length)
+                    scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return scores
+
+    def search(self, query, k=10):
+        """Top-k (tên khách sạn, điểm) có điểm > 0"""
+        scores = self.scores(query)
+        return [(self.keys[i], float(scores[i])) for i in top_k(scores, k) if scores[i] > 0]
+
+    def relevance(self, query, keys):
+        """Điểm đã chuẩn hóa về [0, 1] (chia cho điểm cao nhất) theo thứ tự keys; key lạ -> 0"""
+        scores = self.scores(query)
+        ids = np.array([self._doc_ids.get(key, -1) for key in keys], dtype=np.intp)
+        result = np.where(ids >= 0, scores[ids] if len(scores) else 0.0, 0.0)
+        best = result.max() if len(result) else 0.0
+        return result / best if best > 0 else result
@@ -0,0 +1,42 @@
+import argparse
+import os
+import time
+
+import pandas as pd
+
+from modules.catalog import normalize_hotels
+from modules.context_table import build_context_table
+
+# =============================
+# JOB OFFLINE: bảng điểm ngữ cảnh (sự kiện / mùa) cho từng khách sạn x từng ngày
+# Chạy: python precompute_context_scores.py [--days 180] [--start 2025-06-01] [--workers 4]
+# Mỗi thành phố tính trên một process; kết quả ghi vào data/context_scores.npz,
+# /recommend và chatbot tự nạp lại file khi nó đổi. Nên chạy lại mỗi ngày (khung ngày trượt).
+# =============================
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+HOTELS_CSV = os.path.join(BASE_DIR, "hotels.csv")
+EVENTS_CSV = os.path.join(BASE_DIR, "events.csv")
+OUTPUT_FILE = os.path.join(BASE_DIR, "data", "context_scores.npz")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tính sẵn điểm ngữ cảnh (khách sạn, ngày)")
+    parser.add_argument("--days", type=int, default=180, help="Số ngày tính từ --start")
+    parser.add_argument("--start", default=None, help="Ngày đầu YYYY-MM-DD (mặc định: hôm nay)")
+    parser.add_argument("--workers", type=int, default=None, help="Số process (mặc định: số CPU)")
+    parser.add_argument("--output", default=OUTPUT_FILE)
+    args = parser.parse_args()
+
+    hotels_df = normalize_hotels(pd.read_csv(HOTELS_CSV, encoding="utf-8-sig"))
+    events_df = pd.read_csv(EVENTS_CSV, encoding="utf-8-sig")
+
+    started = time.perf_counter()
+    table = build_context_table(hotels_df, events_df, start=args.start, days=args.days, workers=args.workers)
+    table.save(args.output)
+    print(f"✅ {len(table)} khách sạn x {table.days} ngày ({table.start} -> {table.end}) "
+          f"trong {time.perf_counter() - started:.2f}s -> {args.output} ({os.path.getsize(args.output) // 1024} KB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+import argparse
+import csv
+import os
+import time
+
+import pandas as pd
+
+from modules.review_analysis import SentimentService
+from modules.storage import file_lock
+
+# =============================
+# JOB OFFLINE: tính sẵn cảm xúc cho mọi đánh giá trong reviews.csv
+# Chạy 1 lần:        python precompute_sentiment.py
+# Chạy theo dõi:     python precompute_sentiment.py --watch 60   (kiểm tra file mỗi 60 giây)
+# reviews.csv chỉ được ghi thêm (add_review) nên mỗi lần chạy chỉ xử lý các dòng mới.
+# =============================
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+REVIEWS_CSV = os.path.join(BASE_DIR, "reviews.csv")
+OUTPUT_CSV = os.path.join(BASE_DIR, "data", "reviews_sentiment.csv")
+CACHE_FILE = os.path.join(BASE_DIR, "data", "sentiment_cache.json")
+OUTPUT_COLUMNS = ["row", "hotel_name", "user", "rating", "comment", "label", "score"]
+
+
+def read_reviews(path):
+    with file_lock(path):
+        return pd.read_csv(path, encoding="utf-8-sig", dtype=str, keep_default_na=False)
+
+
+def done_rows(path):
+    """Số đánh giá đã có kết quả trong file output"""
+    if not os.path.exists(path):
+        return 0
+    with open(path, "r", newline="", encoding="utf-8-sig") as f:
+        return max(0, sum(1 for _ in csv.reader(f)) - 1)
+
+
+def precompute(service, reviews_path=REVIEWS_CSV, output_path=OUTPUT_CSV):
+    """Phân tích các dòng chưa xử lý, ghi thêm vào output; trả về số dòng mới"""
+    reviews = read_reviews(reviews_path)
+    done = done_rows(output_path)
+    if done > len(reviews):
+        # reviews.csv bị sửa tay / thay file: làm lại từ đầu (các dòng cũ vẫn trúng cache)
+        print(f"⚠️ Output có {done} dòng nhưng reviews.csv chỉ có {len(reviews)} dòng, tính lại toàn bộ")
+        os.remove(output_path)
+        done = 0
+
+    new_rows = reviews.iloc[done:]
+    if new_rows.empty:
+        return 0
+
+    results = service.analyze(new_rows["comment"].tolist())
+
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    write_header = not os.path.exists(output_path)
+    with open(output_path, "a", newline="", encoding="utf-8-sig" if write_header else "utf-8") as f:
+        writer = csv.writer(f, lineterminator="\n")
+        if write_header:
+            writer.writerow(OUTPUT_COLUMNS)
+        for row_number, (_, review), result in zip(range(done, done + len(new_rows)), new_rows.iterrows(), results):
+            writer.writerow([
+                row_number, review.get("hotel_name", ""), review.get("user", ""), review.get("rating", ""),
+                review.get("comment", ""), result["label"], round(result["score"], 4)
+            ])
+    service.save()
+    return len(new_rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tính sẵn cảm xúc cho reviews.csv")
+    parser.add_argument("--watch", type=float, default=0, help="Chạy liên tục, kiểm tra file mỗi N giây")
+    parser.add_argument("--quantize", action="store_true", help="Dùng model lượng tử hóa int8")
+    parser.add_argument("--batch-size", type=int, default=32)
+    args = parser.parse_args()
+
+    service = SentimentService(cache_path=CACHE_FILE, batch_size=args.batch_size, quantize=args.quantize)
+    last_signature = None
+    while True:
+        st = os.stat(REVIEWS_CSV)
+        signature = (st.st_mtime_ns, st.st_size)
+        if signature != last_signature:
+            started = time.perf_counter()
+            count = precompute(service)
+            last_signature = signature
+            if count:
+                print(f"✅ Đã phân tích {count} đánh giá mới trong {time.perf_counter() - started:.2f}s -> {OUTPUT_CSV}")
+        if not args.watch:
+            break
+        time.sleep(args.watch)
+
+
+if __name__ == "__main__":
+    main()